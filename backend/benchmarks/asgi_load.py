@@ -0,0 +1,157 @@
+"""Concurrent upload and get-data load on the Django API under WSGI and ASGI.
+
+Starts the backend in a subprocess with the OCR engine and storage replaced
+by stubs that sleep --rtt seconds per call (benchmarks.stub_services):
+"wsgi" is gunicorn with --threads threads, and "asgi" is uvicorn with
+ASYNC_OFFLOAD_WORKERS set to the same number. Both run one process. Then:
+- --clients clients loop over an upload followed by a get-data for their room;
+- --pollers dashboards each hold a ?wait= long-poll on a room nobody writes to.
+Each server reports request throughput, latency percentiles and uploads
+shed with 429. Admission control (UPLOAD_*) is off unless --admission.
+
+    python -m benchmarks.asgi_load --server wsgi asgi --clients 64 --pollers 64
+"""
+
+import argparse
+import asyncio
+import os
+import subprocess
+import sys
+import time
+
+from benchmarks.support import free_port, make_capture, percentile
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def start_server(kind, port, args):
+    env = dict(
+        os.environ,
+        DJANGO_SETTINGS_MODULE="sample_app_project.settings",
+        ALLOWED_HOSTS="127.0.0.1",
+        OCR_ENGINE="benchmarks.stub_services.StubOCREngine",
+        MEASUREMENT_STORAGE="benchmarks.stub_services.StubStorage",
+        OCR_CACHE_BACKEND="none",
+        OCR_PREPROCESS="False",
+        ROOM_CACHE_TTL="0",
+        STUB_RTT=str(args.rtt),
+        ASYNC_OFFLOAD_WORKERS=str(args.threads),
+    )
+    # Every client connects from 127.0.0.1
+    env.update(UPLOAD_CLIENT_RATE="0")
+    if not args.admission:
+        # Measure the servers, not admission control
+        env.update(UPLOAD_ROOM_RATE="0", UPLOAD_MAX_CONCURRENT=str(args.clients), UPLOAD_MAX_QUEUE="0")
+    if kind == "wsgi":
+        command = [sys.executable, "-m", "gunicorn", "sample_app_project.wsgi", "--bind", f"127.0.0.1:{port}",
+                   "--workers", "1", "--threads", str(args.threads), "--timeout", "120", "--log-level", "warning"]
+    else:
+        command = [sys.executable, "-m", "uvicorn", "sample_app_project.asgi:application", "--host", "127.0.0.1",
+                   "--port", str(port), "--log-level", "warning"]
+    return subprocess.Popen(command, cwd=BACKEND_DIR, env=env)
+
+
+async def wait_until_ready(client, timeout=20):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            await client.get("/api/room-cache/stats/")
+            return
+        except Exception:
+            await asyncio.sleep(0.2)
+    raise RuntimeError("server did not start")
+
+
+async def uploader(client, index, capture, deadline, latencies, errors, shed):
+    room_id = f"room-{index}"
+    while time.monotonic() < deadline:
+        for kind in ("upload", "get-data"):
+            started = time.perf_counter()
+            try:
+                if kind == "upload":
+                    response = await client.post("/api/upload/", data={"type": "temperature", "roomId": room_id},
+                                                 files={"image": ("capture.png", capture, "image/png")})
+                else:
+                    response = await client.get("/api/get-data/", params={"roomId": room_id})
+                if response.status_code == 429:
+                    # Back off as told; the room has nothing new to read
+                    shed.append(response)
+                    await asyncio.sleep(float(response.headers["Retry-After"]))
+                    break
+                response.raise_for_status()
+            except Exception as e:
+                errors.append(e)
+                continue
+            latencies[kind].append(time.perf_counter() - started)
+
+
+async def poller(client, index, deadline, wait, held):
+    room_id = f"watched-{index}"
+    etag = None
+    while time.monotonic() < deadline:
+        headers = {"If-None-Match": etag} if etag else {}
+        try:
+            response = await client.get("/api/get-data/", params={"roomId": room_id, "wait": wait}, headers=headers)
+        except Exception:
+            continue
+        etag = response.headers.get("ETag", etag)
+        held.append(response.status_code)
+
+
+async def run(kind, port, args):
+    import httpx
+
+    capture = make_capture(size=(64, 32), fmt="PNG")
+    limits = httpx.Limits(max_connections=args.clients + args.pollers + 8)
+    timeout = httpx.Timeout(args.duration + 30)
+    async with httpx.AsyncClient(base_url=f"http://127.0.0.1:{port}", limits=limits, timeout=timeout) as client:
+        await wait_until_ready(client)
+        # Let the pollers take their seats before the clients start
+        deadline = time.monotonic() + args.duration
+        held = []
+        pollers = [asyncio.create_task(poller(client, index, deadline, args.wait, held))
+                   for index in range(args.pollers)]
+        await asyncio.sleep(0.5)
+        latencies, errors, shed = {"upload": [], "get-data": []}, [], []
+        started = time.monotonic()
+        await asyncio.gather(*(uploader(client, index, capture, deadline, latencies, errors, shed)
+                               for index in range(args.clients)))
+        elapsed = time.monotonic() - started
+        for task in pollers:
+            task.cancel()
+        await asyncio.gather(*pollers, return_exceptions=True)
+    return latencies, errors, shed, elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--server", nargs="+", choices=("wsgi", "asgi"), default=["wsgi", "asgi"])
+    parser.add_argument("--clients", type=int, default=64)
+    parser.add_argument("--pollers", type=int, default=64)
+    parser.add_argument("--threads", type=int, default=32, help="gunicorn threads / offload pool size")
+    parser.add_argument("--rtt", type=float, default=0.05, help="seconds per stubbed OCR or storage call")
+    parser.add_argument("--wait", type=float, default=10, help="long-poll wait in seconds")
+    parser.add_argument("--duration", type=float, default=10)
+    parser.add_argument("--admission", action="store_true", help="keep the UPLOAD_* admission limits on")
+    args = parser.parse_args()
+
+    print(f"{args.clients} clients (upload + get-data), {args.pollers} long-pollers, {args.threads} threads, "
+          f"{args.rtt * 1000:.0f} ms per remote call, {args.duration:g} s")
+    print(f"{'server':<8}{'req/s':>8}{'upload p50':>12}{'p99':>8}{'get p50':>10}{'p99':>8}{'429':>6}{'errors':>8}")
+    for kind in args.server:
+        port = free_port()
+        server = start_server(kind, port, args)
+        try:
+            latencies, errors, shed, elapsed = asyncio.run(run(kind, port, args))
+        finally:
+            server.terminate()
+            server.wait(timeout=30)
+        total = len(latencies["upload"]) + len(latencies["get-data"])
+        ms = {name: (percentile(samples, 50) * 1000, percentile(samples, 99) * 1000) if samples else (0, 0)
+              for name, samples in latencies.items()}
+        print(f"{kind:<8}{total / elapsed:>8.0f}{ms['upload'][0]:>12.0f}{ms['upload'][1]:>8.0f}"
+              f"{ms['get-data'][0]:>10.0f}{ms['get-data'][1]:>8.0f}{len(shed):>6}{len(errors):>8}")
+
+
+if __name__ == "__main__":
+    main()
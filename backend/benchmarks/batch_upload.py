@@ -0,0 +1,60 @@
+"""Single-image uploads versus /api/upload-batch/ against a stubbed Vision client.
+
+    python -m benchmarks.batch_upload --images 8 --rounds 10
+"""
+
+import argparse
+import time
+from unittest import mock
+
+from benchmarks.support import StubFirebaseDB, StubVisionClient, make_capture, setup_django
+
+
+def run_single(client, images, rounds):
+    started = time.perf_counter()
+    for _ in range(rounds):
+        for image in images:
+            client.post("/api/upload/", {"image": image(), "type": "temperature", "roomId": "bench"})
+    return time.perf_counter() - started, rounds * len(images)
+
+
+def run_batch(client, images, rounds):
+    started = time.perf_counter()
+    for _ in range(rounds):
+        client.post("/api/upload-batch/", {
+            "image": [image() for image in images], "type": "temperature", "roomId": "bench",
+        })
+    return time.perf_counter() - started, rounds
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--images", type=int, default=8, help="captures per batch")
+    parser.add_argument("--rounds", type=int, default=10)
+    parser.add_argument("--rtt", type=float, default=0.08, help="stubbed Vision round-trip, seconds")
+    args = parser.parse_args()
+
+    setup_django()
+    from django.core.files.uploadedfile import SimpleUploadedFile
+    from django.test import Client
+    from sample_app_project import storage, views
+    from sample_app_project.ocr_engines import VisionOCREngine
+
+    content = make_capture()
+    images = [lambda i=i: SimpleUploadedFile(f"capture-{i}.jpg", content) for i in range(args.images)]
+    client = Client()
+
+    print(f"{args.images} captures x {args.rounds} rounds, Vision RTT {args.rtt * 1000:.0f} ms")
+    print(f"{'path':<8}{'requests/s':>12}{'images/s':>10}{'ms/image':>10}{'Vision RPCs':>13}")
+    for name, run in (("single", run_single), ("batch", run_batch)):
+        vision_client = StubVisionClient(rtt=args.rtt)
+        with mock.patch.object(views, "get_ocr_engine", return_value=VisionOCREngine(vision_client)), \
+                mock.patch.object(storage, "db_reference", StubFirebaseDB().reference):
+            elapsed, requests = run(client, images, args.rounds)
+        total_images = args.images * args.rounds
+        print(f"{name:<8}{requests / elapsed:>12.1f}{total_images / elapsed:>10.1f}"
+              f"{elapsed / total_images * 1000:>10.1f}{vision_client.calls:>13}")
+
+
+if __name__ == "__main__":
+    main()
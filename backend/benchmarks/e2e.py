@@ -0,0 +1,406 @@
+"""End-to-end load on localhost: signaling peers, OCR uploads and get-data polling.
+
+Starts the servers with their remote services stubbed:
+- a TURN credentials stub standing in for metered.live, in this process;
+- the video server (video_server:app from VIDEO_SERVER_DIR) under uvicorn in
+  production mode, fetching TURN credentials from the stub;
+- the Django backend under uvicorn with OCR and storage from
+  benchmarks.stub_services, which sleep --rtt seconds per call in place of
+  Vision and Firebase.
+
+Then runs two scenarios:
+- signaling: --peers WebSocket peers join /ws rooms of --room-size. The
+  first peer of each room sends --messages timestamped messages, which the
+  others time on arrival. Memory per connection is the video server's RSS
+  growth divided by the peer count. Then --turn-clients fetch
+  /api/turn-credentials at once.
+- ocr: for --duration seconds, --uploaders clients post multipart captures
+  to /api/upload/. Meanwhile --pollers poll /api/get-data/ every
+  --poll-interval seconds with If-None-Match.
+
+Each scenario reports throughput and p50/p95/p99 latency. The results are
+written as JSON together with the commit they ran on. --compare prints the
+change from an earlier result file:
+
+    python -m benchmarks.e2e --output before.json
+    python -m benchmarks.e2e --compare before.json
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import platform
+import subprocess
+import sys
+import threading
+import time
+from datetime import datetime, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from benchmarks.support import free_port, make_capture, percentile
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+VIDEO_SERVER_DIR = os.environ.get("VIDEO_SERVER_DIR", os.path.join(os.path.dirname(BACKEND_DIR),
+                                                                   "video-conferencing-app"))
+# Compared by --compare, and whether a higher value is better
+COMPARED = {"throughput": True, "p50_ms": False, "p95_ms": False, "p99_ms": False,
+            "bytes_per_connection": False}
+
+
+def summarize(latencies, elapsed, errors=0, **extra):
+    """Throughput and latency percentiles of one kind of request."""
+    summary = {"count": len(latencies), "errors": errors,
+               "throughput": round(len(latencies) / elapsed, 1) if elapsed else 0.0}
+    for pct in (50, 95, 99):
+        summary[f"p{pct}_ms"] = round(percentile(latencies, pct) * 1000, 2) if latencies else None
+    return {**summary, **extra}
+
+
+def rss_bytes(pid):
+    """Resident memory of a process, from /proc (Linux only; None elsewhere)."""
+    try:
+        with open(f"/proc/{pid}/status") as status:
+            for line in status:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1]) * 1024
+    except OSError:
+        pass
+    return None
+
+
+class StubTurnServer:
+    """Answers the metered.live credentials API from this process."""
+
+    def __init__(self):
+        self.hits = 0
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                stub.hits += 1
+                body = json.dumps([{"urls": "turn:127.0.0.1:3478", "username": "bench", "credential": "bench"}])
+                self.send_response(200)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(body)))
+                self.send_header("Cache-Control", "max-age=3600")
+                self.end_headers()
+                self.wfile.write(body.encode())
+
+            def log_message(self, *args):
+                pass
+
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.url = f"http://127.0.0.1:{self.server.server_port}/api/v1/turn/credentials"
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+
+    def close(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+def start_uvicorn(app, port, cwd, env):
+    command = [sys.executable, "-m", "uvicorn", app, "--host", "127.0.0.1", "--port", str(port),
+               "--log-level", "warning", "--backlog", "4096"]
+    # The servers print a line per join and leave
+    return subprocess.Popen(command, cwd=cwd, env=dict(os.environ, **env), stdout=subprocess.DEVNULL)
+
+
+def stop(process):
+    process.terminate()
+    try:
+        process.wait(timeout=30)
+    except subprocess.TimeoutExpired:
+        process.kill()
+        process.wait()
+
+
+async def wait_until_ready(client, url, timeout=30):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            await client.get(url)
+            return
+        except Exception:
+            await asyncio.sleep(0.2)
+    raise RuntimeError(f"{url} did not answer within {timeout} s")
+
+
+async def run_signaling(port, pid, args):
+    import httpx
+    import websockets
+
+    base = f"127.0.0.1:{port}"
+    async with httpx.AsyncClient(base_url=f"http://{base}", timeout=30) as client:
+        await wait_until_ready(client, "/health")
+        rss_before = rss_bytes(pid)
+
+        handshakes = asyncio.Semaphore(args.handshakes)
+        connect_latencies, connect_errors = [], 0
+
+        async def connect(index):
+            nonlocal connect_errors
+            room_id = f"room-{index // args.room_size}"
+            async with handshakes:
+                started = time.perf_counter()
+                try:
+                    websocket = await websockets.connect(f"ws://{base}/ws?roomId={room_id}", ping_interval=None,
+                                                         open_timeout=30)
+                except Exception:
+                    connect_errors += 1
+                    return None
+                connect_latencies.append(time.perf_counter() - started)
+                return room_id, websocket
+
+        started = time.perf_counter()
+        peers = [peer for peer in await asyncio.gather(*(connect(index) for index in range(args.peers)))
+                 if peer is not None]
+        connect_elapsed = time.perf_counter() - started
+        # Let the server finish registering the last peers before measuring it
+        await asyncio.sleep(0.5)
+        rss_after = rss_bytes(pid)
+
+        rooms = {}
+        for room_id, websocket in peers:
+            rooms.setdefault(room_id, []).append(websocket)
+        delivery, expected = [], 0
+
+        async def receive(websocket, count):
+            for _ in range(count):
+                message = await websocket.recv()
+                delivery.append(time.perf_counter() - float(message))
+
+        async def send(websocket):
+            for _ in range(args.messages):
+                await websocket.send(repr(time.perf_counter()))
+                await asyncio.sleep(args.message_interval)
+
+        tasks = []
+        for sender, *receivers in rooms.values():
+            expected += args.messages * len(receivers)
+            tasks += [receive(websocket, args.messages) for websocket in receivers]
+            tasks.append(send(sender))
+        started = time.perf_counter()
+        try:
+            await asyncio.wait_for(asyncio.gather(*tasks), args.messages * args.message_interval + 30)
+        except asyncio.TimeoutError:
+            pass
+        broadcast_elapsed = time.perf_counter() - started
+
+        turn_latencies, turn_errors = [], 0
+
+        async def fetch_turn():
+            nonlocal turn_errors
+            started = time.perf_counter()
+            try:
+                response = await client.get("/api/turn-credentials")
+                response.raise_for_status()
+            except Exception:
+                turn_errors += 1
+                return
+            turn_latencies.append(time.perf_counter() - started)
+
+        started = time.perf_counter()
+        await asyncio.gather(*(fetch_turn() for _ in range(args.turn_clients)))
+        turn_elapsed = time.perf_counter() - started
+
+        await asyncio.gather(*(websocket.close() for _, websocket in peers), return_exceptions=True)
+
+    memory = {"peers": len(peers), "rss_before_mb": None, "rss_after_mb": None, "bytes_per_connection": None}
+    if rss_before is not None and rss_after is not None and peers:
+        memory.update(rss_before_mb=round(rss_before / 2 ** 20, 1), rss_after_mb=round(rss_after / 2 ** 20, 1),
+                      bytes_per_connection=round((rss_after - rss_before) / len(peers)))
+    return {
+        "ws_connect": summarize(connect_latencies, connect_elapsed, connect_errors),
+        "ws_broadcast": summarize(delivery, broadcast_elapsed, expected - len(delivery)),
+        "ws_memory": memory,
+        "turn_credentials": summarize(turn_latencies, turn_elapsed, turn_errors),
+    }
+
+
+async def run_ocr(port, pid, args):
+    import httpx
+
+    capture = make_capture(size=(64, 32), fmt="PNG")
+    limits = httpx.Limits(max_connections=args.uploaders + args.pollers + 8)
+    async with httpx.AsyncClient(base_url=f"http://127.0.0.1:{port}", limits=limits, timeout=60) as client:
+        await wait_until_ready(client, "/api/room-cache/stats/")
+        deadline = time.monotonic() + args.duration
+        uploads, upload_errors = [], []
+        polls, poll_errors, statuses = [], [], {}
+
+        async def uploader(index):
+            while time.monotonic() < deadline:
+                started = time.perf_counter()
+                try:
+                    response = await client.post(
+                        "/api/upload/", data={"type": "temperature", "roomId": f"bench-{index}"},
+                        files={"image": ("capture.png", capture, "image/png")},
+                    )
+                    response.raise_for_status()
+                except Exception as e:
+                    upload_errors.append(e)
+                    continue
+                uploads.append(time.perf_counter() - started)
+
+        async def poller(index):
+            room_id, etag = f"bench-{index % max(1, args.uploaders)}", None
+            while time.monotonic() < deadline:
+                headers = {"If-None-Match": etag} if etag else {}
+                started = time.perf_counter()
+                try:
+                    response = await client.get("/api/get-data/", params={"roomId": room_id}, headers=headers)
+                except Exception as e:
+                    poll_errors.append(e)
+                    continue
+                polls.append(time.perf_counter() - started)
+                # 404 until the room's first upload is stored
+                statuses[response.status_code] = statuses.get(response.status_code, 0) + 1
+                if response.status_code >= 500:
+                    poll_errors.append(response.status_code)
+                etag = response.headers.get("ETag", etag)
+                await asyncio.sleep(args.poll_interval)
+
+        started = time.perf_counter()
+        await asyncio.gather(*(uploader(index) for index in range(args.uploaders)),
+                             *(poller(index) for index in range(args.pollers)))
+        elapsed = time.perf_counter() - started
+
+    rss = rss_bytes(pid)
+    return {
+        "upload": summarize(uploads, elapsed, len(upload_errors)),
+        "get_data": summarize(polls, elapsed, len(poll_errors),
+                              statuses={str(code): count for code, count in sorted(statuses.items())}),
+        "backend_memory": {"rss_mb": round(rss / 2 ** 20, 1) if rss is not None else None},
+    }
+
+
+def signaling(args):
+    turn = StubTurnServer()
+    port = free_port()
+    server = start_uvicorn("video_server:app", port, VIDEO_SERVER_DIR, {
+        "ENVIRONMENT": "production",
+        "METERED_API_KEY": "bench",
+        "METERED_TURN_URL": turn.url,
+        "WS_SEND_QUEUE_SIZE": str(max(64, args.messages)),
+    })
+    try:
+        results = asyncio.run(run_signaling(port, server.pid, args))
+    finally:
+        stop(server)
+        turn.close()
+    results["turn_credentials"]["upstream_fetches"] = turn.hits
+    return results
+
+
+def ocr(args):
+    port = free_port()
+    server = start_uvicorn("sample_app_project.asgi:application", port, BACKEND_DIR, {
+        "DJANGO_SETTINGS_MODULE": "sample_app_project.settings",
+        "ALLOWED_HOSTS": "127.0.0.1",
+        "OCR_ENGINE": "benchmarks.stub_services.StubOCREngine",
+        "MEASUREMENT_STORAGE": "benchmarks.stub_services.StubStorage",
+        "OCR_CACHE_BACKEND": "none",
+        "OCR_PREPROCESS": "False",
+        "STUB_RTT": str(args.rtt),
+        # Measure the upload path, not admission control
+        "UPLOAD_ROOM_RATE": "0",
+        "UPLOAD_CLIENT_RATE": "0",
+        "UPLOAD_MAX_CONCURRENT": str(max(1, args.uploaders)),
+    })
+    try:
+        return asyncio.run(run_ocr(port, server.pid, args))
+    finally:
+        stop(server)
+
+
+def git_commit():
+    try:
+        commit = subprocess.run(["git", "rev-parse", "HEAD"], cwd=BACKEND_DIR, capture_output=True, text=True,
+                                check=True).stdout.strip()
+        dirty = bool(subprocess.run(["git", "status", "--porcelain", "--untracked-files=no"], cwd=BACKEND_DIR,
+                                    capture_output=True, text=True).stdout.strip())
+    except (OSError, subprocess.CalledProcessError):
+        return None, None
+    return commit, dirty
+
+
+def print_results(results):
+    print(f"{'':<18}{'count':>8}{'per s':>9}{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}{'errors':>8}")
+    for name, summary in results.items():
+        if "throughput" in summary:
+            print(f"{name:<18}{summary['count']:>8}{summary['throughput']:>9.1f}"
+                  + "".join(f"{summary[key]:>9.2f}" if summary[key] is not None else f"{'-':>9}"
+                            for key in ("p50_ms", "p95_ms", "p99_ms"))
+                  + f"{summary['errors']:>8}")
+    memory = results.get("ws_memory")
+    if memory and memory["bytes_per_connection"] is not None:
+        print(f"video server RSS {memory['rss_before_mb']} -> {memory['rss_after_mb']} MB with {memory['peers']} "
+              f"peers: {memory['bytes_per_connection'] / 1024:.1f} KiB per connection")
+    if "turn_credentials" in results:
+        print(f"TURN upstream fetches: {results['turn_credentials']['upstream_fetches']}")
+    if "get_data" in results:
+        print(f"get-data statuses: {results['get_data']['statuses']}")
+
+
+def print_comparison(base, report):
+    """The change in each COMPARED value from ``base``, flagging regressions over 10%."""
+    print(f"\nchange from {(base.get('commit') or 'unknown')[:12]}:")
+    changed = sorted(key for key, value in report["args"].items() if base.get("args", {}).get(key) != value)
+    if changed:
+        print(f"  (run with different {', '.join(changed)}: the numbers are not comparable)")
+    results = report["results"]
+    for name, summary in results.items():
+        for key, higher_is_better in COMPARED.items():
+            old, new = base["results"].get(name, {}).get(key), summary.get(key)
+            if not old or new is None:
+                continue
+            change = (new - old) / old * 100
+            worse = change < -10 if higher_is_better else change > 10
+            print(f"  {name + '.' + key:<34}{old:>12g}{new:>12g}{change:>+9.1f}%{'  REGRESSION' if worse else ''}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--scenario", nargs="+", choices=("signaling", "ocr"), default=["signaling", "ocr"])
+    parser.add_argument("--peers", type=int, default=2000)
+    parser.add_argument("--room-size", type=int, default=2, help="peers per room; a consultation is two")
+    parser.add_argument("--messages", type=int, default=20, help="messages sent by the first peer of each room")
+    parser.add_argument("--message-interval", type=float, default=0.05)
+    parser.add_argument("--handshakes", type=int, default=100, help="WebSocket handshakes in flight at once")
+    parser.add_argument("--turn-clients", type=int, default=200)
+    parser.add_argument("--uploaders", type=int, default=32)
+    parser.add_argument("--pollers", type=int, default=64)
+    parser.add_argument("--poll-interval", type=float, default=0.5)
+    parser.add_argument("--rtt", type=float, default=0.05, help="seconds per stubbed Vision or Firebase call")
+    parser.add_argument("--duration", type=float, default=10)
+    parser.add_argument("--output", help="write the results here as JSON")
+    parser.add_argument("--compare", help="an earlier --output file to compare with")
+    args = parser.parse_args()
+
+    commit, dirty = git_commit()
+    report = {
+        "commit": commit,
+        "dirty": dirty,
+        "started_at": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpus": os.cpu_count(),
+        "args": {key: value for key, value in vars(args).items() if key not in ("output", "compare")},
+        "results": {},
+    }
+    for scenario in args.scenario:
+        report["results"].update(signaling(args) if scenario == "signaling" else ocr(args))
+
+    print_results(report["results"])
+    if args.compare:
+        with open(args.compare) as baseline:
+            print_comparison(json.load(baseline), report)
+    if args.output:
+        with open(args.output, "w") as output:
+            json.dump(report, output, indent=2)
+        print(f"\nwrote {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,143 @@
+"""Fuzzes the reading extractor with synthetic OCR strings and compares it with first-number extraction.
+
+Each case is a device reading wrapped in display noise: a clock, a date,
+a battery voltage, a memory slot, a serial number. It may be in °F or lb,
+and may be damaged the way OCR damages text: digits split by a space, a
+lost decimal point, or an O read for a 0. Half of the cases carry word
+boxes with the reading printed largest. Accuracy is the share of cases
+whose value, in the canonical unit, matches the truth to 0.05. Random
+printable strings are run last to check that nothing raises.
+
+    python -m benchmarks.extraction --cases 5000
+"""
+
+import argparse
+import random
+import re
+import string
+import time
+
+from benchmarks.support import percentile, setup_django
+
+LEGACY_NUMBER = re.compile(r"\d+\.\d+|\d+")
+
+NOISE = [
+    lambda rng: f"{rng.randint(0, 23):02d}:{rng.randint(0, 59):02d}",
+    lambda rng: f"{rng.randint(1, 28):02d}/{rng.randint(1, 12):02d}",
+    lambda rng: f"BAT {rng.uniform(2.4, 3.3):.1f}V",
+    lambda rng: f"{rng.randint(5, 100)}%",
+    lambda rng: f"MEM {rng.randint(1, 9)}",
+    lambda rng: f"SN {rng.randint(10000, 99999)}",
+    lambda rng: rng.choice(["TEMP", "WEIGHT", "HOLD", "AUTO", "STABLE", "BODY"]),
+]
+
+
+def legacy_extract(text):
+    """The value the old extract_numbers stored: the first number, never converted."""
+    numbers = LEGACY_NUMBER.findall(text)
+    return float(numbers[0]) if numbers else None
+
+
+def damage(reading, rng):
+    """``reading`` as OCR might misread it, and whether it was changed."""
+    kind = rng.random()
+    if kind < 0.1 and len(reading.split(".")[0]) >= 2:
+        return reading[0] + " " + reading[1:], True
+    if kind < 0.2 and "." in reading:
+        return reading.replace(".", ""), True
+    if kind < 0.3 and "0" in reading[1:]:
+        position = reading.index("0", 1)
+        return reading[:position] + "O" + reading[position + 1:], True
+    return reading, False
+
+
+def make_case(rng):
+    """``(text, words, capture_type, expected value)`` for one synthetic display."""
+    capture_type = rng.choice(["temperature", "weight"])
+    if capture_type == "temperature":
+        celsius = round(rng.uniform(35.0, 41.0), 1)
+        if rng.random() < 0.3:
+            reading = f"{celsius * 9 / 5 + 32:.1f}"
+            expected = round((float(reading) - 32) * 5 / 9, 1)
+            unit = rng.choice(["°F", " F", "F", " deg F"])
+        else:
+            reading, expected = f"{celsius:.1f}", celsius
+            unit = rng.choice(["°C", " C", "C", " °C", ""])
+    else:
+        kilograms = round(rng.uniform(3.0, 180.0), 1)
+        if rng.random() < 0.3:
+            reading = f"{kilograms / 0.45359237:.1f}"
+            expected = round(float(reading) * 0.45359237, 1)
+            unit = rng.choice([" lb", "lbs", " lbs", " LB"])
+        else:
+            reading, expected = f"{kilograms:.1f}", kilograms
+            unit = rng.choice([" kg", "kg", " KG", ""])
+    reading, _ = damage(reading, rng)
+
+    tokens = [rng.choice(NOISE)(rng) for _ in range(rng.randint(0, 3))]
+    position = rng.randint(0, len(tokens))
+    tokens.insert(position, reading + unit)
+    text = rng.choice([" ", "\n"]).join(tokens)
+
+    words = None
+    if rng.random() < 0.5:
+        words, top = [], 0
+        for index, token in enumerate(tokens):
+            height = 80 if index == position else rng.randint(10, 30)
+            for word in token.split():
+                words.append((word, (0, top, 20 * len(word), top + height)))
+            top += height + 5
+    return text, words, capture_type, expected
+
+
+def garbage(rng):
+    return "".join(rng.choice(string.printable + "°ºO|l") for _ in range(rng.randint(0, 60)))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--cases", type=int, default=5000)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    setup_django()
+    from sample_app_project.extraction import extract_measurement
+
+    rng = random.Random(args.seed)
+    cases = [make_case(rng) for _ in range(args.cases)]
+
+    legacy_correct = sum(
+        (value := legacy_extract(text)) is not None and abs(value - expected) < 0.05
+        for text, _, _, expected in cases
+    )
+
+    timings, correct, confidences = [], 0, {True: [], False: []}
+    for text, words, capture_type, expected in cases:
+        started = time.perf_counter()
+        measurement = extract_measurement(text, capture_type, words)
+        timings.append(time.perf_counter() - started)
+        ok = measurement is not None and abs(measurement.value - expected) < 0.05
+        correct += ok
+        if measurement is not None:
+            confidences[ok].append(measurement.confidence)
+
+    garbage_found = 0
+    for _ in range(args.cases):
+        text = garbage(rng)
+        for capture_type in ("temperature", "weight"):
+            garbage_found += extract_measurement(text, capture_type) is not None
+
+    def mean(values):
+        return sum(values) / len(values) if values else 0.0
+
+    count = len(cases)
+    print(f"{count} synthetic OCR strings (seed {args.seed})")
+    print(f"accuracy          first number {legacy_correct / count:.1%}  extractor {correct / count:.1%}")
+    print(f"confidence        right {mean(confidences[True]):.2f}  wrong {mean(confidences[False]):.2f}")
+    print(f"extract us        p50 {percentile(timings, 50) * 1e6:.0f}  p99 {percentile(timings, 99) * 1e6:.0f}"
+          f"  ({count / sum(timings):,.0f} strings/s)")
+    print(f"random garbage    {2 * args.cases} extractions, no errors, {garbage_found} readings found")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,88 @@
+"""Reading saves under concurrent uploads, with synchronous and write-behind Firebase writes.
+
+--threads request threads each save --saves readings to one of --rooms
+rooms through FirebaseStorage, --think seconds apart, against a stubbed
+Firebase with --rtt seconds per call. "sync" sends one update per save on the request thread,
+as before; "write-behind" queues the save and lets the buffer thread send
+coalesced multi-path updates. The drain time is how long close() took to
+write what was still pending at the end.
+
+    python -m benchmarks.firebase_writes --threads 32 --saves 50
+"""
+
+import argparse
+import random
+import threading
+import time
+from unittest import mock
+
+from benchmarks.support import StubFirebaseDB, percentile, setup_django
+
+
+def run(storage_module, storage, db, args):
+    latencies, lock = [], threading.Lock()
+
+    def uploader(seed):
+        rng = random.Random(seed)
+        samples = []
+        for _ in range(args.saves):
+            room = f"room-{rng.randrange(args.rooms)}"
+            capture_type = rng.choice(["temperature", "weight"])
+            started = time.perf_counter()
+            storage.save(room, capture_type, "36.8", "36.8°C")
+            samples.append(time.perf_counter() - started)
+            time.sleep(args.think)
+        with lock:
+            latencies.extend(samples)
+
+    with mock.patch.object(storage_module, "db_reference", db.reference):
+        threads = [threading.Thread(target=uploader, args=(seed,)) for seed in range(args.threads)]
+        started = time.perf_counter()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        elapsed = time.perf_counter() - started
+        drain_started = time.perf_counter()
+        if storage.write_buffer is not None:
+            storage.write_buffer.close()
+        drain = time.perf_counter() - drain_started
+    return latencies, elapsed, drain
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--threads", type=int, default=32)
+    parser.add_argument("--saves", type=int, default=50, help="saves per thread")
+    parser.add_argument("--rooms", type=int, default=100)
+    parser.add_argument("--think", type=float, default=0.005, help="seconds of other work between saves")
+    parser.add_argument("--rtt", type=float, default=0.03, help="seconds per Firebase call")
+    parser.add_argument("--max-delay", type=float, default=0.05)
+    args = parser.parse_args()
+
+    setup_django()
+    from django.test import override_settings
+    from sample_app_project import storage as storage_module
+    from sample_app_project.write_behind import WriteBehindBuffer
+
+    print(f"{args.threads} threads x {args.saves} saves over {args.rooms} rooms, {args.rtt * 1000:.0f} ms per call")
+    print(f"{'mode':<14}{'saves/s':>10}{'p50 ms':>9}{'p99 ms':>9}{'calls':>8}{'drain ms':>10}")
+    for mode in ("sync", "write-behind"):
+        db = StubFirebaseDB(rtt=args.rtt)
+        buffer = None
+        if mode == "write-behind":
+            buffer = WriteBehindBuffer(lambda updates: db.reference("/").update(updates), max_delay=args.max_delay)
+        with override_settings(FIREBASE_WRITE_BEHIND=False):
+            storage = storage_module.FirebaseStorage(buffer)
+        latencies, elapsed, drain = run(storage_module, storage, db, args)
+        print(f"{mode:<14}{len(latencies) / elapsed:>10,.0f}{percentile(latencies, 50) * 1000:>9.2f}"
+              f"{percentile(latencies, 99) * 1000:>9.2f}{db.calls:>8}{drain * 1000:>10.1f}")
+        if buffer is not None:
+            stats = buffer.stats()
+            print(f"  {stats['puts']} puts, {stats['coalesced']} coalesced, {stats['flushes']} flushes, "
+                  f"batch mean {stats['batch_size']['mean']:.1f} max {stats['batch_size']['max']}, "
+                  f"flush p50 {stats['flush_ms']['p50']:.1f} ms p99 {stats['flush_ms']['p99']:.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
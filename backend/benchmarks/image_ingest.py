@@ -0,0 +1,74 @@
+"""Upload preparation cost: the old decode/re-encode versus prepare_image.
+
+Synthetic captures at typical phone-camera sizes, saved as camera JPEGs.
+
+    python -m benchmarks.image_ingest --repeat 5
+"""
+
+import argparse
+import io
+import time
+
+from PIL import Image, ImageDraw
+
+from sample_app_project.image_ingest import prepare_image
+
+SIZES = {
+    "12MP 4032x3024": (4032, 3024),
+    "8MP 3264x2448": (3264, 2448),
+    "1080p 1920x1080": (1920, 1080),
+    "VGA 640x480": (640, 480),
+}
+
+
+def make_photo(size):
+    """A noisy gradient with a bright display panel, roughly photo-like."""
+    image = Image.merge("RGB", [
+        Image.linear_gradient("L").resize(size),
+        Image.effect_noise(size, 24),
+        Image.linear_gradient("L").rotate(90).resize(size),
+    ])
+    draw = ImageDraw.Draw(image)
+    width, height = size
+    draw.rectangle((width // 3, height // 3, 2 * width // 3, height // 2), fill=(210, 230, 200))
+    buffer = io.BytesIO()
+    image.save(buffer, format="JPEG", quality=92)
+    return buffer.getvalue()
+
+
+def legacy(content):
+    image = Image.open(io.BytesIO(content))
+    output = io.BytesIO()
+    image.save(output, format="JPEG")
+    return output.getvalue()
+
+
+def timed(fn, content, repeat):
+    best = float("inf")
+    for _ in range(repeat):
+        started = time.perf_counter()
+        output = fn(content)
+        best = min(best, time.perf_counter() - started)
+    return best, len(output)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--max-dimension", type=int, default=2048)
+    args = parser.parse_args()
+
+    print(f"{'capture':<18}{'input KB':>10}{'legacy ms':>11}{'fast ms':>9}{'speedup':>9}"
+          f"{'legacy KB':>11}{'fast KB':>9}")
+    for name, size in SIZES.items():
+        content = make_photo(size)
+        legacy_time, legacy_size = timed(legacy, content, args.repeat)
+        fast_time, fast_size = timed(
+            lambda data: prepare_image(data, max_dimension=args.max_dimension), content, args.repeat
+        )
+        print(f"{name:<18}{len(content) / 1024:>10.0f}{legacy_time * 1000:>11.1f}{fast_time * 1000:>9.1f}"
+              f"{legacy_time / fast_time:>8.1f}x{legacy_size / 1024:>11.0f}{fast_size / 1024:>9.0f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,150 @@
+"""MJPEG load test: hundreds of fast and slow viewers against a synthetic camera.
+
+Starts the stream server in a subprocess with STREAM_SOURCE=synthetic. Then
+it opens --fast viewers that read as fast as they can and --slow viewers
+throttled to --slow-rate bytes/s with a small receive buffer, like a phone
+on a poor link. Each class reports the frame rate and frame size it got,
+and /stream_stats gives the server's thread count. "asgi" is stream_asgi.py
+under uvicorn with its capped send buffer; "flask" is server.py on the
+threaded Werkzeug server.
+
+    python -m benchmarks.mjpeg_viewers --server asgi --fast 200 --slow 100
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import socket
+import subprocess
+import sys
+import time
+
+from benchmarks.support import free_port
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+BOUNDARY = b"--frame\r\n"
+
+
+def start_server(kind, port, args):
+    env = dict(os.environ, STREAM_SOURCE="synthetic", STREAM_FPS=str(args.fps),
+               STREAM_WIDTH=str(args.width), STREAM_HEIGHT=str(args.height))
+    if kind == "asgi":
+        command = [sys.executable, "stream_asgi.py", "--host", "127.0.0.1", "--port", str(port)]
+    else:
+        command = [sys.executable, "-m", "flask", "--app", "server", "run", "--port", str(port), "--with-threads"]
+    return subprocess.Popen(command, cwd=BACKEND_DIR, env=env,
+                            stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+
+
+async def fetch_json(port, path):
+    reader, writer = await asyncio.open_connection("127.0.0.1", port)
+    writer.write(f"GET {path} HTTP/1.1\r\nHost: localhost\r\nConnection: close\r\n\r\n".encode())
+    data = await reader.read()
+    writer.close()
+    return json.loads(data.split(b"\r\n\r\n", 1)[1])
+
+
+async def wait_until_ready(port, timeout=20):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            return await fetch_json(port, "/stream_stats")
+        except (OSError, ValueError, IndexError):
+            await asyncio.sleep(0.2)
+    raise RuntimeError("stream server did not start")
+
+
+async def viewer(port, duration, rate=None, stats=None):
+    """Reads /video_feed for ``duration`` seconds, at most ``rate`` bytes/s if given."""
+    loop = asyncio.get_running_loop()
+    sock = socket.socket()
+    if rate:
+        # A small receive window so the server feels this client's pace quickly
+        sock.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, 16 * 1024)
+    sock.setblocking(False)
+    # Raw socket reads: a StreamReader would drain the socket into its own buffer
+    await loop.sock_connect(sock, ("127.0.0.1", port))
+    await loop.sock_sendall(sock, b"GET /video_feed HTTP/1.1\r\nHost: localhost\r\n\r\n")
+    frames, received, tail = 0, 0, b""
+    started = time.monotonic()
+    try:
+        while time.monotonic() - started < duration:
+            chunk_size = int(rate * 0.05) if rate else 1 << 16
+            try:
+                chunk = await asyncio.wait_for(loop.sock_recv(sock, chunk_size), 1)
+            except asyncio.TimeoutError:
+                continue
+            if not chunk:
+                break
+            data = tail + chunk
+            frames += data.count(BOUNDARY)
+            tail = data[-(len(BOUNDARY) - 1):]
+            received += len(chunk)
+            if rate:
+                await asyncio.sleep(0.05)
+    finally:
+        sock.close()
+    elapsed = time.monotonic() - started
+    stats.append((frames / elapsed, received / max(frames, 1)))
+
+
+async def run(kind, port, args):
+    await wait_until_ready(port)
+    fast, slow = [], []
+    viewers = [viewer(port, args.duration, stats=fast) for _ in range(args.fast)]
+    viewers += [viewer(port, args.duration, rate=args.slow_rate, stats=slow) for _ in range(args.slow)]
+
+    async def sample_stats():
+        await asyncio.sleep(args.duration * 0.8)
+        return await fetch_json(port, "/stream_stats")
+
+    results = await asyncio.gather(sample_stats(), *viewers, return_exceptions=True)
+    server_stats = results[0]
+    errors = [result for result in results[1:] if isinstance(result, Exception)]
+    return fast, slow, server_stats, errors
+
+
+def summarize(name, stats):
+    if not stats:
+        return f"{name:<6}{0:>8}"
+    fps = sorted(fps for fps, _ in stats)
+    size = sum(size for _, size in stats) / len(stats)
+    return (f"{name:<6}{len(stats):>8}{sum(fps) / len(fps):>10.1f}{fps[len(fps) // 10]:>10.1f}"
+            f"{size / 1024:>12.1f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--server", choices=("asgi", "flask"), default="asgi")
+    parser.add_argument("--fast", type=int, default=200)
+    parser.add_argument("--slow", type=int, default=100)
+    parser.add_argument("--slow-rate", type=int, default=64 * 1024, help="bytes/s a slow viewer reads")
+    parser.add_argument("--duration", type=float, default=10)
+    parser.add_argument("--fps", type=float, default=15)
+    parser.add_argument("--width", type=int, default=640)
+    parser.add_argument("--height", type=int, default=480)
+    args = parser.parse_args()
+
+    port = free_port()
+    server = start_server(args.server, port, args)
+    try:
+        fast, slow, server_stats, errors = asyncio.run(run(args.server, port, args))
+    finally:
+        server.terminate()
+        server.wait(timeout=10)
+
+    print(f"{args.server}: {args.fast} fast + {args.slow} slow viewers ({args.slow_rate // 1024} KiB/s), "
+          f"{args.width}x{args.height} at {args.fps:g} fps, {args.duration:g} s")
+    print(f"{'class':<6}{'viewers':>8}{'mean fps':>10}{'p10 fps':>10}{'KiB/frame':>12}")
+    print(summarize("fast", fast))
+    print(summarize("slow", slow))
+    if isinstance(server_stats, dict):
+        print(f"server threads: {server_stats.get('threads')}, frames encoded: {server_stats.get('frames_encoded')}"
+              + (f", quality tiers: {server_stats['quality_tiers']}" if "quality_tiers" in server_stats else ""))
+    if errors:
+        print(f"{len(errors)} viewers failed, e.g. {errors[0]!r}")
+
+
+if __name__ == "__main__":
+    main()
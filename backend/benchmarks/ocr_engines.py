@@ -0,0 +1,70 @@
+"""Accuracy and latency of the OCR engines on the labeled seven-segment samples.
+
+    python -m benchmarks.ocr_engines                 # local engine only
+    python -m benchmarks.ocr_engines --engine vision --engine seven_segment
+
+The vision engine needs real Google credentials (GOOGLE_APPLICATION_CREDENTIALS).
+A reading counts as correct when the first number in the engine's text
+equals the label.
+"""
+
+import argparse
+import json
+import os
+import re
+import time
+
+from benchmarks.seven_segment_samples import SAMPLES_DIR
+from benchmarks.support import percentile, setup_django
+
+NUMBER = re.compile(r"-?\d+(?:\.\d+)?")
+
+
+def load_samples():
+    with open(os.path.join(SAMPLES_DIR, "labels.json")) as f:
+        labels = json.load(f)
+    samples = []
+    for name, label in sorted(labels.items()):
+        with open(os.path.join(SAMPLES_DIR, name), "rb") as f:
+            samples.append((name, f.read(), label))
+    return samples
+
+
+def evaluate(engine, samples):
+    latencies, correct, failures = [], 0, []
+    for name, content, label in samples:
+        started = time.perf_counter()
+        text = engine.detect_text(content)
+        latencies.append(time.perf_counter() - started)
+        match = NUMBER.search(text)
+        if match and match.group() == label:
+            correct += 1
+        else:
+            failures.append((name, label, text))
+    return latencies, correct, failures
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--engine", action="append", help="engine name or dotted path (repeatable)")
+    parser.add_argument("--verbose", action="store_true", help="list misread samples")
+    args = parser.parse_args()
+
+    setup_django()
+    from sample_app_project.ocr_engines import load_engine
+
+    samples = load_samples()
+    print(f"{len(samples)} labeled samples")
+    print(f"{'engine':<16}{'accuracy':>10}{'p50 ms':>9}{'p99 ms':>9}{'mean ms':>9}")
+    for name in args.engine or ["seven_segment"]:
+        engine = load_engine(name)
+        latencies, correct, failures = evaluate(engine, samples)
+        print(f"{name:<16}{correct / len(samples):>10.1%}{percentile(latencies, 50) * 1000:>9.2f}"
+              f"{percentile(latencies, 99) * 1000:>9.2f}{sum(latencies) / len(latencies) * 1000:>9.2f}")
+        if args.verbose:
+            for failure in failures:
+                print("  misread %s: expected %s, got %r" % failure)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,105 @@
+"""Display preprocessing cost and payoff on photos of the seven-segment samples.
+
+Each labeled sample is placed in a synthetic photo: a tilted device body
+on a cluttered table with a glare spot over the display. For every photo
+the benchmark times preprocess_display, compares payload sizes, and reads
+it with the local seven-segment engine with and without preprocessing.
+
+    python -m benchmarks.preprocess --size 1600x1200
+"""
+
+import argparse
+import io
+import random
+import time
+
+import numpy as np
+from PIL import Image
+
+from benchmarks.ocr_engines import NUMBER, load_samples
+from benchmarks.support import percentile, setup_django
+
+
+def make_scene(size, seed):
+    """A dim, noisy colour gradient standing in for the table under the device."""
+    rng = np.random.default_rng(seed)
+    width, height = size
+    ys, xs = np.mgrid[0:height, 0:width].astype(np.float32)
+    base = np.stack([xs / width, ys / height, 1 - xs / width], axis=-1) * rng.uniform(60, 120, 3)
+    base += rng.normal(0, 10, base.shape)
+    return np.clip(base, 0, 255).astype(np.uint8)
+
+
+def make_photo(content, seed, size=(1600, 1200)):
+    """JPEG of the display in ``content`` mounted in a device and photographed at an angle."""
+    rng = random.Random(seed)
+    display = Image.open(io.BytesIO(content)).convert("RGB")
+    scale = min(rng.uniform(0.3, 0.5) * size[0] / display.width, 0.4 * size[1] / display.height)
+    display = display.resize((int(display.width * scale), int(display.height * scale)), Image.BICUBIC)
+    pad = int(display.height * 0.35)
+    body = Image.new("RGB", (display.width + 2 * pad, display.height + 3 * pad), (55, 58, 62))
+    body.paste(display, (pad, pad))
+
+    # Glare: a soft bright spot somewhere over the display
+    ys, xs = np.mgrid[0:body.height, 0:body.width]
+    cx = pad + rng.uniform(0.2, 0.8) * display.width
+    cy = pad + rng.uniform(0.2, 0.8) * display.height
+    spot = rng.uniform(0.3, 0.6) * np.exp(-((xs - cx) ** 2 + (ys - cy) ** 2) / (2 * (0.3 * display.height) ** 2))
+    pixels = np.asarray(body).astype(np.float32)
+    body = Image.fromarray((pixels + (255 - pixels) * spot[..., None]).astype(np.uint8))
+
+    angle = rng.uniform(-7, 7)
+    mask = Image.new("L", body.size, 255).rotate(angle, expand=True)
+    body = body.rotate(angle, Image.BICUBIC, expand=True)
+    photo = Image.fromarray(make_scene(size, seed))
+    photo.paste(body, (rng.randint(0, size[0] - body.width), rng.randint(0, size[1] - body.height)), mask)
+    output = io.BytesIO()
+    photo.save(output, format="JPEG", quality=90)
+    return output.getvalue()
+
+
+def reads(engine, content, label):
+    match = NUMBER.search(engine.detect_text(content))
+    return bool(match) and match.group() == label
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--size", default="1600x1200", help="photo size, WIDTHxHEIGHT")
+    parser.add_argument("--max-dimension", type=int, default=1024)
+    parser.add_argument("--verbose", action="store_true", help="one line per photo")
+    args = parser.parse_args()
+    size = tuple(int(part) for part in args.size.split("x"))
+
+    setup_django()
+    from sample_app_project.ocr_engines import SevenSegmentOCREngine
+    from sample_app_project.preprocess import preprocess_display
+
+    engine = SevenSegmentOCREngine()
+    timings, sizes, raw_correct, correct = [], [], 0, 0
+    for index, (name, content, label) in enumerate(load_samples()):
+        photo = make_photo(content, index, size)
+        started = time.perf_counter()
+        prepared = preprocess_display(photo, max_dimension=args.max_dimension)
+        timings.append(time.perf_counter() - started)
+        sizes.append((len(photo), len(prepared)))
+        raw_ok, ok = reads(engine, photo, label), reads(engine, prepared, label)
+        raw_correct += raw_ok
+        correct += ok
+        if args.verbose:
+            print(f"{name:<20}{timings[-1] * 1000:>8.1f} ms{len(photo) / 1024:>8.0f} KB ->{len(prepared) / 1024:>6.1f} KB"
+                  f"  raw {'ok' if raw_ok else '--'}  preprocessed {'ok' if ok else '--'}")
+
+    count = len(sizes)
+    original = sum(before for before, _ in sizes)
+    prepared = sum(after for _, after in sizes)
+    print(f"{count} photos at {size[0]}x{size[1]}")
+    print(f"preprocess ms     p50 {percentile(timings, 50) * 1000:.1f}  p99 {percentile(timings, 99) * 1000:.1f}"
+          f"  mean {sum(timings) / count * 1000:.1f}")
+    print(f"payload KB        mean {original / count / 1024:.0f} -> {prepared / count / 1024:.1f}"
+          f"  ({1 - prepared / original:.1%} smaller)")
+    print(f"first-pass reads  raw {raw_correct / count:.0%}  preprocessed {correct / count:.0%}  (seven_segment engine)")
+
+
+if __name__ == "__main__":
+    main()
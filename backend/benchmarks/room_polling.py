@@ -0,0 +1,76 @@
+"""get-data polling cost with and without the room cache, against a stubbed Firebase.
+
+A doctor's dashboard polls one room while the patient side saves a reading
+every --write-every polls. "uncached" runs with ROOM_CACHE_TTL=0, so every
+poll reads Firebase as before; "cached" sends If-None-Match like a browser.
+The long-poll line measures how soon a held request sees a new reading.
+
+    python -m benchmarks.room_polling --polls 200
+"""
+
+import argparse
+import threading
+import time
+from unittest import mock
+
+from benchmarks.support import StubFirebaseDB, percentile, setup_django
+
+
+def run_polls(client, views, polls, write_every):
+    latencies, not_modified, etag = [], 0, None
+    for index in range(polls):
+        if index % write_every == 0:
+            views.save_reading("temperature", "36.8", f"{36 + index / 100:.2f}°C", "room-1")
+        headers = {"HTTP_IF_NONE_MATCH": etag} if etag else {}
+        started = time.perf_counter()
+        response = client.get("/api/get-data/", {"roomId": "room-1"}, **headers)
+        latencies.append(time.perf_counter() - started)
+        not_modified += response.status_code == 304
+        etag = response["ETag"]
+    return latencies, not_modified
+
+
+def long_poll_delay(client, views, delay=0.2):
+    etag = client.get("/api/get-data/", {"roomId": "room-1"})["ETag"]
+    written = []
+
+    def write():
+        views.save_reading("temperature", "36.8", "37.5°C", "room-1")
+        written.append(time.perf_counter())
+
+    threading.Timer(delay, write).start()
+    client.get("/api/get-data/", {"roomId": "room-1", "wait": 10}, HTTP_IF_NONE_MATCH=etag)
+    return time.perf_counter() - written[0]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--polls", type=int, default=200)
+    parser.add_argument("--write-every", type=int, default=25)
+    parser.add_argument("--rtt", type=float, default=0.03, help="stubbed Firebase round-trip, seconds")
+    args = parser.parse_args()
+
+    setup_django()
+    from django.test import Client
+    from sample_app_project import storage, views
+    from sample_app_project.room_cache import RoomCache
+
+    client = Client()
+    print(f"{args.polls} polls, a write every {args.write_every}, Firebase RTT {args.rtt * 1000:.0f} ms")
+    print(f"{'mode':<10}{'p50 ms':>8}{'p99 ms':>8}{'304s':>6}{'Firebase reads':>16}")
+    for name, ttl in (("uncached", 0), ("cached", 5)):
+        db = StubFirebaseDB(rtt=args.rtt)
+        with mock.patch.object(storage, "db_reference", db.reference), \
+                mock.patch.object(views, "get_storage", return_value=storage.FirebaseStorage()), \
+                mock.patch.object(views, "get_room_cache", return_value=RoomCache(ttl=ttl)):
+            latencies, not_modified = run_polls(client, views, args.polls, args.write_every)
+            reads = db.calls - args.polls // args.write_every - (args.polls % args.write_every > 0)
+            if name == "cached":
+                delay = long_poll_delay(client, views)
+        print(f"{name:<10}{percentile(latencies, 50) * 1000:>8.1f}{percentile(latencies, 99) * 1000:>8.1f}"
+              f"{not_modified:>6}{reads:>16}")
+    print(f"long-poll: new reading delivered {delay * 1000:.1f} ms after the write")
+
+
+if __name__ == "__main__":
+    main()
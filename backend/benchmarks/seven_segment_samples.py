@@ -0,0 +1,105 @@
+"""Renders the labeled seven-segment sample set used by tests and benchmarks.
+
+    python -m benchmarks.seven_segment_samples
+
+writes benchmarks/samples/seven_segment/*.jpg and labels.json. Samples
+mimic thermometer LCDs (dark segments on grey-green) and scale LEDs
+(bright segments on black) with noise, blur and varying contrast.
+"""
+
+import json
+import os
+import random
+
+from PIL import Image, ImageDraw, ImageFilter
+
+from sample_app_project.ocr_engines import SEGMENT_PATTERNS
+
+SAMPLES_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "samples", "seven_segment")
+
+DIGIT_SEGMENTS = {digit: pattern for pattern, digit in reversed(list(SEGMENT_PATTERNS.items()))}
+
+STYLES = {
+    "lcd": ((178, 190, 168), (34, 38, 32)),
+    "lcd_faded": ((150, 158, 140), (92, 98, 88)),
+    "led_red": ((12, 8, 8), (250, 50, 40)),
+    "led_green": ((6, 14, 8), (70, 240, 120)),
+}
+
+
+def segment_boxes(x, y, width, height, thickness):
+    """Rectangles for segments a-g of a digit cell at (x, y)."""
+    half = height // 2
+    gap = max(1, thickness // 4)
+    return (
+        (x + gap, y, x + width - gap, y + thickness),                                  # a
+        (x + width - thickness, y + gap, x + width, y + half - gap),                   # b
+        (x + width - thickness, y + half + gap, x + width, y + height - gap),          # c
+        (x + gap, y + height - thickness, x + width - gap, y + height),                # d
+        (x, y + half + gap, x + thickness, y + height - gap),                          # e
+        (x, y + gap, x + thickness, y + half - gap),                                   # f
+        (x + gap, y + half - thickness // 2, x + width - gap, y + half + thickness // 2),  # g
+    )
+
+
+def render(text, style="lcd", digit_height=70, noise=12, blur=0.6, seed=0):
+    """Draws ``text`` (digits, '.' and '-') as a seven-segment display."""
+    rng = random.Random(seed)
+    background, foreground = STYLES[style]
+    width, thickness, spacing = int(digit_height * 0.55), max(3, digit_height // 8), digit_height // 5
+    margin = digit_height // 2
+    canvas_width = margin * 2 + sum(spacing if char == "." else width + spacing for char in text)
+    image = Image.new("RGB", (canvas_width, digit_height + margin * 2), background)
+    draw = ImageDraw.Draw(image)
+
+    x, y = margin, margin
+    for char in text:
+        if char == ".":
+            draw.rectangle((x - spacing // 2, y + digit_height - thickness,
+                            x - spacing // 2 + thickness, y + digit_height), fill=foreground)
+            x += spacing
+            continue
+        pattern = DIGIT_SEGMENTS.get(char, (0, 0, 0, 0, 0, 0, 1))
+        for lit, box in zip(pattern, segment_boxes(x, y, width, digit_height, thickness)):
+            if lit:
+                draw.rectangle(box, fill=foreground)
+        x += width + spacing
+
+    if blur:
+        image = image.filter(ImageFilter.GaussianBlur(blur))
+    if noise:
+        grain = Image.effect_noise(image.size, noise).convert("RGB")
+        image = Image.blend(image, grain, 0.12 + rng.random() * 0.08)
+    return image
+
+
+def sample_labels(count=40, seed=7):
+    rng = random.Random(seed)
+    labels = []
+    for index in range(count):
+        if index % 2 == 0:
+            labels.append(f"{rng.uniform(35.0, 41.9):.1f}")
+        else:
+            labels.append(f"{rng.uniform(2.5, 150.0):.1f}")
+    return labels
+
+
+def main():
+    os.makedirs(SAMPLES_DIR, exist_ok=True)
+    rng = random.Random(11)
+    labels = {}
+    for index, text in enumerate(sample_labels()):
+        style = list(STYLES)[index % len(STYLES)]
+        image = render(text, style=style, digit_height=rng.choice((40, 56, 70, 96)),
+                       noise=rng.choice((6, 12, 20)), blur=rng.choice((0, 0.6, 1.0)), seed=index)
+        name = f"{index:02d}_{style}.jpg"
+        image.save(os.path.join(SAMPLES_DIR, name), quality=85)
+        labels[name] = text
+    with open(os.path.join(SAMPLES_DIR, "labels.json"), "w") as f:
+        json.dump(labels, f, indent=2, sort_keys=True)
+        f.write("\n")
+    print(f"Wrote {len(labels)} samples to {SAMPLES_DIR}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,89 @@
+"""Worker start-up cost: importing the URLconf with eager versus lazy clients.
+
+Each sample is a fresh interpreter that runs django.setup() and imports
+sample_app_project.urls, the way a gunicorn worker boots. "eager" also builds
+the Firebase app and Vision client right after import, as views.py used to at
+module level; "lazy" leaves them for the first request, whose extra cost is
+reported separately. A throwaway service account is generated so no real
+credentials are needed; nothing talks to the network.
+
+    python -m benchmarks.startup_time --repeat 5
+"""
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+import time
+
+from .support import percentile
+
+CHILD = r"""
+import json, os, sys, time
+started = time.perf_counter()
+os.environ.setdefault("DJANGO_SETTINGS_MODULE", "sample_app_project.settings")
+import django
+django.setup()
+import sample_app_project.urls
+imported = time.perf_counter()
+from sample_app_project import clients
+clients.get_firebase_app()
+clients.get_vision_client()
+ready = time.perf_counter()
+print(json.dumps({"import": imported - started, "clients": ready - imported}))
+"""
+
+
+def fake_service_account():
+    from cryptography.hazmat.primitives import serialization
+    from cryptography.hazmat.primitives.asymmetric import rsa
+
+    key = rsa.generate_private_key(public_exponent=65537, key_size=2048)
+    pem = key.private_bytes(serialization.Encoding.PEM, serialization.PrivateFormat.PKCS8,
+                            serialization.NoEncryption()).decode()
+    return json.dumps({
+        "type": "service_account",
+        "project_id": "startup-benchmark",
+        "private_key_id": "0",
+        "private_key": pem,
+        "client_email": "benchmark@startup-benchmark.iam.gserviceaccount.com",
+        "client_id": "0",
+        "token_uri": "https://oauth2.googleapis.com/token",
+    })
+
+
+def run_child(env):
+    started = time.perf_counter()
+    output = subprocess.run([sys.executable, "-c", CHILD], env=env, check=True,
+                            capture_output=True, text=True).stdout
+    timings = json.loads(output.strip().splitlines()[-1])
+    timings["process"] = time.perf_counter() - started
+    return timings
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    account = fake_service_account()
+    env = dict(os.environ, FIREBASE_CREDENTIALS_JSON=account, GOOGLE_APPLICATION_CREDENTIALS_JSON=account,
+               FIREBASE_DATABASE_URL="https://startup-benchmark.firebaseio.com")
+    samples = [run_child(env) for _ in range(args.repeat)]
+
+    def median(key):
+        return percentile([sample[key] for sample in samples], 50) * 1000
+
+    lazy = median("import")
+    eager = lazy + median("clients")
+    print(f"{args.repeat} cold starts, median ms")
+    print(f"{'mode':<8}{'import':>10}")
+    print(f"{'eager':<8}{eager:>10.1f}")
+    print(f"{'lazy':<8}{lazy:>10.1f}")
+    print(f"first request pays {median('clients'):.1f} ms once for client set-up "
+          f"(whole interpreter: {median('process'):.1f} ms)")
+
+
+if __name__ == "__main__":
+    main()
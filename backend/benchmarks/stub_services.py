@@ -0,0 +1,44 @@
+"""Remote services with a fixed delay, selected by dotted path in a benchmark's server process.
+
+    OCR_ENGINE=benchmarks.stub_services.StubOCREngine
+    MEASUREMENT_STORAGE=benchmarks.stub_services.StubStorage
+
+STUB_RTT sets the seconds each OCR call or storage call sleeps (default 0.05).
+"""
+
+import os
+import threading
+import time
+
+from sample_app_project.ocr_engines import OCREngine
+from sample_app_project.storage import MeasurementStorage
+
+
+def round_trip():
+    time.sleep(float(os.environ.get("STUB_RTT", "0.05")))
+
+
+class StubOCREngine(OCREngine):
+    def detect_text(self, content):
+        round_trip()
+        return "36.8 C"
+
+
+class StubStorage(MeasurementStorage):
+    """Latest reading per type, in this process's memory."""
+
+    def __init__(self):
+        self.rooms = {}
+        self._lock = threading.Lock()
+
+    def save_many(self, room_id, readings):
+        round_trip()
+        with self._lock:
+            room = self.rooms.setdefault(room_id, {})
+            for capture_type, raw_text, formatted_value in readings:
+                room[capture_type] = {"formatted_value": formatted_value, "raw_text": raw_text}
+
+    def latest(self, room_id):
+        round_trip()
+        with self._lock:
+            return dict(self.rooms.get(room_id, {}))
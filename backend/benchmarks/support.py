@@ -0,0 +1,110 @@
+"""Shared helpers for the backend benchmarks: Django setup and stubbed remote services."""
+
+import io
+import os
+import socket
+import time
+from types import SimpleNamespace
+
+from PIL import Image
+
+
+def setup_django():
+    os.environ.setdefault("DJANGO_SETTINGS_MODULE", "sample_app_project.settings")
+    # Stubbed Firebase writes stay on the calling thread, inside the benchmark's patches
+    os.environ.setdefault("FIREBASE_WRITE_BEHIND", "False")
+    import django
+    from django.test.utils import setup_test_environment
+
+    django.setup()
+    # Allows the test client's "testserver" host
+    setup_test_environment()
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def percentile(samples, pct):
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * pct / 100))]
+
+
+def make_capture(size=(640, 480), fmt="JPEG"):
+    """A plain synthetic capture; the stubbed OCR ignores pixel content."""
+    buffer = io.BytesIO()
+    Image.new("RGB", size, (40, 40, 40)).save(buffer, format=fmt)
+    return buffer.getvalue()
+
+
+class StubVisionClient:
+    """Stands in for vision.ImageAnnotatorClient with a fixed RPC cost.
+
+    Each call sleeps ``rtt`` seconds plus ``per_image`` seconds for every
+    image it carries, roughly what a WAN round-trip to Vision costs.
+    """
+
+    def __init__(self, text="36.8", rtt=0.08, per_image=0.005):
+        self.text = text
+        self.rtt = rtt
+        self.per_image = per_image
+        self.calls = 0
+
+    def _response(self):
+        return SimpleNamespace(
+            error=SimpleNamespace(message=""),
+            text_annotations=[SimpleNamespace(description=self.text)],
+        )
+
+    def text_detection(self, image):
+        self.calls += 1
+        time.sleep(self.rtt + self.per_image)
+        return self._response()
+
+    def batch_annotate_images(self, requests):
+        self.calls += 1
+        time.sleep(self.rtt + self.per_image * len(requests))
+        return SimpleNamespace(responses=[self._response() for _ in requests])
+
+
+class StubReference:
+    def __init__(self, db, path):
+        self.db = db
+        self.path = path.strip("/")
+
+    def set(self, value):
+        self.db.round_trip()
+        self.db.data[self.path] = value
+
+    def update(self, values):
+        self.db.round_trip()
+        for key, value in values.items():
+            self.db.data[f"{self.path}/{key}".strip("/")] = value
+
+    def get(self):
+        self.db.round_trip()
+        if self.path in self.db.data:
+            return self.db.data[self.path]
+        prefix = self.path + "/"
+        children = {
+            key[len(prefix):]: value for key, value in self.db.data.items() if key.startswith(prefix)
+        }
+        return children or None
+
+
+class StubFirebaseDB:
+    """Minimal stand-in for firebase_admin.db with a per-call round-trip cost."""
+
+    def __init__(self, rtt=0.03):
+        self.rtt = rtt
+        self.data = {}
+        self.calls = 0
+
+    def round_trip(self):
+        self.calls += 1
+        time.sleep(self.rtt)
+
+    def reference(self, path="/", app=None):
+        return StubReference(self, path)
@@ -0,0 +1,198 @@
+"""One camera capture shared by every MJPEG viewer.
+
+A single thread reads the camera, resizes and JPEG-encodes each frame once,
+and publishes it to a small ring of recent frames. Viewers wait for the next
+frame newer than the one they last sent; a viewer that falls behind skips
+straight to the newest frame instead of building a queue. The camera is
+opened when the first viewer arrives and released once nobody has watched
+for ``idle_timeout`` seconds.
+"""
+
+import os
+import threading
+import time
+from collections import deque
+
+import cv2
+import numpy as np
+
+
+class FrameBroadcaster:
+    def __init__(self, open_source, fps=15, width=None, height=None, quality=80, ring_size=4,
+                 idle_timeout=5.0, max_read_failures=30):
+        # open_source() returns something with read() -> (ok, frame) and release(), e.g. cv2.VideoCapture
+        self.open_source = open_source
+        self.fps = fps
+        self.width = width
+        self.height = height
+        self.quality = quality
+        self.idle_timeout = idle_timeout
+        self.max_read_failures = max_read_failures
+        self.frames = deque(maxlen=ring_size)
+        self.sequence = 0
+        self.subscribers = 0
+        self.frames_encoded = 0
+        self.frames_dropped = 0
+        self.running = False
+        self.listeners = []
+        self._thread = None
+        self._changed = threading.Condition()
+
+    def attach(self):
+        """Registers a viewer, starting the capture if it is not running."""
+        with self._changed:
+            self.subscribers += 1
+            if not self.running:
+                self.running = True
+                self._thread = threading.Thread(target=self._capture_loop, args=(self._thread,),
+                                                name="frame-capture", daemon=True)
+                self._thread.start()
+
+    def detach(self):
+        with self._changed:
+            self.subscribers -= 1
+
+    def latest(self):
+        """Returns ``(sequence, jpeg, frame)`` of the newest frame, or None before the first one."""
+        with self._changed:
+            return self.frames[-1] if self.frames else None
+
+    def encode(self, frame, quality=None):
+        params = [int(cv2.IMWRITE_JPEG_QUALITY), int(quality or self.quality)]
+        ok, buffer = cv2.imencode('.jpg', frame, params)
+        return buffer.tobytes() if ok else None
+
+    def subscribe(self, timeout=5.0):
+        """Yields encoded JPEG frames, always the newest one, until the capture stops."""
+        self.attach()
+        last_seen = 0
+        try:
+            while True:
+                with self._changed:
+                    if not self._changed.wait_for(lambda: self.sequence > last_seen or not self.running, timeout):
+                        return
+                    if self.sequence <= last_seen:
+                        return
+                    sequence, jpeg, _ = self.frames[-1]
+                    self.record_skipped(last_seen, sequence)
+                    last_seen = sequence
+                yield jpeg
+        finally:
+            self.detach()
+
+    def record_skipped(self, last_seen, sequence):
+        """Counts the frames a viewer skipped going from ``last_seen`` to ``sequence``."""
+        if last_seen:
+            with self._changed:
+                self.frames_dropped += sequence - last_seen - 1
+
+    def _capture_loop(self, previous):
+        if previous is not None:
+            # A capture that just went idle may still be releasing the camera
+            previous.join()
+        source = self.open_source()
+        interval = 1.0 / self.fps if self.fps else 0
+        failures, idle_since = 0, None
+        try:
+            while True:
+                started = time.monotonic()
+                with self._changed:
+                    if self.subscribers == 0:
+                        idle_since = idle_since or started
+                        if started - idle_since >= self.idle_timeout:
+                            # Decided under the lock, so a new viewer starts a fresh capture
+                            self.running = False
+                            return
+                    else:
+                        idle_since = None
+
+                success, frame = source.read()
+                if not success:
+                    failures += 1
+                    if failures >= self.max_read_failures:
+                        print("Error: Could not read frame from camera.")
+                        return
+                    time.sleep(interval or 0.01)
+                    continue
+                failures = 0
+                if self.width and self.height and (frame.shape[1], frame.shape[0]) != (self.width, self.height):
+                    frame = cv2.resize(frame, (self.width, self.height), interpolation=cv2.INTER_AREA)
+                jpeg = self.encode(frame)
+                if jpeg is not None:
+                    with self._changed:
+                        self.sequence += 1
+                        self.frames_encoded += 1
+                        # The raw frame is kept for viewers that need another quality
+                        self.frames.append((self.sequence, jpeg, frame))
+                        self._changed.notify_all()
+                        listeners = list(self.listeners)
+                    for listener in listeners:
+                        listener(self.sequence)
+
+                delay = interval - (time.monotonic() - started)
+                if delay > 0:
+                    time.sleep(delay)
+        finally:
+            source.release()
+            with self._changed:
+                # Unless a newer capture has already taken over
+                if self._thread is threading.current_thread():
+                    self.running = False
+                self._changed.notify_all()
+                listeners = list(self.listeners)
+            for listener in listeners:
+                listener(None)
+
+    def stats(self):
+        with self._changed:
+            return {
+                "running": self.running,
+                "subscribers": self.subscribers,
+                "frames_encoded": self.frames_encoded,
+                "frames_dropped": self.frames_dropped,
+            }
+
+
+class SyntheticSource:
+    """Stands in for cv2.VideoCapture with numbered test frames, no camera needed."""
+
+    def __init__(self, size=(640, 480)):
+        self.size = size
+        self.reads = 0
+        self.released = False
+        noise = np.random.default_rng(0).integers(0, 64, (size[1], size[0], 3), dtype=np.uint8)
+        self._background = cv2.GaussianBlur(noise, (0, 0), 3)
+
+    def read(self):
+        self.reads += 1
+        frame = self._background.copy()
+        cv2.putText(frame, str(self.reads), (10, self.size[1] // 2), cv2.FONT_HERSHEY_SIMPLEX, 2,
+                    (255, 255, 255), 3)
+        return True, frame
+
+    def release(self):
+        self.released = True
+
+
+def open_camera():
+    camera = cv2.VideoCapture(int(os.environ.get("CAMERA_INDEX", "0")))  # 0 is the default webcam
+    if not camera.isOpened():
+        print("Error: Camera could not be opened.")
+    return camera
+
+
+def from_environment(open_source=None):
+    """The broadcaster configured by STREAM_* (STREAM_SOURCE=synthetic runs without a camera).
+
+    Set STREAM_WIDTH and STREAM_HEIGHT together to resize; otherwise frames
+    keep the camera's resolution.
+    """
+    if open_source is None:
+        open_source = SyntheticSource if os.environ.get("STREAM_SOURCE") == "synthetic" else open_camera
+    return FrameBroadcaster(
+        open_source,
+        fps=float(os.environ.get("STREAM_FPS", "15")),
+        width=int(os.environ.get("STREAM_WIDTH", "0")) or None,
+        height=int(os.environ.get("STREAM_HEIGHT", "0")) or None,
+        quality=int(os.environ.get("STREAM_JPEG_QUALITY", "80")),
+    )
@@ -1,3 +1,10 @@
 from django.contrib import admin
 
-# Register your models here.
+from .models import Reading
+
+
+@admin.register(Reading)
+class ReadingAdmin(admin.ModelAdmin):
+    list_display = ("room_id", "capture_type", "formatted_value", "created_at")
+    list_filter = ("capture_type",)
+    search_fields = ("room_id",)
@@ -0,0 +1,29 @@
+# Generated by Django 5.2 on 2026-10-18 10:41
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Reading',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('room_id', models.CharField(max_length=128)),
+                ('capture_type', models.CharField(max_length=32)),
+                ('raw_text', models.TextField()),
+                ('formatted_value', models.CharField(max_length=64)),
+                ('created_at', models.DateTimeField(default=django.utils.timezone.now)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['room_id', 'capture_type', 'created_at'], name='reading_room_type_time'), models.Index(fields=['room_id', 'created_at'], name='reading_room_time')],
+            },
+        ),
+    ]
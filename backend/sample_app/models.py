@@ -1,3 +1,23 @@
 from django.db import models
+from django.utils import timezone
 
-# Create your models here.
+
+class Reading(models.Model):
+    """One OCR reading; rows are only ever appended, so a room keeps its full history."""
+
+    room_id = models.CharField(max_length=128)
+    capture_type = models.CharField(max_length=32)
+    raw_text = models.TextField()
+    formatted_value = models.CharField(max_length=64)
+    created_at = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        indexes = [
+            # Latest reading per type and per-type history
+            models.Index(fields=["room_id", "capture_type", "created_at"], name="reading_room_type_time"),
+            # Whole-room history across types
+            models.Index(fields=["room_id", "created_at"], name="reading_room_time"),
+        ]
+
+    def __str__(self):
+        return f"{self.room_id}/{self.capture_type}: {self.formatted_value}"
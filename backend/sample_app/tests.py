@@ -1,3 +1,1181 @@
-from django.test import TestCase
+import ast
+import asyncio
+import importlib.metadata
+import io
+import json
+import os
+import re
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from types import SimpleNamespace
+from unittest import mock
 
-# Create your tests here.
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+from django.core.files.uploadedfile import SimpleUploadedFile, TemporaryUploadedFile
+from django.test import AsyncClient, SimpleTestCase, TestCase, override_settings
+from PIL import Image
+from prometheus_client import REGISTRY
+
+from sample_app_project import clients, views
+from sample_app_project.admission import ConcurrencyLimiter, Overloaded, TokenBuckets, UploadAdmission
+from sample_app_project.extraction import extract_measurement
+from sample_app_project.image_ingest import parse_roi, prepare_image, sniff_format
+from sample_app_project.metrics import STAGES
+from sample_app_project.ocr_cache import FileBackend, MemoryBackend, OCRCache
+from sample_app_project.ocr_engines import SevenSegmentOCREngine, VisionOCREngine, annotated_text, load_engine
+from sample_app_project.ocr_jobs import DONE, FAILED, OCRJobQueue, QueueFull
+from sample_app_project.preprocess import preprocess_display
+from sample_app_project.notify import MeasurementNotifier
+from sample_app_project.offload import OffloadPool
+from sample_app_project.room_cache import RoomCache
+from sample_app_project.storage import DatabaseStorage, FirebaseStorage, InvalidKey, MeasurementStorage
+from sample_app_project.video_supervisor import VideoServerSupervisor, VideoServerUnavailable
+from sample_app_project.write_behind import BufferFull, WriteBehindBuffer
+
+
+# Upload tests share the process-wide rate limits; they would throttle each other
+UNLIMITED_UPLOADS = {"UPLOAD_ROOM_RATE": 0, "UPLOAD_CLIENT_RATE": 0}
+
+
+def make_image(fmt="PNG", size=(64, 32), color=(255, 255, 255)):
+    buffer = io.BytesIO()
+    Image.new("RGB", size, color).save(buffer, format=fmt)
+    return buffer.getvalue()
+
+
+def wait_for_job(queue, job_id, timeout=5):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        job = queue.get(job_id)
+        if job["status"] in (DONE, FAILED):
+            return job
+        time.sleep(0.01)
+    raise AssertionError(f"job {job_id} did not finish")
+
+
+class FakeStore:
+    def __init__(self):
+        self.saved = []
+
+    def __call__(self, capture_type, raw_text, formatted_value, room_id):
+        self.saved.append((room_id, capture_type, raw_text, formatted_value))
+
+
+class RequirementsTests(SimpleTestCase):
+    def test_project_imports_are_listed_in_requirements(self):
+        def normalize(name):
+            return re.sub(r"[-_.]+", "-", name).lower()
+
+        # requirements.txt is UTF-16; Render installs only what it lists
+        with open(os.path.join(settings.BASE_DIR, "requirements.txt"), encoding="utf-16") as requirements:
+            listed = {normalize(re.split(r"[=<>~!\[;\s]", line.strip(), 1)[0]) for line in requirements if line.strip()}
+
+        modules = set()
+        for path in (settings.BASE_DIR / "sample_app_project").glob("*.py"):
+            for node in ast.parse(path.read_text(encoding="utf-8")).body:
+                if isinstance(node, ast.Import):
+                    modules.update(alias.name.split(".")[0] for alias in node.names)
+                elif isinstance(node, ast.ImportFrom) and not node.level:
+                    modules.add(node.module.split(".")[0])
+
+        distributions = importlib.metadata.packages_distributions()
+        missing = {module for module in modules - set(sys.stdlib_module_names) - {"sample_app_project"}
+                   if not any(normalize(name) in listed for name in distributions.get(module, [module]))}
+        self.assertEqual(missing, set())
+
+
+class OCRJobQueueTests(SimpleTestCase):
+    def test_job_result_is_reported(self):
+        queue = OCRJobQueue(workers=1, max_queue=4)
+        job_id = queue.submit(lambda a, b: a + b, 2, 3)
+        job = wait_for_job(queue, job_id)
+        self.assertEqual(job["status"], DONE)
+        self.assertEqual(job["result"], 5)
+        queue.shutdown()
+
+    def test_failures_are_captured(self):
+        queue = OCRJobQueue(workers=1, max_queue=4)
+
+        def boom():
+            raise ValueError("vision unavailable")
+
+        job = wait_for_job(queue, queue.submit(boom))
+        self.assertEqual(job["status"], FAILED)
+        self.assertEqual(job["error"], "vision unavailable")
+        queue.shutdown()
+
+    def test_queue_depth_is_bounded(self):
+        queue = OCRJobQueue(workers=1, max_queue=1)
+        release = threading.Event()
+        running = queue.submit(release.wait)
+        while queue.get(running)["status"] != "running":
+            time.sleep(0.001)
+        queue.submit(release.wait)
+        with self.assertRaises(QueueFull):
+            queue.submit(release.wait)
+        release.set()
+        queue.shutdown()
+        self.assertEqual(queue.queue_depth(), 0)
+
+    def test_expired_results_are_pruned(self):
+        queue = OCRJobQueue(workers=1, max_queue=4, result_ttl=0)
+        first = queue.submit(lambda: None)
+        wait_for_job(queue, first)
+        time.sleep(0.01)
+        queue.submit(lambda: None)
+        self.assertIsNone(queue.get(first))
+        queue.shutdown()
+
+
+@override_settings(OCR_CACHE_BACKEND="none", **UNLIMITED_UPLOADS)
+class UploadImageTests(SimpleTestCase):
+    def setUp(self):
+        self.store = FakeStore()
+        self.queue = OCRJobQueue(workers=2, max_queue=4)
+        patches = [
+            mock.patch.object(views, "detect_text", return_value="36.8 C"),
+            mock.patch.object(views, "save_reading", self.store),
+            mock.patch.object(views, "get_job_queue", return_value=self.queue),
+        ]
+        for patcher in patches:
+            patcher.start()
+            self.addCleanup(patcher.stop)
+        self.addCleanup(self.queue.shutdown)
+
+    def upload(self, query="", **extra):
+        data = {"image": SimpleUploadedFile("capture.png", make_image()), "type": "temperature",
+                "roomId": "room-1", **extra}
+        return self.client.post("/api/upload/" + query, data)
+
+    def test_sync_upload_returns_the_reading(self):
+        response = self.upload()
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()["formatted_value"], "36.8°C")
+        self.assertEqual(self.store.saved, [("room-1", "temperature", "36.8 C", "36.8°C")])
+
+    def test_async_upload_returns_job_id_and_status_reports_result(self):
+        response = self.upload("?async=1")
+        self.assertEqual(response.status_code, 202)
+        job_id = response.json()["job_id"]
+        wait_for_job(self.queue, job_id)
+
+        status = self.client.get(response.json()["status_url"])
+        self.assertEqual(status.status_code, 200)
+        self.assertEqual(status.json()["status"], DONE)
+        self.assertEqual(status.json()["result"]["formatted_value"], "36.8°C")
+
+    def test_full_queue_sheds_load(self):
+        with mock.patch.object(self.queue, "submit", side_effect=QueueFull("busy")):
+            response = self.upload(**{"async": "true"})
+        self.assertEqual(response.status_code, 503)
+        self.assertEqual(response["Retry-After"], "1")
+
+    def test_unknown_job_is_404(self):
+        self.assertEqual(self.client.get("/api/jobs/missing/").status_code, 404)
+
+    def test_unusable_keys_are_400_and_a_full_write_buffer_is_503(self):
+        with mock.patch.object(views, "save_reading", side_effect=InvalidKey("bad roomId")):
+            self.assertEqual(self.upload(roomId="room.1").status_code, 400)
+        with mock.patch.object(views, "save_reading", side_effect=BufferFull("busy")):
+            response = self.upload()
+        self.assertEqual(response.status_code, 503)
+        self.assertEqual(response["Retry-After"], "1")
+
+
+class StubBatchVisionClient:
+    def __init__(self, texts):
+        self.texts = list(texts)
+        self.calls = []
+
+    def batch_annotate_images(self, requests):
+        self.calls.append(len(requests))
+        responses = []
+        for _ in requests:
+            text = self.texts.pop(0)
+            responses.append(SimpleNamespace(
+                error=SimpleNamespace(message="" if text is not None else "bad image"),
+                text_annotations=[SimpleNamespace(description=text)] if text else [],
+            ))
+        return SimpleNamespace(responses=responses)
+
+
+@override_settings(OCR_CACHE_BACKEND="none", **UNLIMITED_UPLOADS)
+class UploadBatchTests(SimpleTestCase):
+    def setUp(self):
+        self.stored = []
+        patcher = mock.patch.object(
+            views, "save_readings",
+            side_effect=lambda readings, room_id: self.stored.append((room_id, list(readings))),
+        )
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def post(self, count, types):
+        images = [SimpleUploadedFile(f"capture-{i}.png", make_image()) for i in range(count)]
+        return self.client.post("/api/upload-batch/", {"image": images, "type": types, "roomId": "room-1"})
+
+    def test_batch_is_sent_in_one_rpc_and_stored_in_one_write(self):
+        stub = StubBatchVisionClient(["36.8", "72.4 kg"])
+        with mock.patch.object(views, "get_ocr_engine", return_value=VisionOCREngine(stub)):
+            response = self.post(2, ["temperature", "weight"])
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(stub.calls, [2])
+        values = [result["formatted_value"] for result in response.json()["results"]]
+        self.assertEqual(values, ["36.8°C", "72.4 Kg"])
+        self.assertEqual(self.stored, [("room-1", [
+            ("temperature", "36.8", "36.8°C"), ("weight", "72.4 kg", "72.4 Kg"),
+        ])])
+
+    def test_large_batches_are_chunked_to_the_vision_limit(self):
+        stub = StubBatchVisionClient(["1"] * 20)
+        with mock.patch.object(views, "get_ocr_engine", return_value=VisionOCREngine(stub)):
+            detections = views.detect_text_batch([b"jpeg"] * 20)
+        self.assertEqual(stub.calls, [16, 4])
+        self.assertEqual(len(detections), 20)
+
+    def test_per_image_errors_do_not_fail_the_batch(self):
+        stub = StubBatchVisionClient([None, "70"])
+        with mock.patch.object(views, "get_ocr_engine", return_value=VisionOCREngine(stub)):
+            response = self.post(2, ["weight"])
+        results = response.json()["results"]
+        self.assertEqual(results[0]["error"], "bad image")
+        self.assertEqual(results[1]["formatted_value"], "70.0 Kg")
+        self.assertEqual(self.stored, [("room-1", [("weight", "70", "70.0 Kg")])])
+
+    def test_type_count_must_match(self):
+        response = self.post(3, ["weight", "temperature"])
+        self.assertEqual(response.status_code, 400)
+
+
+@override_settings(**UNLIMITED_UPLOADS)
+class OCRCacheTests(SimpleTestCase):
+    def test_memory_backend_evicts_least_recently_used(self):
+        backend = MemoryBackend(max_entries=2)
+        backend.set("a", 1)
+        backend.set("b", 2)
+        backend.get("a")
+        backend.set("c", 3)
+        self.assertEqual(backend.get("a"), 1)
+        self.assertIsNone(backend.get("b"))
+
+    def test_entries_expire(self):
+        for backend in (MemoryBackend(ttl=-1), FileBackend(tempfile.mkdtemp(), ttl=-1)):
+            backend.set("a", {"value": "x", "cost": 0})
+            self.assertIsNone(backend.get("a"))
+
+    def test_file_backend_is_shared_and_bounded(self):
+        directory = tempfile.mkdtemp()
+        writer, reader = FileBackend(directory, max_entries=2), FileBackend(directory, max_entries=2)
+        for key in ("a", "b", "c"):
+            writer.set(key, {"value": key, "cost": 0})
+        self.assertEqual(reader.get("c"), {"value": "c", "cost": 0})
+        self.assertEqual(len(reader), 2)
+
+    def test_duplicate_images_skip_detection(self):
+        cache = OCRCache(MemoryBackend())
+        detect = mock.Mock(return_value="36.8")
+        content = make_image("JPEG")
+        self.assertEqual(cache.get_or_detect(content, detect), "36.8")
+        self.assertEqual(cache.get_or_detect(content, detect), "36.8")
+        self.assertEqual(detect.call_count, 1)
+        stats = cache.stats()
+        self.assertEqual((stats["hits"], stats["misses"]), (1, 1))
+
+    def test_near_duplicates_hit_when_enabled(self):
+        cache = OCRCache(MemoryBackend(), phash_distance=4)
+        detect = mock.Mock(return_value="36.8")
+        image = Image.linear_gradient("L").convert("RGB")
+        first, second = io.BytesIO(), io.BytesIO()
+        image.save(first, format="JPEG", quality=95)
+        image.save(second, format="JPEG", quality=80)
+        cache.get_or_detect(first.getvalue(), detect)
+        cache.get_or_detect(second.getvalue(), detect)
+        self.assertEqual(detect.call_count, 1)
+        self.assertEqual(cache.stats()["near_hits"], 1)
+
+    def test_hits_keep_the_word_boxes(self):
+        detected = annotated_text([
+            SimpleNamespace(description="37.5\n36.8"),
+            SimpleNamespace(description="37.5", bounding_poly=box(0, 0, 40, 12)),
+            SimpleNamespace(description="36.8", bounding_poly=box(0, 20, 120, 80)),
+        ])
+        content = make_image("JPEG")
+        for backend in (MemoryBackend(), FileBackend(tempfile.mkdtemp())):
+            cache = OCRCache(backend)
+            readings = [extract_measurement(cache.get_or_detect(content, lambda content: detected), "temperature")
+                        for _ in range(2)]
+            self.assertEqual(cache.stats()["hits"], 1)
+            self.assertEqual([reading.value for reading in readings], [36.8, 36.8], type(backend).__name__)
+
+    def test_upload_uses_cache_and_reports_stats(self):
+        cache = OCRCache(MemoryBackend())
+        detect = mock.Mock(return_value="70")
+        with mock.patch.object(views, "get_ocr_cache", return_value=cache), \
+                mock.patch.object(views, "detect_text", detect), \
+                mock.patch.object(views, "save_reading"):
+            for _ in range(2):
+                self.client.post("/api/upload/", {
+                    "image": SimpleUploadedFile("capture.png", make_image()),
+                    "type": "weight", "roomId": "room-1",
+                })
+            stats = self.client.get("/api/ocr-cache/stats/").json()
+        self.assertEqual(detect.call_count, 1)
+        self.assertEqual(stats["hits"], 1)
+        self.assertTrue(stats["enabled"])
+
+
+@override_settings(**UNLIMITED_UPLOADS)
+class ImageIngestTests(SimpleTestCase):
+    def test_sniff_format(self):
+        self.assertEqual(sniff_format(make_image("JPEG")[:16]), "JPEG")
+        self.assertEqual(sniff_format(make_image("PNG")[:16]), "PNG")
+        self.assertIsNone(sniff_format(make_image("BMP")[:16]))
+
+    def test_small_jpeg_and_png_pass_through_unchanged(self):
+        for fmt in ("JPEG", "PNG"):
+            content = make_image(fmt)
+            self.assertEqual(prepare_image(content), content)
+
+    def test_other_formats_are_reencoded_as_jpeg(self):
+        self.assertEqual(sniff_format(prepare_image(make_image("BMP"))), "JPEG")
+
+    def test_oversized_images_are_downscaled(self):
+        prepared = prepare_image(make_image("JPEG", size=(4000, 3000)), max_dimension=1000)
+        width, height = Image.open(io.BytesIO(prepared)).size
+        self.assertTrue(500 <= width <= 1000)
+        self.assertEqual(width * 3, height * 4)
+        prepared = prepare_image(make_image("PNG", size=(4000, 3000)), max_dimension=1000)
+        self.assertEqual(Image.open(io.BytesIO(prepared)).size, (1000, 750))
+
+    def test_roi_is_cropped_before_encoding(self):
+        prepared = prepare_image(make_image("JPEG", size=(4000, 3000)), max_dimension=1000,
+                                 roi=(0.25, 0.5, 0.75, 1.0))
+        width, height = Image.open(io.BytesIO(prepared)).size
+        self.assertTrue(500 <= width <= 1000)
+        self.assertEqual(width * 3, height * 4)
+        prepared = prepare_image(make_image("PNG", size=(400, 300)), roi=(0, 0, 0.5, 0.5))
+        self.assertEqual(Image.open(io.BytesIO(prepared)).size, (200, 150))
+
+    def test_reads_from_temporary_uploaded_file(self):
+        content = make_image("JPEG", size=(3000, 2000))
+        upload = TemporaryUploadedFile("capture.jpg", "image/jpeg", len(content), None)
+        upload.write(content)
+        self.addCleanup(upload.close)
+        prepared = prepare_image(upload, max_dimension=600)
+        self.assertEqual(Image.open(io.BytesIO(prepared)).size, (375, 250))
+
+    def test_parse_roi(self):
+        self.assertEqual(parse_roi("0,0.1,0.5,1"), (0, 0.1, 0.5, 1))
+        self.assertIsNone(parse_roi(""))
+        for bad in ("0,0,1", "0.5,0,0.2,1", "a,b,c,d"):
+            with self.assertRaises(ValueError):
+                parse_roi(bad)
+
+    def test_invalid_roi_is_rejected_by_upload(self):
+        response = self.client.post("/api/upload/", {
+            "image": SimpleUploadedFile("capture.png", make_image()),
+            "type": "weight", "roomId": "room-1", "roi": "1,1,0,0",
+        })
+        self.assertEqual(response.status_code, 400)
+
+
+SAMPLES_DIR = os.path.join(settings.BASE_DIR, "benchmarks", "samples", "seven_segment")
+
+
+class OCREngineTests(SimpleTestCase):
+    def test_engines_are_chosen_by_name_or_dotted_path(self):
+        self.assertIsInstance(load_engine("seven_segment"), SevenSegmentOCREngine)
+        self.assertIsInstance(load_engine("sample_app_project.ocr_engines.VisionOCREngine"), VisionOCREngine)
+
+    def test_seven_segment_engine_reads_labeled_samples(self):
+        with open(os.path.join(SAMPLES_DIR, "labels.json")) as f:
+            labels = json.load(f)
+        engine = SevenSegmentOCREngine()
+        correct = 0
+        for name, expected in labels.items():
+            with open(os.path.join(SAMPLES_DIR, name), "rb") as f:
+                correct += engine.detect_text(f.read()) == expected
+        self.assertGreaterEqual(correct / len(labels), 0.9)
+
+    def test_seven_segment_engine_reports_no_text_on_blank_image(self):
+        self.assertEqual(SevenSegmentOCREngine().detect_text(make_image("PNG")), "No text found")
+
+    def test_batch_falls_back_to_single_detection(self):
+        engine = SevenSegmentOCREngine()
+        detections = engine.detect_text_batch([make_image("PNG"), b"not an image"])
+        self.assertEqual(detections[0], ("No text found", None))
+        self.assertIsNone(detections[1][0])
+
+
+def load_labeled_samples():
+    with open(os.path.join(SAMPLES_DIR, "labels.json")) as f:
+        labels = json.load(f)
+    for name, expected in sorted(labels.items()):
+        with open(os.path.join(SAMPLES_DIR, name), "rb") as f:
+            yield f.read(), expected
+
+
+class PreprocessTests(SimpleTestCase):
+    def test_output_is_a_small_one_bit_png(self):
+        content, _ = next(load_labeled_samples())
+        prepared = preprocess_display(content)
+        image = Image.open(io.BytesIO(prepared))
+        self.assertEqual((image.format, image.mode), ("PNG", "1"))
+        self.assertLess(len(prepared), len(content) / 4)
+
+    def test_preprocessed_samples_still_read(self):
+        engine = SevenSegmentOCREngine()
+        samples = list(load_labeled_samples())
+        correct = sum(engine.detect_text(preprocess_display(content)) == expected for content, expected in samples)
+        self.assertGreaterEqual(correct / len(samples), 0.9)
+
+    def test_tilted_display_in_a_larger_photo_is_cropped_and_read(self):
+        engine = SevenSegmentOCREngine()
+        for content, expected in list(load_labeled_samples())[:4]:
+            display = Image.open(io.BytesIO(content)).convert("RGB")
+            display = display.resize((display.width * 2, display.height * 2)).rotate(
+                4, expand=True, fillcolor=(50, 52, 56))
+            photo = Image.new("RGB", (1600, 1200), (50, 52, 56))
+            photo.paste(display, (500, 400))
+            buffer = io.BytesIO()
+            photo.save(buffer, format="JPEG", quality=90)
+
+            prepared = preprocess_display(buffer.getvalue())
+            self.assertLess(max(Image.open(io.BytesIO(prepared)).size), 700)
+            self.assertEqual(engine.detect_text(prepared), expected)
+
+    def test_blank_image_gives_no_text(self):
+        prepared = preprocess_display(make_image("JPEG", size=(640, 480)))
+        self.assertEqual(SevenSegmentOCREngine().detect_text(prepared), "No text found")
+
+    def test_upload_sends_the_preprocessed_image_to_ocr(self):
+        content, _ = next(load_labeled_samples())
+        detect = mock.Mock(return_value="36.8")
+        with mock.patch.object(views, "detect_text", detect), \
+                override_settings(OCR_CACHE_BACKEND="none", OCR_PREPROCESS=True):
+            views.process_image(content, "temperature", "room-1", store=FakeStore())
+        self.assertEqual(detect.call_args.args[0], preprocess_display(content))
+        with mock.patch.object(views, "detect_text", detect), \
+                override_settings(OCR_CACHE_BACKEND="none", OCR_PREPROCESS=False):
+            views.process_image(content, "temperature", "room-1", store=FakeStore())
+        self.assertEqual(detect.call_args.args[0], content)
+
+
+class ExtractionTests(SimpleTestCase):
+    def test_reading_is_found_next_to_a_time(self):
+        measurement = extract_measurement("12:45 36.8 C", "temperature")
+        self.assertEqual((measurement.value, measurement.unit), (36.8, "°C"))
+        self.assertGreater(measurement.confidence, 0.8)
+
+    def test_fahrenheit_and_pounds_are_converted(self):
+        self.assertEqual(extract_measurement("98.6°F", "temperature").value, 37.0)
+        weight = extract_measurement("154 lbs", "weight")
+        self.assertEqual((weight.value, weight.source_value, weight.source_unit), (69.9, 154.0, "lb"))
+
+    def test_ocr_damage_is_repaired_with_less_confidence(self):
+        for text in ("3 6.8", "368"):
+            self.assertEqual(extract_measurement(text, "temperature").value, 36.8, text)
+        self.assertEqual(extract_measurement("3O.5", "temperature").value, 30.5)
+        self.assertLess(extract_measurement("368", "temperature").confidence,
+                        extract_measurement("36.8", "temperature").confidence)
+
+    def test_numbers_labeled_with_other_units_are_skipped(self):
+        self.assertEqual(extract_measurement("BAT 3.0V 72.4", "weight").value, 72.4)
+        self.assertEqual(extract_measurement("SYS 120 mmHg 36.7", "temperature").value, 36.7)
+
+    def test_largest_printed_number_wins(self):
+        text = annotated_text([
+            SimpleNamespace(description="37.5\n36.8"),
+            SimpleNamespace(description="37.5", bounding_poly=box(0, 0, 40, 12)),
+            SimpleNamespace(description="36.8", bounding_poly=box(0, 20, 120, 80)),
+        ])
+        self.assertEqual(extract_measurement(text, "temperature").value, 36.8)
+        self.assertEqual(extract_measurement(str(text), "temperature").value, 37.5)
+
+    def test_implausible_or_unknown_gives_none(self):
+        self.assertIsNone(extract_measurement("1200", "temperature"))
+        self.assertIsNone(extract_measurement("36.8", "height"))
+        self.assertEqual(views.extract_numbers("No text found", "weight"), "No valid number found")
+
+
+def box(left, top, right, bottom):
+    corners = [(left, top), (right, top), (right, bottom), (left, bottom)]
+    return SimpleNamespace(vertices=[SimpleNamespace(x=x, y=y) for x, y in corners])
+
+
+class LazyClientTests(SimpleTestCase):
+    def test_missing_firebase_credentials_fail_on_first_use(self):
+        with mock.patch.object(clients, "_firebase_app", None), \
+                mock.patch.dict(os.environ, {"FIREBASE_CREDENTIALS_JSON": ""}):
+            with self.assertRaises(ImproperlyConfigured):
+                clients.get_firebase_app()
+
+    def test_vision_client_is_created_once_and_shared(self):
+        created = []
+
+        def build(**kwargs):
+            time.sleep(0.01)
+            created.append(object())
+            return created[-1]
+
+        seen = []
+        with mock.patch.object(clients, "_vision_client", None), \
+                mock.patch.dict(os.environ, {"GOOGLE_APPLICATION_CREDENTIALS_JSON": ""}), \
+                mock.patch("google.cloud.vision.ImageAnnotatorClient", side_effect=build):
+            threads = [threading.Thread(target=lambda: seen.append(clients.get_vision_client()))
+                       for _ in range(8)]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+        self.assertEqual(len(created), 1)
+        self.assertTrue(all(client is created[0] for client in seen))
+
+
+class DatabaseStorageTests(TestCase):
+    def setUp(self):
+        self.storage = DatabaseStorage()
+        for patcher in (
+            mock.patch.object(views, "get_storage", return_value=self.storage),
+            mock.patch.object(views, "get_room_cache", return_value=RoomCache()),
+        ):
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def test_readings_are_appended_and_latest_is_one_query(self):
+        self.storage.save("room-1", "temperature", "36.5", "36.5°C")
+        self.storage.save_many("room-1", [("temperature", "36.8", "36.8°C"), ("weight", "70", "70.0 Kg")])
+        self.storage.save("room-2", "weight", "80", "80.0 Kg")
+
+        with self.assertNumQueries(1):
+            latest = self.storage.latest("room-1")
+        self.assertEqual(latest["temperature"]["formatted_value"], "36.8°C")
+        self.assertEqual(latest["weight"]["formatted_value"], "70.0 Kg")
+
+        response = self.client.get("/api/get-data/", {"roomId": "room-1"})
+        data = response.json()["data"]
+        self.assertEqual([r["raw_text"] for r in data["temperature"]], ["36.8"])
+        self.assertEqual(self.client.get("/api/get-data/", {"roomId": "room-3"}).status_code, 404)
+
+    def test_history_pages_newest_first(self):
+        for value in range(5):
+            self.storage.save("room-1", "temperature", str(value), f"{value}.0°C")
+        self.storage.save("room-1", "weight", "70", "70.0 Kg")
+
+        seen, cursor = [], None
+        while True:
+            params = {"roomId": "room-1", "type": "temperature", "limit": 2}
+            if cursor:
+                params["cursor"] = cursor
+            page = self.client.get("/api/history/", params).json()
+            seen.extend(reading["raw_text"] for reading in page["data"])
+            cursor = page["next_cursor"]
+            if cursor is None:
+                break
+        self.assertEqual(seen, ["4", "3", "2", "1", "0"])
+
+        everything = self.client.get("/api/history/", {"roomId": "room-1"}).json()
+        self.assertEqual(len(everything["data"]), 6)
+        self.assertEqual(self.client.get("/api/history/", {"roomId": "room-1", "cursor": "junk"}).status_code, 400)
+
+    def test_history_needs_a_storage_that_keeps_it(self):
+        with mock.patch.object(views, "get_storage", return_value=FirebaseStorage()):
+            self.assertEqual(self.client.get("/api/history/", {"roomId": "room-1"}).status_code, 501)
+
+
+class FirebaseStorageTests(SimpleTestCase):
+    def test_latest_reads_the_room_in_one_call(self):
+        reference = mock.Mock()
+        reference.get.return_value = {"temperature": {"formatted_value": "36.8°C", "raw_text": "36.8"}}
+        with mock.patch("sample_app_project.storage.db_reference", return_value=reference) as db_reference:
+            latest = FirebaseStorage().latest("room-1")
+        db_reference.assert_called_once_with("/data/room-1")
+        self.assertEqual(latest, {"temperature": {"formatted_value": "36.8°C", "raw_text": "36.8"}})
+
+
+class FakeFirebaseDB:
+    """Flat ``{path: value}`` stand-in for the Realtime Database, recording each update."""
+
+    def __init__(self, failures=0, rejected=()):
+        self.data = {}
+        self.updates = []
+        self.failures = failures
+        # Paths that fail every update they are part of
+        self.rejected = set(rejected)
+
+    def update(self, updates):
+        if self.rejected & set(updates):
+            raise ValueError("invalid path")
+        if self.failures:
+            self.failures -= 1
+            raise ConnectionError("database unreachable")
+        self.updates.append(dict(updates))
+        self.data.update(updates)
+
+    def reference(self, path):
+        prefix = path.strip("/") + "/"
+        children = {key[len(prefix):]: value for key, value in self.data.items() if key.startswith(prefix)}
+        return SimpleNamespace(get=lambda: children or None)
+
+
+def wait_until(condition, timeout=5):
+    deadline = time.monotonic() + timeout
+    while not condition() and time.monotonic() < deadline:
+        time.sleep(0.005)
+    return condition()
+
+
+class WriteBehindTests(SimpleTestCase):
+    def buffer(self, db, **options):
+        buffer = WriteBehindBuffer(db.update, **{"max_delay": 60, **options})
+        self.addCleanup(buffer.close)
+        return buffer
+
+    def test_writes_to_a_path_are_coalesced_into_one_update(self):
+        db = FakeFirebaseDB()
+        buffer = self.buffer(db)
+        for value in ("36.5°C", "36.6°C", "36.8°C"):
+            buffer.put("data/room-1/temperature", value)
+        buffer.put("data/room-1/weight", "70.0 Kg")
+        self.assertTrue(buffer.flush())
+        self.assertEqual(db.updates, [{"data/room-1/temperature": "36.8°C", "data/room-1/weight": "70.0 Kg"}])
+        stats = buffer.stats()
+        self.assertEqual((stats["coalesced"], stats["flushes"], stats["batch_size"]["max"]), (2, 1, 2))
+
+    def test_flushes_when_the_batch_fills_or_the_delay_passes(self):
+        db = FakeFirebaseDB()
+        buffer = self.buffer(db, max_batch=3)
+        for room in range(3):
+            buffer.put(f"data/room-{room}/weight", "70.0 Kg")
+        self.assertTrue(wait_until(lambda: len(db.updates) == 1))
+
+        buffer = self.buffer(db, max_delay=0.02)
+        buffer.put("data/room-9/weight", "71.0 Kg")
+        self.assertTrue(wait_until(lambda: "data/room-9/weight" in db.data))
+
+    def test_failed_update_is_retried_without_losing_newer_writes(self):
+        db = FakeFirebaseDB(failures=1)
+        buffer = self.buffer(db)
+        buffer.put("data/room-1/temperature", "36.5°C")
+        buffer.put("data/room-1/weight", "70.0 Kg")
+        self.assertFalse(buffer.flush())
+        buffer.put("data/room-1/temperature", "36.8°C")
+        self.assertTrue(buffer.flush())
+        self.assertEqual(db.data, {"data/room-1/temperature": "36.8°C", "data/room-1/weight": "70.0 Kg"})
+        self.assertEqual(buffer.stats()["failures"], 1)
+
+    def test_rejected_path_is_isolated_then_dropped(self):
+        db = FakeFirebaseDB(rejected={"data/room-3/weight"})
+        buffer = self.buffer(db, max_delay=0.01, max_attempts=2, retry_delay=0.01)
+        buffer.put_many({f"data/room-{room}/weight": "70.0 Kg" for room in range(8)})
+        # Halved until the rejected path is sent alone; it fails twice and is dropped
+        self.assertTrue(wait_until(lambda: buffer.stats()["dropped"] == 1 and not buffer.stats()["pending"]))
+        self.assertEqual(set(db.data), {f"data/room-{room}/weight" for room in range(8) if room != 3})
+
+        # Batches grow back once writes succeed
+        buffer.put_many({f"data/room-{room}/temperature": "36.8°C" for room in range(8)})
+        self.assertTrue(wait_until(lambda: len(db.data) == 15))
+        self.assertEqual(len(db.updates[-1]), 8)
+
+    def test_full_buffer_sheds_after_max_wait(self):
+        buffer = self.buffer(FakeFirebaseDB(), max_pending=1, max_wait=0.05)
+        buffer.put("data/room-1/weight", "70.0 Kg")
+        with self.assertRaises(BufferFull):
+            buffer.put("data/room-2/weight", "71.0 Kg")
+        self.assertEqual(buffer.stats()["shed"], 1)
+
+    def test_storage_refuses_keys_firebase_rejects(self):
+        storage = FirebaseStorage(self.buffer(FakeFirebaseDB()))
+        for room_id, capture_type in (("room.1", "weight"), ("room/1", "weight"), ("room-1", ""),
+                                      ("room-1", None), ("room[1]", "weight")):
+            with self.assertRaises(InvalidKey):
+                storage.save(room_id, capture_type, "70", "70.0 Kg")
+        self.assertEqual(storage.write_buffer.stats()["puts"], 0)
+
+    def test_close_writes_what_is_pending(self):
+        db = FakeFirebaseDB()
+        buffer = self.buffer(db)
+        buffer.put("data/room-1/weight", "70.0 Kg")
+        self.assertTrue(buffer.close())
+        self.assertEqual(db.data, {"data/room-1/weight": "70.0 Kg"})
+        with self.assertRaises(RuntimeError):
+            buffer.put("data/room-1/weight", "71.0 Kg")
+
+    def test_storage_reads_its_own_unwritten_readings(self):
+        db = FakeFirebaseDB()
+        db.data["data/room-1/weight"] = {"formatted_value": "70.0 Kg", "raw_text": "70"}
+        storage = FirebaseStorage(self.buffer(db))
+        with mock.patch("sample_app_project.storage.db_reference", db.reference):
+            storage.save("room-1", "temperature", "36.8", "36.8°C")
+            latest = storage.latest("room-1")
+        self.assertEqual(set(latest), {"temperature", "weight"})
+        self.assertEqual(db.updates, [])
+        storage.write_buffer.flush()
+        self.assertEqual(db.data["data/room-1/temperature"], {"formatted_value": "36.8°C", "raw_text": "36.8"})
+
+
+class MemoryStorage(MeasurementStorage):
+    def __init__(self):
+        self.rooms = {}
+        self.reads = 0
+
+    def save_many(self, room_id, readings):
+        for capture_type, raw_text, formatted_value in readings:
+            self.rooms.setdefault(room_id, {})[capture_type] = {
+                "formatted_value": formatted_value, "raw_text": raw_text
+            }
+
+    def latest(self, room_id):
+        self.reads += 1
+        return dict(self.rooms.get(room_id, {}))
+
+
+class RoomCacheTests(SimpleTestCase):
+    def setUp(self):
+        self.storage = MemoryStorage()
+        self.cache = RoomCache(ttl=60)
+        for patcher in (
+            mock.patch.object(views, "get_storage", return_value=self.storage),
+            mock.patch.object(views, "get_room_cache", return_value=self.cache),
+        ):
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def test_polls_are_served_from_cache_until_a_write(self):
+        views.save_reading("temperature", "36.8", "36.8°C", "room-1")
+        first = self.client.get("/api/get-data/", {"roomId": "room-1"})
+        self.client.get("/api/get-data/", {"roomId": "room-1"})
+        self.assertEqual(self.storage.reads, 1)
+
+        unchanged = self.client.get("/api/get-data/", {"roomId": "room-1"}, HTTP_IF_NONE_MATCH=first["ETag"])
+        self.assertEqual(unchanged.status_code, 304)
+        self.assertEqual(self.storage.reads, 1)
+
+        views.save_readings([("weight", "70", "70.0 Kg")], "room-1")
+        changed = self.client.get("/api/get-data/", {"roomId": "room-1"}, HTTP_IF_NONE_MATCH=first["ETag"])
+        self.assertEqual(changed.status_code, 200)
+        self.assertNotEqual(changed["ETag"], first["ETag"])
+        self.assertEqual(changed.json()["data"]["weight"][0]["formatted_value"], "70.0 Kg")
+        self.assertEqual(self.storage.reads, 2)
+
+    async def test_long_poll_returns_when_a_reading_arrives(self):
+        client = AsyncClient()
+        views.save_reading("temperature", "36.8", "36.8°C", "room-1")
+        etag = (await client.get("/api/get-data/", {"roomId": "room-1"}))["ETag"]
+        writer = threading.Timer(0.1, views.save_reading, ("temperature", "37.2", "37.2°C", "room-1"))
+        writer.start()
+        started = time.monotonic()
+        response = await client.get("/api/get-data/", {"roomId": "room-1", "wait": 5}, headers={"If-None-Match": etag})
+        writer.join()
+        self.assertLess(time.monotonic() - started, 2)
+        self.assertEqual(response.json()["data"]["temperature"][0]["raw_text"], "37.2")
+
+    def test_rooms_written_but_never_read_keep_no_state(self):
+        for room in range(1000):
+            views.save_reading("temperature", "36.8", "36.8°C", f"write-only-{room}")
+        self.assertEqual((self.cache._versions, self.cache._holders), ({}, {}))
+
+    def test_a_load_that_raced_a_write_is_not_cached(self):
+        def loader(room_id):
+            # A reading lands while the stale value is being read
+            self.cache.invalidate(room_id)
+            return {"temperature": "stale"}
+
+        self.cache.get("room-1", loader)
+        self.assertEqual(self.cache.get("room-1", lambda room_id: {"temperature": "fresh"})[0],
+                         {"temperature": "fresh"})
+        self.assertEqual((self.cache._versions, self.cache._holders), ({}, {}))
+
+    async def test_long_poll_times_out_with_304(self):
+        client = AsyncClient()
+        views.save_reading("temperature", "36.8", "36.8°C", "room-1")
+        etag = (await client.get("/api/get-data/", {"roomId": "room-1"}))["ETag"]
+        started = time.monotonic()
+        response = await client.get("/api/get-data/", {"roomId": "room-1", "wait": 0.1}, headers={"If-None-Match": etag})
+        self.assertEqual(response.status_code, 304)
+        self.assertGreaterEqual(time.monotonic() - started, 0.1)
+
+    @override_settings(ROOM_CACHE_MAX_WAIT_WSGI=0.05)
+    def test_long_poll_under_wsgi_is_capped(self):
+        views.save_reading("temperature", "36.8", "36.8°C", "room-1")
+        etag = self.client.get("/api/get-data/", {"roomId": "room-1"})["ETag"]
+        started = time.monotonic()
+        response = self.client.get("/api/get-data/", {"roomId": "room-1", "wait": 5}, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        self.assertLess(time.monotonic() - started, 1)
+
+
+@override_settings(OCR_CACHE_BACKEND="none", OCR_PREPROCESS=False, **UNLIMITED_UPLOADS)
+class AsyncViewTests(SimpleTestCase):
+    def setUp(self):
+        self.store = FakeStore()
+
+        def slow_ocr(content):
+            time.sleep(0.2)
+            return "36.8 C"
+
+        patches = [
+            mock.patch.object(views, "detect_text", slow_ocr),
+            mock.patch.object(views, "save_reading", self.store),
+        ]
+        for patcher in patches:
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    async def test_concurrent_uploads_wait_on_ocr_together(self):
+        client = AsyncClient()
+
+        def upload():
+            return client.post("/api/upload/", {
+                "image": SimpleUploadedFile("capture.png", make_image()), "type": "temperature", "roomId": "room-1",
+            })
+
+        started = time.perf_counter()
+        responses = await asyncio.gather(*(upload() for _ in range(8)))
+        elapsed = time.perf_counter() - started
+        self.assertEqual({response.json()["formatted_value"] for response in responses}, {"36.8°C"})
+        self.assertEqual(len(self.store.saved), 8)
+        # Serialized OCR would take 8 x 0.2 s
+        self.assertLess(elapsed, 0.8)
+
+    async def test_long_poll_is_woken_by_a_write_from_another_thread(self):
+        cache = RoomCache(ttl=30)
+        readings = {"value": "36.5°C"}
+
+        async def loader(room_id):
+            return {"temperature": [readings["value"]]}
+
+        _, etag = await cache.aget("room-1", loader)
+
+        def write():
+            time.sleep(0.05)
+            readings["value"] = "36.8°C"
+            cache.invalidate("room-1")
+
+        threading.Thread(target=write).start()
+        started = time.perf_counter()
+        payload, new_etag = await cache.await_change("room-1", etag, loader, timeout=5)
+        self.assertLess(time.perf_counter() - started, 1)
+        self.assertNotEqual(new_etag, etag)
+        self.assertEqual(payload, {"temperature": ["36.8°C"]})
+
+    async def test_offload_pool_bounds_concurrent_calls(self):
+        pool = OffloadPool(workers=2)
+        peak, lock = [0], threading.Lock()
+
+        def call():
+            with lock:
+                peak[0] = max(peak[0], pool.stats()["running"])
+            time.sleep(0.05)
+
+        await asyncio.gather(*(pool.run(call) for _ in range(6)))
+        self.assertEqual(peak[0], 2)
+        self.assertEqual(pool.stats()["submitted"], 6)
+
+
+@override_settings(OCR_CACHE_BACKEND="none", OCR_PREPROCESS=False)
+class AdmissionTests(SimpleTestCase):
+    def admission(self, max_concurrent=2, max_queue=1, max_wait=0.2, room=(0, 1), client=(0, 1)):
+        admission = UploadAdmission(ConcurrencyLimiter(max_concurrent, max_queue, max_wait),
+                                    TokenBuckets(*room), TokenBuckets(*client))
+        patcher = mock.patch.object(views, "get_upload_admission", lambda: admission)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        return admission
+
+    def test_token_bucket_allows_a_burst_then_refuses(self):
+        buckets = TokenBuckets(rate=2, burst=3)
+        self.assertEqual([buckets.take("room-1") for _ in range(3)], [0, 0, 0])
+        self.assertAlmostEqual(buckets.take("room-1"), 0.5, places=1)
+        # Other keys have their own bucket
+        self.assertEqual(buckets.take("room-2"), 0)
+
+    async def test_limiter_queues_then_sheds(self):
+        limiter = ConcurrencyLimiter(max_concurrent=1, max_queue=1, max_wait=5)
+        release = asyncio.Event()
+        order = []
+
+        async def upload(name):
+            async with limiter.slot():
+                order.append(name)
+                await release.wait()
+
+        first = asyncio.create_task(upload("first"))
+        await asyncio.sleep(0)
+        second = asyncio.create_task(upload("second"))
+        await asyncio.sleep(0)
+        self.assertEqual((limiter.stats()["running"], limiter.stats()["queued"]), (1, 1))
+        with self.assertRaises(Overloaded) as caught:
+            async with limiter.slot():
+                pass
+        self.assertEqual(caught.exception.reason, "queue_full")
+        self.assertGreaterEqual(caught.exception.retry_after, 1)
+
+        release.set()
+        await asyncio.gather(first, second)
+        self.assertEqual(order, ["first", "second"])
+        self.assertEqual(limiter.stats()["running"], 0)
+
+    async def test_limiter_times_out_queued_waiters(self):
+        limiter = ConcurrencyLimiter(max_concurrent=1, max_queue=4, max_wait=0.05)
+        async with limiter.slot():
+            with self.assertRaises(Overloaded) as caught:
+                async with limiter.slot():
+                    pass
+        self.assertEqual(caught.exception.reason, "timeout")
+        self.assertEqual(limiter.stats()["queued"], 0)
+        self.assertEqual(limiter.stats()["running"], 0)
+
+    def test_client_refusal_does_not_use_the_room_budget(self):
+        admission = self.admission(room=(0.01, 2), client=(0.01, 1))
+        admission.check_rates("room-1", "10.0.0.1")
+        with self.assertRaises(Overloaded) as caught:
+            admission.check_rates("room-1", "10.0.0.1")
+        self.assertEqual(caught.exception.reason, "client_rate")
+        # The room's second token is still there for another client
+        admission.check_rates("room-1", "10.0.0.2")
+        self.assertEqual(admission.stats()["shed"], {"room_rate": 0, "client_rate": 1, "queue_full": 0, "timeout": 0})
+
+    def test_clients_behind_a_proxy_get_their_own_bucket(self):
+        self.admission(client=(0.01, 1))
+        with mock.patch.object(views, "detect_text", lambda content: "36.8 C"), \
+                mock.patch.object(views, "save_reading", FakeStore()):
+            def upload(forwarded_for):
+                # Every request arrives from the proxy's address
+                return self.client.post("/api/upload/", {
+                    "image": SimpleUploadedFile("capture.png", make_image()), "type": "temperature",
+                    "roomId": forwarded_for,
+                }, headers={"X-Forwarded-For": f"{forwarded_for}, 10.0.0.1"}, REMOTE_ADDR="10.0.0.1")
+
+            with override_settings(UPLOAD_TRUST_FORWARDED_FOR=True):
+                statuses = [upload(address).status_code for address in ("203.0.113.7", "198.51.100.4", "203.0.113.7")]
+            self.assertEqual(statuses, [200, 200, 429])
+            # Without trusting the header, distinct clients share the proxy's bucket
+            with override_settings(UPLOAD_TRUST_FORWARDED_FOR=False):
+                statuses = [upload(address).status_code for address in ("192.0.2.9", "192.0.2.10")]
+            self.assertEqual(statuses, [200, 429])
+
+    def test_room_over_its_rate_gets_429(self):
+        admission = self.admission(room=(0.1, 1))
+        store = FakeStore()
+        with mock.patch.object(views, "detect_text", lambda content: "36.8 C"), \
+                mock.patch.object(views, "save_reading", store):
+            def upload(room_id):
+                return self.client.post("/api/upload/", {
+                    "image": SimpleUploadedFile("capture.png", make_image()), "type": "temperature", "roomId": room_id,
+                })
+
+            self.assertEqual(upload("room-1").status_code, 200)
+            refused = upload("room-1")
+            self.assertEqual(upload("room-2").status_code, 200)
+        self.assertEqual(refused.status_code, 429)
+        self.assertGreaterEqual(int(refused["Retry-After"]), 1)
+        self.assertEqual(len(store.saved), 2)
+        self.assertEqual(admission.stats()["shed"]["room_rate"], 1)
+
+    async def test_uploads_beyond_the_queue_are_shed(self):
+        admission = self.admission(max_concurrent=1, max_queue=1, max_wait=5)
+
+        def slow_ocr(content):
+            time.sleep(0.3)
+            return "36.8 C"
+
+        client = AsyncClient()
+
+        def upload(index):
+            return client.post("/api/upload/", {
+                "image": SimpleUploadedFile("capture.png", make_image()), "type": "temperature",
+                "roomId": f"room-{index}",
+            })
+
+        with mock.patch.object(views, "detect_text", slow_ocr), mock.patch.object(views, "save_reading", FakeStore()):
+            responses = await asyncio.gather(*(upload(index) for index in range(4)))
+        self.assertEqual(sorted(response.status_code for response in responses), [200, 200, 429, 429])
+        stats = admission.stats()
+        self.assertEqual(stats["shed"]["queue_full"], 2)
+        self.assertEqual(stats["admitted"], 2)
+
+        response = await client.get("/api/admission/stats/")
+        self.assertEqual(response.json()["shed"]["queue_full"], 2)
+
+
+@override_settings(OCR_CACHE_BACKEND="none", OCR_PREPROCESS=False, **UNLIMITED_UPLOADS)
+class MetricsTests(SimpleTestCase):
+    def upload(self, client):
+        with mock.patch.object(views, "detect_text", lambda content: "36.8 C"), \
+                mock.patch.object(views, "save_reading", FakeStore()):
+            return client.post("/api/upload/", {
+                "image": SimpleUploadedFile("capture.png", make_image()), "type": "temperature", "roomId": "metrics",
+            })
+
+    def test_upload_stages_are_recorded(self):
+        def count(stage):
+            return REGISTRY.get_sample_value("ocr_stage_seconds_count", {"stage": stage}) or 0
+
+        before = {stage: count(stage) for stage in STAGES}
+        self.assertEqual(self.upload(self.client).status_code, 200)
+        self.assertEqual({stage: count(stage) - before[stage] for stage in STAGES}, dict.fromkeys(STAGES, 1))
+
+        response = self.client.get("/metrics")
+        self.assertEqual(response.status_code, 200)
+        body = response.content.decode()
+        self.assertIn('ocr_stage_seconds_bucket{le="0.0005",stage="ocr"}', body)
+        self.assertIn('upload_admission_shed_total{reason="queue_full"}', body)
+
+    @override_settings(METRICS_SERVER_TIMING=True)
+    def test_server_timing_header_lists_the_spans(self):
+        response = self.upload(self.client)
+        stages = [entry.split(";")[0] for entry in response["Server-Timing"].split(", ")]
+        self.assertEqual(stages, ["decode", "ocr", "extract", "store", "total"])
+
+    def test_no_server_timing_header_by_default(self):
+        self.assertNotIn("Server-Timing", self.upload(self.client))
+
+    def test_importing_does_not_need_settings(self):
+        env = {key: value for key, value in os.environ.items() if key != "DJANGO_SETTINGS_MODULE"}
+        result = subprocess.run([sys.executable, "-c", "import sample_app_project.metrics"], cwd=settings.BASE_DIR,
+                                env=env, capture_output=True, text=True)
+        self.assertEqual(result.returncode, 0, result.stderr)
+
+
+class MeasurementNotifierTests(SimpleTestCase):
+    def test_readings_are_posted_with_the_token(self):
+        received = []
+
+        class Hook(BaseHTTPRequestHandler):
+            def do_POST(self):
+                body = self.rfile.read(int(self.headers["Content-Length"]))
+                received.append((self.headers["X-Notify-Token"], json.loads(body)))
+                self.send_response(200)
+                self.send_header("Content-Length", "0")
+                self.end_headers()
+
+            def log_message(self, *args):
+                pass
+
+        server = ThreadingHTTPServer(("127.0.0.1", 0), Hook)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        self.addCleanup(server.shutdown)
+
+        notifier = MeasurementNotifier(f"http://127.0.0.1:{server.server_port}/internal/measurements", "secret")
+        notifier.publish("room-1", [("temperature", "36.8", "36.8°C")])
+        deadline = time.monotonic() + 5
+        while not received and time.monotonic() < deadline:
+            time.sleep(0.01)
+
+        token, body = received[0]
+        self.assertEqual(token, "secret")
+        self.assertEqual(body["events"][0]["roomId"], "room-1")
+        self.assertEqual(body["events"][0]["formattedValue"], "36.8°C")
+
+    def test_saving_a_reading_notifies_the_room(self):
+        with mock.patch.object(views, "get_storage", return_value=MemoryStorage()), \
+                mock.patch.object(views, "notify_readings") as notify:
+            views.save_readings([("weight", "70", "70.0 Kg")], "room-1")
+        notify.assert_called_once_with("room-1", [("weight", "70", "70.0 Kg")])
+
+
+VIDEO_APP_DIR = os.path.join(settings.BASE_DIR.parent, "video-conferencing-app")
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+class VideoServerSupervisorTests(SimpleTestCase):
+    def supervisor(self, command=None, **options):
+        port = free_port()
+        command = command or [sys.executable, "-m", "uvicorn", "server.main:app", "--host", "127.0.0.1",
+                              "--port", str(port), "--log-level", "warning"]
+        supervisor = VideoServerSupervisor(command, f"http://127.0.0.1:{port}/health", cwd=VIDEO_APP_DIR,
+                                           **options)
+        self.addCleanup(supervisor.stop)
+        return supervisor
+
+    def test_concurrent_calls_start_one_child_within_the_timeout(self):
+        supervisor = self.supervisor(start_timeout=10)
+        results = []
+        threads = [threading.Thread(target=lambda: results.append(supervisor.ensure_running())) for _ in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(supervisor.starts, 1)
+        self.assertEqual(len({result["pid"] for result in results}), 1)
+        self.assertEqual(sum(result["status"] == "started" for result in results), 1)
+        self.assertLess(supervisor.last_startup, 10)
+
+        started = time.perf_counter()
+        self.assertEqual(supervisor.ensure_running()["status"], "running")
+        self.assertLess(time.perf_counter() - started, 0.05)
+
+    def test_workers_sharing_a_port_start_one_child(self):
+        port = free_port()
+        command = [sys.executable, "-m", "uvicorn", "server.main:app", "--host", "127.0.0.1", "--port", str(port),
+                   "--log-level", "warning"]
+        lock_file = os.path.join(tempfile.mkdtemp(), "video-server.lock")
+        # One supervisor per worker process, as each worker builds its own
+        workers = [VideoServerSupervisor(command, f"http://127.0.0.1:{port}/health", cwd=VIDEO_APP_DIR,
+                                         start_timeout=10, lock_file=lock_file) for _ in range(3)]
+        for supervisor in workers:
+            self.addCleanup(supervisor.stop)
+        results = []
+        threads = [threading.Thread(target=lambda supervisor=supervisor: results.append(supervisor.ensure_running()))
+                   for supervisor in workers]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(sum(supervisor.starts for supervisor in workers), 1)
+        self.assertEqual(sorted(result["status"] for result in results), ["external", "external", "started"])
+
+    def test_crashed_child_is_restarted(self):
+        supervisor = self.supervisor(restart_delay=0.05)
+        first = supervisor.ensure_running()["pid"]
+        supervisor.process.kill()
+        self.assertTrue(wait_until(lambda: supervisor.restarts == 1 and supervisor.probe(), timeout=10))
+        self.assertNotEqual(supervisor.ensure_running()["pid"], first)
+        self.assertEqual(supervisor.starts, 2)
+
+    def test_child_exiting_on_start_is_reported(self):
+        supervisor = self.supervisor([sys.executable, "-c", "raise SystemExit(3)"], restart_delay=60)
+        with self.assertRaisesMessage(VideoServerUnavailable, "code 3"):
+            supervisor.ensure_running()
+
+    def test_restarts_stop_after_repeated_failed_starts(self):
+        supervisor = self.supervisor([sys.executable, "-c", "raise SystemExit(3)"], restart_delay=0.01,
+                                     max_failed_starts=3)
+        with self.assertRaises(VideoServerUnavailable):
+            supervisor.ensure_running()
+        self.assertTrue(wait_until(lambda: supervisor.starts == 3 and supervisor.process is None, timeout=10))
+        time.sleep(0.3)
+        self.assertEqual(supervisor.starts, 3)
+
+    def test_missed_probe_does_not_restart_a_live_child(self):
+        supervisor = self.supervisor(healthy_for=0, max_failed_probes=3)
+        pid = supervisor.ensure_running()["pid"]
+        with mock.patch.object(supervisor, "probe", return_value=False):
+            for _ in range(2):
+                status = supervisor.ensure_running()
+                self.assertEqual((status["status"], status["pid"]), ("unresponsive", pid))
+        self.assertEqual(supervisor.ensure_running()["status"], "running")
+        self.assertEqual((supervisor.starts, supervisor.process.pid), (1, pid))
+
+    def test_start_stream_view_reports_the_server_state(self):
+        supervisor = mock.Mock()
+        supervisor.ensure_running.return_value = {"status": "running", "pid": 42}
+        with mock.patch.object(views, "get_video_supervisor", return_value=supervisor):
+            self.assertEqual(self.client.get("/api/start-stream/").json()["status"], "running")
+            supervisor.ensure_running.side_effect = VideoServerUnavailable("not healthy")
+            self.assertEqual(self.client.get("/api/start-stream/").status_code, 503)
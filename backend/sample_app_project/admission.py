@@ -0,0 +1,288 @@
+"""Admission control for the OCR upload endpoints.
+
+A burst of uploads would otherwise start as many Vision calls as there are
+requests and let them all time out together. An upload first takes a token
+from its roomId's bucket and its client's bucket, so one kiosk or one room
+cannot flood the rest. It then needs one of ``max_concurrent`` slots. Up to
+``max_queue`` uploads wait for a slot, first come first served, for at most
+``max_wait`` seconds. Any upload turned away is answered at once with 429
+and a Retry-After, rather than piling up behind the others.
+"""
+
+import asyncio
+import math
+import threading
+import time
+from collections import OrderedDict, deque
+from contextlib import asynccontextmanager, contextmanager
+
+from django.conf import settings
+from django.core.signals import setting_changed
+from django.dispatch import receiver
+
+
+class Overloaded(Exception):
+    """The upload was shed; retry after ``retry_after`` seconds."""
+
+    def __init__(self, message, retry_after, reason):
+        super().__init__(message)
+        self.retry_after = retry_after
+        self.reason = reason
+
+
+class TokenBuckets:
+    """One token bucket per key: ``rate`` tokens a second, holding at most ``burst``."""
+
+    def __init__(self, rate, burst, max_keys=10000):
+        self.rate = rate
+        self.burst = burst
+        self.max_keys = max_keys
+        # key -> (tokens, updated_at), least recently used first
+        self._buckets = OrderedDict()
+        self._lock = threading.Lock()
+
+    def take(self, key):
+        """Takes a token for ``key``; returns 0, or the seconds until one is available."""
+        if self.rate <= 0:
+            return 0.0
+        now = time.monotonic()
+        with self._lock:
+            tokens, updated_at = self._buckets.pop(key, (self.burst, now))
+            tokens = min(self.burst, tokens + (now - updated_at) * self.rate)
+            wait = 0.0
+            if tokens >= 1:
+                tokens -= 1
+            else:
+                wait = (1 - tokens) / self.rate
+            self._buckets[key] = (tokens, now)
+            while len(self._buckets) > self.max_keys:
+                # A bucket unused this long has refilled anyway
+                self._buckets.popitem(last=False)
+            return wait
+
+    def refund(self, key):
+        """Gives back a token taken for a request that was refused elsewhere."""
+        if self.rate <= 0:
+            return
+        with self._lock:
+            if key in self._buckets:
+                tokens, updated_at = self._buckets[key]
+                self._buckets[key] = (min(self.burst, tokens + 1), updated_at)
+
+    def __len__(self):
+        return len(self._buckets)
+
+
+class Waiter:
+    """A queued upload: woken with a slot, from whichever thread releases it."""
+
+    def __init__(self, loop=None):
+        self.granted = False
+        if loop is None:
+            self.event = threading.Event()
+            self.grant = self.event.set
+        else:
+            self.future = loop.create_future()
+            self.grant = lambda: loop.call_soon_threadsafe(self._resolve)
+
+    def _resolve(self):
+        if not self.future.done():
+            self.future.set_result(None)
+
+
+class ConcurrencyLimiter:
+    """At most ``max_concurrent`` holders, ``max_queue`` waiters; the rest are refused."""
+
+    def __init__(self, max_concurrent=16, max_queue=32, max_wait=5.0, samples=1024):
+        self.max_concurrent = max_concurrent
+        self.max_queue = max_queue
+        self.max_wait = max_wait
+        self.running = 0
+        self.admitted = 0
+        self._queue = deque()
+        self._lock = threading.Lock()
+        self._waits = deque(maxlen=samples)
+
+    def _enter(self, waiter_factory):
+        """Takes a free slot (returns None) or queues a waiter (returns it); raises if the queue is full."""
+        with self._lock:
+            if self.running < self.max_concurrent and not self._queue:
+                self.running += 1
+                self.admitted += 1
+                self._waits.append(0.0)
+                return None
+            if len(self._queue) >= self.max_queue:
+                raise Overloaded("Too many uploads in progress", self.retry_after(), "queue_full")
+            waiter = waiter_factory()
+            self._queue.append(waiter)
+            return waiter
+
+    def _admitted(self, waiter, started):
+        """After a wait: True if the waiter holds a slot, else it is dequeued."""
+        with self._lock:
+            if waiter.granted:
+                self.admitted += 1
+                self._waits.append(time.monotonic() - started)
+                return True
+            self._queue.remove(waiter)
+            return False
+
+    def release(self):
+        with self._lock:
+            if self._queue:
+                # The slot passes straight to the oldest waiter
+                waiter = self._queue.popleft()
+                waiter.granted = True
+                waiter.grant()
+            else:
+                self.running -= 1
+
+    def retry_after(self):
+        # Roughly how long the queue ahead takes to drain, at least a second
+        return max(1, math.ceil(self.max_wait * len(self._queue) / max(1, self.max_queue)))
+
+    def _timed_out(self):
+        return Overloaded("Timed out waiting for an upload slot", self.retry_after(), "timeout")
+
+    @asynccontextmanager
+    async def slot(self):
+        waiter = self._enter(lambda: Waiter(asyncio.get_running_loop()))
+        if waiter is not None:
+            started = time.monotonic()
+            try:
+                await asyncio.wait_for(asyncio.shield(waiter.future), self.max_wait)
+            except asyncio.TimeoutError:
+                # Unless the slot was granted as the wait ran out
+                if not self._admitted(waiter, started):
+                    raise self._timed_out()
+            except asyncio.CancelledError:
+                # The client went away while queued
+                if self._admitted(waiter, started):
+                    self.release()
+                raise
+            else:
+                self._admitted(waiter, started)
+        try:
+            yield
+        finally:
+            self.release()
+
+    @contextmanager
+    def hold(self):
+        """slot() for sync views: blocks the calling thread while queued."""
+        waiter = self._enter(Waiter)
+        if waiter is not None:
+            started = time.monotonic()
+            waiter.event.wait(self.max_wait)
+            if not self._admitted(waiter, started):
+                raise self._timed_out()
+        try:
+            yield
+        finally:
+            self.release()
+
+    def stats(self):
+        with self._lock:
+            waits = sorted(self._waits)
+            return {
+                "running": self.running,
+                "queued": len(self._queue),
+                "max_concurrent": self.max_concurrent,
+                "max_queue": self.max_queue,
+                "admitted": self.admitted,
+                "queue_wait_ms": {
+                    "p50": waits[len(waits) // 2] * 1000 if waits else 0.0,
+                    "p99": waits[min(len(waits) - 1, len(waits) * 99 // 100)] * 1000 if waits else 0.0,
+                },
+            }
+
+
+class UploadAdmission:
+    """Rate limits per room and per client, then the concurrency limiter."""
+
+    def __init__(self, limiter, room_buckets, client_buckets):
+        self.limiter = limiter
+        self.room_buckets = room_buckets
+        self.client_buckets = client_buckets
+        self.shed = {"room_rate": 0, "client_rate": 0, "queue_full": 0, "timeout": 0}
+        self._lock = threading.Lock()
+
+    def count_shed(self, reason):
+        with self._lock:
+            self.shed[reason] += 1
+
+    def check_rates(self, room_id, client):
+        """Raises Overloaded if the room or the client is over its rate.
+
+        A token is only kept when both allow the upload: a client refused
+        for its own rate does not use up the room's budget.
+        """
+        wait = self.room_buckets.take(room_id)
+        if wait:
+            self.count_shed("room_rate")
+            raise Overloaded("Too many uploads for this room", max(1, math.ceil(wait)), "room_rate")
+        wait = self.client_buckets.take(client)
+        if wait:
+            self.room_buckets.refund(room_id)
+            self.count_shed("client_rate")
+            raise Overloaded("Too many uploads for this client", max(1, math.ceil(wait)), "client_rate")
+
+    @asynccontextmanager
+    async def slot(self):
+        try:
+            async with self.limiter.slot():
+                yield
+        except Overloaded as e:
+            self.count_shed(e.reason)
+            raise
+
+    @contextmanager
+    def hold(self):
+        try:
+            with self.limiter.hold():
+                yield
+        except Overloaded as e:
+            self.count_shed(e.reason)
+            raise
+
+    def stats(self):
+        with self._lock:
+            shed = dict(self.shed)
+        return {**self.limiter.stats(), "shed": shed,
+                "rooms_tracked": len(self.room_buckets), "clients_tracked": len(self.client_buckets)}
+
+
+def client_address(request):
+    """The client's IP: the first X-Forwarded-For hop when UPLOAD_TRUST_FORWARDED_FOR is on."""
+    if settings.UPLOAD_TRUST_FORWARDED_FOR:
+        forwarded = request.headers.get("X-Forwarded-For", "")
+        if forwarded:
+            return forwarded.split(",")[0].strip()
+    return request.META.get("REMOTE_ADDR", "")
+
+
+_admission = None
+_admission_lock = threading.Lock()
+
+
+@receiver(setting_changed)
+def reset_upload_admission(setting, **kwargs):
+    # Rebuilt from the new values on next use, e.g. under override_settings
+    global _admission
+    if setting.startswith("UPLOAD_"):
+        _admission = None
+
+
+def get_upload_admission():
+    """Returns the process-wide admission control configured by UPLOAD_*."""
+    global _admission
+    if _admission is None:
+        with _admission_lock:
+            if _admission is None:
+                _admission = UploadAdmission(
+                    ConcurrencyLimiter(settings.UPLOAD_MAX_CONCURRENT, settings.UPLOAD_MAX_QUEUE,
+                                       settings.UPLOAD_MAX_WAIT),
+                    TokenBuckets(settings.UPLOAD_ROOM_RATE, settings.UPLOAD_ROOM_BURST),
+                    TokenBuckets(settings.UPLOAD_CLIENT_RATE, settings.UPLOAD_CLIENT_BURST),
+                )
+    return _admission
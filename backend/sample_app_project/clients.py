@@ -0,0 +1,65 @@
+"""Lazily created Firebase and Google Cloud Vision clients.
+
+Nothing here runs at import time: the SDKs are imported and the clients
+built on first use, once per process, behind a lock. The same Firebase app
+(and its HTTP session) and the same Vision client (and its gRPC channel)
+then serve every request.
+"""
+
+import json
+import os
+import threading
+
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+
+_lock = threading.Lock()
+_firebase_app = None
+_vision_client = None
+
+
+def get_firebase_app():
+    """Returns the Firebase Admin app, initializing it from FIREBASE_CREDENTIALS_JSON."""
+    global _firebase_app
+    if _firebase_app is None:
+        with _lock:
+            if _firebase_app is None:
+                import firebase_admin
+                from firebase_admin import credentials
+
+                creds_json = os.environ.get("FIREBASE_CREDENTIALS_JSON")
+                if not creds_json:
+                    raise ImproperlyConfigured("Missing FIREBASE_CREDENTIALS_JSON environment variable")
+                cred = credentials.Certificate(json.loads(creds_json))
+                _firebase_app = firebase_admin.initialize_app(cred, {
+                    'databaseURL': settings.FIREBASE_DATABASE_URL
+                })
+    return _firebase_app
+
+
+def db_reference(path):
+    """firebase_admin.db.reference bound to the lazily initialized app."""
+    from firebase_admin import db
+    return db.reference(path, app=get_firebase_app())
+
+
+def get_vision_client():
+    """Returns the shared Vision client.
+
+    Uses the service account in GOOGLE_APPLICATION_CREDENTIALS_JSON when set,
+    otherwise Application Default Credentials (GOOGLE_APPLICATION_CREDENTIALS).
+    """
+    global _vision_client
+    if _vision_client is None:
+        with _lock:
+            if _vision_client is None:
+                from google.cloud import vision
+
+                creds_json = os.environ.get("GOOGLE_APPLICATION_CREDENTIALS_JSON")
+                if creds_json:
+                    from google.oauth2 import service_account
+                    creds = service_account.Credentials.from_service_account_info(json.loads(creds_json))
+                    _vision_client = vision.ImageAnnotatorClient(credentials=creds)
+                else:
+                    _vision_client = vision.ImageAnnotatorClient()
+    return _vision_client
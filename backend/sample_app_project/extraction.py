@@ -0,0 +1,272 @@
+"""Finds the measurement in OCR text: which number it is, in what unit, and how sure we are.
+
+Each capture type has a grammar, compiled once at import: the units it
+accepts with their conversion to the canonical unit, and the range of
+plausible readings in each. Every number in the text becomes a candidate.
+Times, dates and numbers labeled with another unit (3.0V, 95%) are
+skipped; digits OCR split with a space ("3 6.8") are also tried joined,
+and "368" also as 36.8. Candidates outside every plausible range are
+dropped; the rest are scored on an explicit unit, the expected decimal
+format and, when the OCR engine reports word boxes, how large the number
+is printed. The best one is returned as a Measurement in the canonical
+unit with a confidence between 0 and 1.
+"""
+
+import re
+from dataclasses import asdict, dataclass
+from typing import Callable, Dict, Optional, Tuple
+
+NO_VALUE = "No valid number found"
+
+# Digits OCR commonly reads as letters; replaced only between digits or
+# right after a decimal point, one character for one so positions in the
+# text are kept
+LOOKALIKES = re.compile(r"(?<=[\d.,])[OoDlI|](?=[\d.,])|(?<=\d[.,])[OoD]")
+LOOKALIKE_DIGITS = str.maketrans("OoDlI|", "000111")
+
+# A number of up to four digits with an optional one- or two-digit decimal
+# part, possibly spaced ("36 .8"). Not part of a time or date (12:45, 12/05)
+# or of a longer digit run such as a serial number.
+NUMBER = re.compile(r"(?<![\d.,:/])(\d{1,4})(?:\s?[.,]\s?(\d{1,2}))?(?![\d:/])")
+
+# What else a number on a device display may be labeled with: letters or
+# % stuck to it, or a common unit after a space
+OTHER_UNIT = re.compile(r"[A-Za-z%]|\s?(?:%|V|mAh|mmHg|bpm|mg/dL|ml|mm|cm|min|sec|hrs?)(?![A-Za-z])")
+
+
+@dataclass(frozen=True)
+class Unit:
+    symbol: str
+    # Alternation matched right after the number, case-insensitively
+    pattern: str
+    to_canonical: Callable[[float], float]
+    plausible: Tuple[float, float]
+
+
+@dataclass(frozen=True)
+class Grammar:
+    capture_type: str
+    # The first unit is the canonical one values are converted to
+    units: Tuple[Unit, ...]
+    template: str
+    # Digits after the decimal point the devices usually show
+    decimals: int = 1
+
+    def format(self, value):
+        return self.template.format(value=value)
+
+
+GRAMMARS = {
+    "temperature": Grammar(
+        "temperature",
+        units=(
+            Unit("°C", r"[°º˚*]?\s?C|deg(?:rees)?\s?C|celsius", lambda value: value, (30.0, 45.0)),
+            Unit("°F", r"[°º˚*]?\s?F|deg(?:rees)?\s?F|fahrenheit", lambda value: (value - 32) * 5 / 9, (86.0, 113.0)),
+        ),
+        template="{value}°C",
+    ),
+    "weight": Grammar(
+        "weight",
+        units=(
+            Unit("Kg", r"kgs?|kilo(?:gram)?s?", lambda value: value, (0.5, 350.0)),
+            Unit("lb", r"lbs?|pounds?|#", lambda value: value * 0.45359237, (1.0, 770.0)),
+        ),
+        template="{value} Kg",
+    ),
+}
+
+
+@dataclass(frozen=True)
+class Measurement:
+    capture_type: str
+    value: float
+    unit: str
+    confidence: float
+    # What was read, before conversion
+    source_value: float
+    source_unit: str
+    text: str
+
+    def formatted(self):
+        return GRAMMARS[self.capture_type].format(self.value)
+
+    def as_dict(self):
+        return asdict(self)
+
+
+@dataclass
+class Candidate:
+    start: int
+    end: int
+    value: float
+    decimals: int
+    unit: Optional[Unit] = None
+    explicit_unit: bool = False
+    # Joined from split digits or given back a lost decimal point
+    repaired: bool = False
+    joined: bool = False
+    height: float = 0.0
+    score: float = 0.0
+
+
+class CompiledGrammar:
+    def __init__(self, grammar):
+        self.grammar = grammar
+        self.unit_patterns = [
+            (unit, re.compile(r"\s?(?:%s)(?![A-Za-z])" % unit.pattern, re.IGNORECASE))
+            for unit in grammar.units
+        ]
+
+    def read_unit(self, text, position):
+        """The unit written right after ``position``, and where it ends."""
+        for unit, pattern in self.unit_patterns:
+            match = pattern.match(text, position)
+            if match:
+                return unit, match.end()
+        return None, position
+
+    def plausible_unit(self, value):
+        """The first unit whose plausible range holds ``value``, canonical first."""
+        for unit in self.grammar.units:
+            low, high = unit.plausible
+            if low <= value <= high:
+                return unit
+        return None
+
+
+def word_spans(text, words):
+    """``(start, end, height)`` of each OCR word found, in order, in ``text``."""
+    spans, cursor = [], 0
+    for word, (left, top, right, bottom) in words:
+        start = text.find(word, cursor)
+        if start < 0:
+            continue
+        cursor = start + len(word)
+        spans.append((start, cursor, bottom - top))
+    return spans
+
+
+class ReadingExtractor:
+    def __init__(self, grammars=GRAMMARS):
+        self.grammars: Dict[str, CompiledGrammar] = {
+            capture_type: CompiledGrammar(grammar) for capture_type, grammar in grammars.items()
+        }
+
+    @staticmethod
+    def parse(number, start, end=None, joined=False):
+        whole, fraction = NUMBER.fullmatch(number).groups()
+        value = float(f"{whole}.{fraction}") if fraction else float(whole)
+        return Candidate(start, end if end is not None else start + len(number), value, len(fraction or ""),
+                         repaired=joined, joined=joined)
+
+    def candidates(self, text, capture_type, words=None):
+        """Every plausible reading in ``text``, scored, best first."""
+        compiled = self.grammars.get(capture_type)
+        if compiled is None or not text:
+            return []
+        text = LOOKALIKES.sub(lambda match: match.group().translate(LOOKALIKE_DIGITS), text)
+
+        found = [self.parse(match.group(), match.start()) for match in NUMBER.finditer(text)]
+        for left, right in zip(found, found[1:]):
+            # "3 6.8": OCR split a number; also try its digits joined
+            if left.decimals == 0 and left.end - left.start <= 2 and text[left.end:right.start] == " ":
+                joined = text[left.start:right.end].replace(" ", "", 1)
+                if NUMBER.fullmatch(joined):
+                    found.append(self.parse(joined, left.start, end=right.end, joined=True))
+        decimals = compiled.grammar.decimals
+        for candidate in list(found):
+            # "368": a display's decimal point is easily lost
+            if decimals and candidate.decimals == 0 and candidate.end - candidate.start > decimals + 1:
+                found.append(Candidate(candidate.start, candidate.end, candidate.value / 10 ** decimals,
+                                       decimals, repaired=True))
+
+        spans = word_spans(text, words) if words else []
+        plausible = []
+        for candidate in found:
+            unit, _ = compiled.read_unit(text, candidate.end)
+            if unit is not None:
+                low, high = unit.plausible
+                if not low <= candidate.value <= high:
+                    continue
+                candidate.unit, candidate.explicit_unit = unit, True
+            elif OTHER_UNIT.match(text, candidate.end):
+                continue
+            else:
+                candidate.unit = compiled.plausible_unit(candidate.value)
+                if candidate.unit is None:
+                    continue
+            # A joined number is only as prominent as its smaller piece
+            candidate.height = min(
+                (height for start, end, height in spans if start < candidate.end and end > candidate.start),
+                default=0.0,
+            )
+            plausible.append(candidate)
+
+        tallest = max((candidate.height for candidate in plausible), default=0.0)
+        for index, candidate in enumerate(plausible):
+            candidate.score = self.score(compiled.grammar, candidate, tallest, first=index == 0)
+        # On a tie, the candidate covering more of the text
+        return sorted(plausible, key=lambda candidate: (candidate.score, candidate.end - candidate.start), reverse=True)
+
+    @staticmethod
+    def score(grammar, candidate, tallest, first):
+        score = 0.45
+        if candidate.explicit_unit:
+            score += 0.3
+        elif candidate.unit is not grammar.units[0]:
+            # Read as °F or lb only because the number fits that range
+            score -= 0.1
+        if candidate.decimals == grammar.decimals:
+            score += 0.1
+        if tallest:
+            # The reading is the largest thing on a device's display
+            score += 0.15 * candidate.height / tallest
+        elif first:
+            score += 0.05
+        if candidate.repaired and not (candidate.joined and tallest and candidate.height >= 0.9 * tallest):
+            # Unless both pieces of a split number are printed as large as the reading
+            score -= 0.15
+        return min(1.0, max(0.0, score))
+
+    def extract(self, text, capture_type, words=None):
+        """The most likely Measurement in ``text``, or None.
+
+        ``words`` are ``(text, (left, top, right, bottom))`` OCR word boxes;
+        by default those carried by an OCRText.
+        """
+        if words is None:
+            words = getattr(text, "words", None)
+        ranked = self.candidates(text, capture_type, words)
+        if not ranked:
+            return None
+        best = ranked[0]
+        confidence = best.score
+        rival = next((candidate for candidate in ranked[1:] if candidate.value != best.value), None)
+        if rival is not None:
+            # A close second reading makes the choice less certain
+            confidence -= max(0.0, 0.2 - (best.score - rival.score))
+        value = best.unit.to_canonical(best.value)
+        if best.unit is not self.grammars[capture_type].grammar.units[0]:
+            value = round(value, 1)
+        return Measurement(
+            capture_type=capture_type,
+            value=value,
+            unit=self.grammars[capture_type].grammar.units[0].symbol,
+            confidence=round(max(0.0, confidence), 2),
+            source_value=best.value,
+            source_unit=best.unit.symbol,
+            text=str(text)[best.start:best.end],
+        )
+
+
+_extractor = ReadingExtractor()
+
+
+def extract_measurement(text, capture_type, words=None):
+    """Extracts a Measurement with the default grammars; None when nothing plausible is found."""
+    return _extractor.extract(text, capture_type, words)
+
+
+def format_measurement(measurement):
+    """The display string stored with a reading, e.g. "36.8°C" or "70.0 Kg"."""
+    return measurement.formatted() if measurement is not None else NO_VALUE
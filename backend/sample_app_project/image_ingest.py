@@ -0,0 +1,79 @@
+"""Turns uploaded captures into the bytes sent to OCR with as little work as possible.
+
+JPEG and PNG uploads that are already small enough go through untouched.
+Anything larger is decoded at reduced scale (JPEG draft mode), optionally
+cropped to a region of interest and re-encoded once. Uploads are read from
+the Django UploadedFile directly, so large captures spooled to a
+TemporaryUploadedFile are never buffered whole in memory.
+"""
+
+import io
+import math
+
+from PIL import Image
+
+JPEG_MAGIC = b"\xff\xd8\xff"
+PNG_MAGIC = b"\x89PNG\r\n\x1a\n"
+
+
+def sniff_format(header):
+    """Returns 'JPEG' or 'PNG' from the first bytes of a file, else None."""
+    if header.startswith(JPEG_MAGIC):
+        return "JPEG"
+    if header.startswith(PNG_MAGIC):
+        return "PNG"
+    return None
+
+
+def parse_roi(value):
+    """Parses a "left,top,right,bottom" region given as fractions of the image."""
+    if not value:
+        return None
+    try:
+        left, top, right, bottom = (float(part) for part in value.split(","))
+    except ValueError:
+        raise ValueError("roi must be four comma-separated fractions: left,top,right,bottom")
+    if not (0 <= left < right <= 1 and 0 <= top < bottom <= 1):
+        raise ValueError("roi fractions must satisfy 0 <= left < right <= 1 and 0 <= top < bottom <= 1")
+    return left, top, right, bottom
+
+
+def prepare_image(source, max_dimension=2048, roi=None, quality=90):
+    """Returns image bytes ready for OCR.
+
+    ``source`` is raw bytes or a seekable file such as a Django UploadedFile.
+    """
+    if isinstance(source, (bytes, bytearray)):
+        source = io.BytesIO(source)
+    source.seek(0)
+    header = source.read(16)
+    source.seek(0)
+
+    # Image.open only parses the header; pixels are decoded on demand
+    image = Image.open(source)
+    width, height = image.size
+    if sniff_format(header) and roi is None and max(width, height) <= max_dimension:
+        source.seek(0)
+        return source.read()
+
+    left, top, right, bottom = roi or (0, 0, 1, 1)
+    region = max((right - left) * width, (bottom - top) * height)
+    scale = min(1.0, max_dimension / region)
+    if image.format == "JPEG":
+        # Decode at the smallest 1/2, 1/4 or 1/8 scale that keeps at least half
+        # the target resolution; only a larger result needs a resample below
+        image.draft("RGB", (math.ceil(width * scale / 2), math.ceil(height * scale / 2)))
+        width, height = image.size
+
+    if roi is not None:
+        image = image.crop((
+            round(left * width), round(top * height), round(right * width), round(bottom * height)
+        ))
+    if max(image.size) > max_dimension:
+        image.thumbnail((max_dimension, max_dimension), Image.BILINEAR)
+    if image.mode not in ("RGB", "L"):
+        image = image.convert("RGB")
+
+    output = io.BytesIO()
+    image.save(output, format="JPEG", quality=quality)
+    return output.getvalue()
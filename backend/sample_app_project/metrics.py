@@ -0,0 +1,130 @@
+"""Prometheus metrics for the OCR upload path, served at /metrics.
+
+Each stage of an upload (image decode, OCR call, number extraction and
+storage write) is timed with ``span`` into the ``ocr_stage_seconds``
+histogram. A span costs two perf_counter calls and one histogram
+observation. With METRICS_SERVER_TIMING on, a request's spans are also
+returned in a Server-Timing header, which browser dev tools show per request.
+
+The counters the stats endpoints already keep (admission control, the
+offload pool, the OCR and room caches, the write-behind buffer) are read
+when /metrics is scraped rather than updated on every call.
+
+Under gunicorn with several workers, set PROMETHEUS_MULTIPROC_DIR so that
+every worker's histograms are aggregated; the scrape-time counters then only
+describe the worker that answers.
+"""
+
+import contextvars
+import os
+import time
+from contextlib import contextmanager
+
+from prometheus_client import (
+    CONTENT_TYPE_LATEST, REGISTRY, CollectorRegistry, Histogram, generate_latest, multiprocess,
+)
+from prometheus_client.core import CounterMetricFamily, GaugeMetricFamily
+
+STAGES = ("decode", "ocr", "extract", "store")
+
+STAGE_SECONDS = Histogram(
+    "ocr_stage_seconds", "Time spent in each stage of an OCR upload", ["stage"],
+    buckets=(0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10),
+)
+# Resolved once: labels() takes a lock and a dict lookup on every call
+_stage_histograms = {stage: STAGE_SECONDS.labels(stage) for stage in STAGES}
+
+# The (stage, seconds) spans of the current request while Server-Timing is on
+_request_spans = contextvars.ContextVar("request_spans", default=None)
+
+
+def record(stage, seconds):
+    _stage_histograms[stage].observe(seconds)
+    spans = _request_spans.get()
+    if spans is not None:
+        spans.append((stage, seconds))
+
+
+@contextmanager
+def span(stage):
+    """Times the enclosed block as one of STAGES."""
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        record(stage, time.perf_counter() - started)
+
+
+def start_request():
+    """Collects the spans of the current request; returns a token for finish_request."""
+    return _request_spans.set([])
+
+
+def finish_request(token):
+    """Returns the Server-Timing header value for the request's spans, or ''."""
+    spans = _request_spans.get()
+    _request_spans.reset(token)
+    # A stage that runs more than once (a batch) is reported once, summed
+    totals = {}
+    for stage, seconds in spans or ():
+        totals[stage] = totals.get(stage, 0.0) + seconds
+    return ", ".join(f"{stage};dur={seconds * 1000:.2f}" for stage, seconds in totals.items())
+
+
+class StatsCollector:
+    """Exports the counters behind the /api/*/stats/ endpoints at scrape time."""
+
+    def describe(self):
+        # Without describe(), registering calls collect(), which reads Django
+        # settings; importing this module must not need them configured
+        return []
+
+    def collect(self):
+        # Imported here: the views import this module
+        from .admission import get_upload_admission
+        from .ocr_cache import get_ocr_cache
+        from .offload import get_offload_pool
+        from .room_cache import get_room_cache
+        from .storage import get_write_buffer
+
+        admission = get_upload_admission().stats()
+        yield GaugeMetricFamily("upload_admission_running", "Uploads holding an OCR slot", admission["running"])
+        yield GaugeMetricFamily("upload_admission_queued", "Uploads waiting for an OCR slot", admission["queued"])
+        yield CounterMetricFamily("upload_admission_admitted", "Uploads given an OCR slot", admission["admitted"])
+        shed = CounterMetricFamily("upload_admission_shed", "Uploads refused with 429", labels=["reason"])
+        for reason, count in admission["shed"].items():
+            shed.add_metric([reason], count)
+        yield shed
+
+        yield GaugeMetricFamily("offload_pool_running", "Blocking calls running on the offload pool",
+                                get_offload_pool().stats()["running"])
+
+        for name, cache in (("ocr", get_ocr_cache()), ("room", get_room_cache())):
+            if cache is None:
+                continue
+            stats = cache.stats()
+            yield CounterMetricFamily(f"{name}_cache_hits", f"{name.upper()} cache hits", stats["hits"])
+            yield CounterMetricFamily(f"{name}_cache_misses", f"{name.upper()} cache misses", stats["misses"])
+
+        buffer = get_write_buffer()
+        if buffer is not None:
+            stats = buffer.stats()
+            yield GaugeMetricFamily("firebase_write_pending", "Readings waiting to be written", stats["pending"])
+            yield CounterMetricFamily("firebase_write_flushes", "Multi-path updates sent", stats["flushes"])
+            yield CounterMetricFamily("firebase_write_failures", "Failed multi-path updates", stats["failures"])
+            yield CounterMetricFamily("firebase_write_dropped", "Paths dropped after repeated failures",
+                                      stats["dropped"])
+            yield CounterMetricFamily("firebase_write_shed", "Saves refused while the buffer was full", stats["shed"])
+
+
+REGISTRY.register(StatsCollector())
+
+
+def exposition():
+    """Returns ``(body, content_type)`` for a /metrics response."""
+    if "PROMETHEUS_MULTIPROC_DIR" in os.environ:
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+        registry.register(StatsCollector())
+        return generate_latest(registry), CONTENT_TYPE_LATEST
+    return generate_latest(REGISTRY), CONTENT_TYPE_LATEST
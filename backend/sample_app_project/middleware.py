@@ -0,0 +1,79 @@
+"""Middleware adapted for the async views."""
+
+import time
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from whitenoise.middleware import WhiteNoiseMiddleware
+
+from .metrics import finish_request, start_request
+
+
+class AsyncWhiteNoiseMiddleware(WhiteNoiseMiddleware):
+    """WhiteNoise that can also run in Django's async middleware chain.
+
+    WhiteNoise declares no async support, so under ASGI Django would adapt
+    the whole chain to sync around it: every request, async views included,
+    would then run on the one thread-sensitive thread, one at a time.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response=None, *args, **kwargs):
+        super().__init__(get_response, *args, **kwargs)
+        if iscoroutinefunction(self.get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        return super().__call__(request)
+
+    async def __acall__(self, request):
+        if self.autorefresh:
+            static_file = await sync_to_async(self.find_file, thread_sensitive=False)(request.path_info)
+        else:
+            static_file = self.files.get(request.path_info)
+        if static_file is not None:
+            # Opens and stats the file
+            return await sync_to_async(self.serve, thread_sensitive=False)(static_file, request)
+        return await self.get_response(request)
+
+
+class ServerTimingMiddleware:
+    """Adds a Server-Timing header with the request's upload stage spans.
+
+    Only installed when METRICS_SERVER_TIMING is on; ``total`` is the time
+    spent in the view and the middleware below this one.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        if not settings.METRICS_SERVER_TIMING:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        if iscoroutinefunction(self.get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        token, started = start_request(), time.perf_counter()
+        response = self.get_response(request)
+        return self.add_header(response, token, started)
+
+    async def __acall__(self, request):
+        token, started = start_request(), time.perf_counter()
+        response = await self.get_response(request)
+        return self.add_header(response, token, started)
+
+    @staticmethod
+    def add_header(response, token, started):
+        total = f"total;dur={(time.perf_counter() - started) * 1000:.2f}"
+        spans = finish_request(token)
+        response["Server-Timing"] = f"{spans}, {total}" if spans else total
+        return response
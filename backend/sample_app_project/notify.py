@@ -0,0 +1,98 @@
+"""Pushes new readings to the video server, which relays them to the room's /ws peers.
+
+Events are handed to one background thread that POSTs them over a
+keep-alive session to MEASUREMENT_NOTIFY_URL, so an upload never waits on
+the video server. If it is down or slow, events beyond the queue limit are
+dropped; polling get-data still works as before.
+"""
+
+import queue
+import threading
+import time
+
+from django.conf import settings
+
+
+def measurement_events(room_id, readings):
+    """One ``measurement`` event per (capture_type, raw_text, formatted_value) reading."""
+    recorded_at = time.time()
+    return [
+        {
+            "type": "measurement",
+            "roomId": room_id,
+            "captureType": capture_type,
+            "rawText": raw_text,
+            "formattedValue": formatted_value,
+            "recordedAt": recorded_at,
+        }
+        for capture_type, raw_text, formatted_value in readings
+    ]
+
+
+class MeasurementNotifier:
+    """Delivers events to ``url`` from a single sender thread."""
+
+    def __init__(self, url, token="", timeout=2.0, max_queue=256):
+        self.url = url
+        self.token = token
+        self.timeout = timeout
+        self._queue = queue.Queue(maxsize=max_queue)
+        self._thread = None
+        self._lock = threading.Lock()
+        self.sent = 0
+        self.failed = 0
+        self.dropped = 0
+
+    def publish(self, room_id, readings):
+        """Queues the readings for delivery; never blocks the caller."""
+        try:
+            self._queue.put_nowait(measurement_events(room_id, readings))
+        except queue.Full:
+            self.dropped += 1
+            return
+        self._ensure_started()
+
+    def _ensure_started(self):
+        if self._thread is None:
+            with self._lock:
+                if self._thread is None:
+                    self._thread = threading.Thread(target=self._run, name="measurement-notify", daemon=True)
+                    self._thread.start()
+
+    def _run(self):
+        import requests
+
+        session = requests.Session()
+        headers = {"X-Notify-Token": self.token} if self.token else {}
+        while True:
+            events = self._queue.get()
+            try:
+                response = session.post(self.url, json={"events": events}, headers=headers,
+                                        timeout=self.timeout)
+                response.raise_for_status()
+                self.sent += len(events)
+            except Exception as e:
+                self.failed += len(events)
+                print(f"Measurement notification failed: {e}")
+
+
+_notifier = None
+_notifier_lock = threading.Lock()
+
+
+def get_notifier():
+    """Returns the process-wide notifier, or None when MEASUREMENT_NOTIFY_URL is unset."""
+    global _notifier
+    if not settings.MEASUREMENT_NOTIFY_URL:
+        return None
+    if _notifier is None:
+        with _notifier_lock:
+            if _notifier is None:
+                _notifier = MeasurementNotifier(settings.MEASUREMENT_NOTIFY_URL, settings.MEASUREMENT_NOTIFY_TOKEN)
+    return _notifier
+
+
+def notify_readings(room_id, readings):
+    notifier = get_notifier()
+    if notifier is not None:
+        notifier.publish(room_id, readings)
@@ -0,0 +1,227 @@
+"""Content-addressed cache of OCR results, so re-uploaded frames skip the Vision call."""
+
+import hashlib
+import io
+import json
+import os
+import tempfile
+import threading
+import time
+from collections import OrderedDict, deque
+
+from django.conf import settings
+from PIL import Image
+
+from .ocr_engines import OCRText
+
+
+class MemoryBackend:
+    """Per-process LRU cache with a TTL."""
+
+    def __init__(self, max_entries=1024, ttl=3600):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            item = self._entries.get(key)
+            if item is None:
+                return None
+            stored_at, entry = item
+            if time.time() - stored_at > self.ttl:
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return entry
+
+    def set(self, key, entry):
+        with self._lock:
+            self._entries[key] = (time.time(), entry)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def __len__(self):
+        return len(self._entries)
+
+
+class FileBackend:
+    """LRU cache in a directory, shared by every worker process on the host.
+
+    Entries are written atomically (temp file + rename); a file's mtime is
+    bumped on every hit and the least recently used files are evicted.
+    """
+
+    def __init__(self, directory, max_entries=1024, ttl=3600):
+        self.directory = directory
+        self.max_entries = max_entries
+        self.ttl = ttl
+        os.makedirs(directory, exist_ok=True)
+
+    def _path(self, key):
+        return os.path.join(self.directory, f"{key}.json")
+
+    def get(self, key):
+        path = self._path(key)
+        try:
+            with open(path) as f:
+                stored_at, entry = json.load(f)
+        except (OSError, ValueError):
+            return None
+        if time.time() - stored_at > self.ttl:
+            self._remove(path)
+            return None
+        try:
+            os.utime(path)
+        except OSError:
+            pass
+        return entry
+
+    def set(self, key, entry):
+        fd, tmp_path = tempfile.mkstemp(dir=self.directory, suffix=".tmp")
+        with os.fdopen(fd, "w") as f:
+            json.dump([time.time(), entry], f)
+        os.replace(tmp_path, self._path(key))
+        self._evict()
+
+    def _evict(self):
+        files = [entry for entry in os.scandir(self.directory) if entry.name.endswith(".json")]
+        if len(files) <= self.max_entries:
+            return
+        files.sort(key=lambda entry: entry.stat().st_mtime)
+        for entry in files[:len(files) - self.max_entries]:
+            self._remove(entry.path)
+
+    @staticmethod
+    def _remove(path):
+        try:
+            os.unlink(path)
+        except OSError:
+            pass
+
+    def __len__(self):
+        return sum(1 for entry in os.scandir(self.directory) if entry.name.endswith(".json"))
+
+
+def difference_hash(content):
+    """64-bit dHash of an image: near-identical frames differ in only a few bits."""
+    image = Image.open(io.BytesIO(content))
+    image.draft("L", (64, 64))
+    pixels = list(image.convert("L").resize((9, 8), Image.BILINEAR).getdata())
+    bits = 0
+    for row in range(8):
+        for col in range(8):
+            bits = (bits << 1) | (pixels[row * 9 + col] < pixels[row * 9 + col + 1])
+    return bits
+
+
+class OCRCache:
+    """Looks up OCR results by the SHA-256 of the normalized image bytes.
+
+    With ``phash_distance`` > 0, images whose dHash is within that Hamming
+    distance of a recent entry also count as hits. Keep it small: different
+    readings on the same display can look alike at 8x8.
+    """
+
+    def __init__(self, backend, phash_distance=0, phash_entries=256):
+        self.backend = backend
+        self.phash_distance = phash_distance
+        self._phashes = deque(maxlen=phash_entries)
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.near_hits = 0
+        self.misses = 0
+        self.saved_seconds = 0.0
+
+    @staticmethod
+    def key(content):
+        return hashlib.sha256(content).hexdigest()
+
+    def get_or_detect(self, content, detect):
+        """Returns the cached OCR text for ``content``, calling ``detect`` on a miss."""
+        phash = difference_hash(content) if self.phash_distance else None
+        cached = self.lookup(content, phash)
+        if cached is not None:
+            return cached
+        started = time.perf_counter()
+        value = detect(content)
+        self.store(content, value, time.perf_counter() - started, phash)
+        return value
+
+    def lookup(self, content, phash=None):
+        key = self.key(content)
+        entry = self.backend.get(key)
+        near = False
+        if entry is None and self.phash_distance:
+            if phash is None:
+                phash = difference_hash(content)
+            near_key = self._nearest(phash)
+            if near_key is not None:
+                entry = self.backend.get(near_key)
+                near = entry is not None
+        with self._lock:
+            if entry is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            self.near_hits += near
+            self.saved_seconds += entry["cost"]
+        # The extractor reads the word boxes; a JSON round-trip turns their tuples into lists
+        words = [(text, tuple(box)) for text, box in entry.get("words", ())]
+        return OCRText(entry["value"], words)
+
+    def store(self, content, value, cost, phash=None):
+        key = self.key(content)
+        words = [(text, list(box)) for text, box in getattr(value, "words", ())]
+        self.backend.set(key, {"value": str(value), "words": words, "cost": cost})
+        if self.phash_distance:
+            if phash is None:
+                phash = difference_hash(content)
+            with self._lock:
+                self._phashes.append((phash, key))
+
+    def _nearest(self, phash):
+        with self._lock:
+            candidates = list(self._phashes)
+        best_key, best_distance = None, self.phash_distance + 1
+        for other, key in candidates:
+            distance = bin(phash ^ other).count("1")
+            if distance < best_distance:
+                best_key, best_distance = key, distance
+        return best_key
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "near_hits": self.near_hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "vision_calls_saved": self.hits,
+                "latency_saved_seconds": round(self.saved_seconds, 3),
+                "entries": len(self.backend),
+            }
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def get_ocr_cache():
+    """Returns the process-wide cache configured by OCR_CACHE_*, or None if disabled."""
+    global _cache
+    if settings.OCR_CACHE_BACKEND == "none":
+        return None
+    if _cache is None:
+        with _cache_lock:
+            if _cache is None:
+                if settings.OCR_CACHE_BACKEND == "file":
+                    backend = FileBackend(settings.OCR_CACHE_DIR, settings.OCR_CACHE_MAX_ENTRIES,
+                                          settings.OCR_CACHE_TTL)
+                else:
+                    backend = MemoryBackend(settings.OCR_CACHE_MAX_ENTRIES, settings.OCR_CACHE_TTL)
+                _cache = OCRCache(backend, phash_distance=settings.OCR_CACHE_PHASH_DISTANCE)
+    return _cache
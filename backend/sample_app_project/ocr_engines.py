@@ -0,0 +1,282 @@
+"""OCR engines behind one interface, chosen with the OCR_ENGINE setting.
+
+``vision`` is Google Cloud Vision text detection. ``seven_segment`` is a
+local NumPy reader for the seven-segment displays on thermometers and
+scales: no network, a few milliseconds per image on CPU. OCR_ENGINE may
+also be the dotted path of any OCREngine subclass.
+"""
+
+import io
+import threading
+
+import numpy as np
+from django.conf import settings
+from django.utils.module_loading import import_string
+from PIL import Image
+
+from .clients import get_vision_client
+
+NO_TEXT = "No text found"
+
+
+class OCRText(str):
+    """Detected text that also carries the engine's word boxes.
+
+    ``words`` holds ``(text, (left, top, right, bottom))`` pairs in reading
+    order. It behaves as the plain string everywhere else; the OCR cache
+    stores the words alongside the text.
+    """
+
+    def __new__(cls, text, words=()):
+        detected = super().__new__(cls, text)
+        detected.words = tuple(words)
+        return detected
+
+
+def annotated_text(annotations):
+    """The full text of Vision text annotations, with the word boxes that follow it."""
+    if not annotations:
+        return NO_TEXT
+    words = []
+    for annotation in annotations[1:]:
+        vertices = annotation.bounding_poly.vertices
+        xs, ys = [vertex.x for vertex in vertices], [vertex.y for vertex in vertices]
+        words.append((annotation.description, (min(xs), min(ys), max(xs), max(ys))))
+    return OCRText(annotations[0].description, words)
+
+
+class OCREngine:
+    """Turns image bytes into the text they show."""
+
+    def detect_text(self, content):
+        """Returns the detected text, or NO_TEXT."""
+        raise NotImplementedError
+
+    def detect_text_batch(self, contents):
+        """Returns one ``(raw_text, error)`` pair per image, in order."""
+        detections = []
+        for content in contents:
+            try:
+                detections.append((self.detect_text(content), None))
+            except Exception as e:
+                detections.append((None, str(e)))
+        return detections
+
+
+class VisionOCREngine(OCREngine):
+    """Google Cloud Vision text detection."""
+
+    # Vision accepts at most 16 images per synchronous batch request
+    batch_limit = 16
+
+    def __init__(self, client=None):
+        self._client = client
+
+    @property
+    def client(self):
+        # Defaults to the process-wide client so its gRPC channel is reused
+        return self._client or get_vision_client()
+
+    def detect_text(self, content):
+        from google.cloud import vision
+        response = self.client.text_detection(image=vision.Image(content=content))
+        return annotated_text(response.text_annotations)
+
+    def detect_text_batch(self, contents):
+        from google.cloud import vision
+        feature = vision.Feature(type_=vision.Feature.Type.TEXT_DETECTION)
+        detections = []
+        for start in range(0, len(contents), self.batch_limit):
+            requests = [
+                vision.AnnotateImageRequest(image=vision.Image(content=content), features=[feature])
+                for content in contents[start:start + self.batch_limit]
+            ]
+            batch = self.client.batch_annotate_images(requests=requests)
+            for response in batch.responses:
+                if response.error.message:
+                    detections.append((None, response.error.message))
+                else:
+                    detections.append((annotated_text(response.text_annotations), None))
+        return detections
+
+
+# Segments in a, b, c, d, e, f, g order: top, top-right, bottom-right,
+# bottom, bottom-left, top-left, middle
+SEGMENT_PATTERNS = {
+    (1, 1, 1, 1, 1, 1, 0): "0",
+    (0, 1, 1, 0, 0, 0, 0): "1",
+    (1, 1, 0, 1, 1, 0, 1): "2",
+    (1, 1, 1, 1, 0, 0, 1): "3",
+    (0, 1, 1, 0, 0, 1, 1): "4",
+    (1, 0, 1, 1, 0, 1, 1): "5",
+    (1, 0, 1, 1, 1, 1, 1): "6",
+    (1, 1, 1, 0, 0, 0, 0): "7",
+    (1, 1, 1, 0, 0, 1, 0): "7",
+    (1, 1, 1, 1, 1, 1, 1): "8",
+    (1, 1, 1, 1, 0, 1, 1): "9",
+    (1, 1, 1, 0, 0, 1, 1): "9",
+}
+_PATTERN_MATRIX = np.array(list(SEGMENT_PATTERNS), dtype=np.int8)
+_PATTERN_DIGITS = list(SEGMENT_PATTERNS.values())
+
+# Sampling windows as (x0, x1, y0, y1) fractions of the digit cell
+SEGMENT_WINDOWS = (
+    (0.25, 0.75, 0.0, 0.15),   # a
+    (0.75, 1.0, 0.15, 0.4),    # b
+    (0.75, 1.0, 0.6, 0.85),    # c
+    (0.25, 0.75, 0.85, 1.0),   # d
+    (0.0, 0.25, 0.6, 0.85),    # e
+    (0.0, 0.25, 0.15, 0.4),    # f
+    (0.25, 0.75, 0.425, 0.575),  # g
+)
+
+
+def otsu_threshold(gray):
+    """Threshold that best separates the two intensity classes of ``gray``."""
+    histogram = np.bincount(gray.ravel(), minlength=256).astype(np.float64)
+    weights = np.cumsum(histogram)
+    means = np.cumsum(histogram * np.arange(256))
+    total_weight, total_mean = weights[-1], means[-1]
+    background = weights[:-1]
+    foreground = total_weight - background
+    valid = (background > 0) & (foreground > 0)
+    between = np.zeros(255)
+    between[valid] = (
+        (total_mean * background[valid] - means[:-1][valid] * total_weight) ** 2
+        / (background[valid] * foreground[valid])
+    )
+    return int(np.argmax(between))
+
+
+def runs(mask, min_gap=1):
+    """(start, end) index pairs of True runs, merging gaps shorter than ``min_gap``."""
+    padded = np.concatenate(([False], mask, [False]))
+    edges = np.flatnonzero(padded[1:] != padded[:-1])
+    spans = [[start, end] for start, end in zip(edges[::2], edges[1::2])]
+    merged = []
+    for span in spans:
+        if merged and span[0] - merged[-1][1] < min_gap:
+            merged[-1][1] = span[1]
+        else:
+            merged.append(span)
+    return [tuple(span) for span in merged]
+
+
+class SevenSegmentOCREngine(OCREngine):
+    """Reads the digits of a seven-segment display, LCD or LED.
+
+    The image is binarized with Otsu's method (segments are the minority
+    class, so both dark-on-light and light-on-dark work), the tallest row of
+    characters is split into cells by column projection, and each cell's
+    seven segment windows are sampled and matched to the nearest digit.
+    Works best on a crop of the display, e.g. with the upload ``roi`` field.
+    """
+
+    def __init__(self, max_dimension=640, fill_threshold=0.3):
+        self.max_dimension = max_dimension
+        self.fill_threshold = fill_threshold
+
+    def detect_text(self, content):
+        text, _ = self.read(content)
+        return text or NO_TEXT
+
+    def read(self, content):
+        """Returns ``(text, confidence)``; confidence is 1.0 when every segment matched."""
+        mask = self._binarize(content)
+        band = self._text_band(mask)
+        if band is None:
+            return "", 0.0
+        top, bottom = band
+        row = mask[top:bottom]
+        height = bottom - top
+
+        column_mask = row.sum(axis=0) >= max(1, int(0.02 * height))
+        cells = runs(column_mask, min_gap=max(2, int(0.04 * height)))
+        digit_widths = [end - start for start, end in cells if end - start > 0.35 * height]
+        digit_width = float(np.median(digit_widths)) if digit_widths else 0.55 * height
+
+        chars, scores = [], []
+        for start, end in cells:
+            cell = row[:, start:end]
+            rows = np.flatnonzero(cell.any(axis=1))
+            cell_top, cell_bottom = rows[0], rows[-1] + 1
+            if cell_bottom - cell_top < 0.35 * height:
+                center = (cell_top + cell_bottom) / 2
+                if center > 0.7 * height:
+                    chars.append(".")
+                elif 0.3 * height < center < 0.7 * height:
+                    chars.append("-")
+                continue
+            if end - start < 0.45 * digit_width:
+                chars.append("1")
+                scores.append(1.0)
+                continue
+            digit, score = self._classify(cell)
+            chars.append(digit)
+            scores.append(score)
+
+        text = "".join(chars).strip(".")
+        if not scores:
+            return "", 0.0
+        return text, float(np.mean(scores))
+
+    def _binarize(self, content):
+        image = Image.open(io.BytesIO(content))
+        image.draft("L", (self.max_dimension, self.max_dimension))
+        image = image.convert("L")
+        if max(image.size) > self.max_dimension:
+            image.thumbnail((self.max_dimension, self.max_dimension))
+        gray = np.asarray(image, dtype=np.uint8)
+        mask = gray > otsu_threshold(gray)
+        # Segments cover less area than the background around them
+        if mask.mean() > 0.5:
+            mask = ~mask
+        return mask
+
+    @staticmethod
+    def _text_band(mask):
+        profile = mask.sum(axis=1)
+        if not profile.any():
+            return None
+        bands = runs(profile >= max(1, int(0.01 * mask.shape[1])), min_gap=max(2, mask.shape[0] // 50))
+        if not bands:
+            return None
+        return max(bands, key=lambda band: band[1] - band[0])
+
+    def _classify(self, cell):
+        height, width = cell.shape
+        segments = np.empty(7, dtype=np.int8)
+        for index, (x0, x1, y0, y1) in enumerate(SEGMENT_WINDOWS):
+            window = cell[int(y0 * height):max(int(y1 * height), int(y0 * height) + 1),
+                          int(x0 * width):max(int(x1 * width), int(x0 * width) + 1)]
+            segments[index] = window.mean() > self.fill_threshold
+        distances = np.abs(_PATTERN_MATRIX - segments).sum(axis=1)
+        best = int(np.argmin(distances))
+        if distances[best] > 1:
+            return "?", 0.0
+        return _PATTERN_DIGITS[best], 1.0 - distances[best] / 7
+
+
+ENGINES = {
+    "vision": VisionOCREngine,
+    "seven_segment": SevenSegmentOCREngine,
+}
+
+_engine = None
+_engine_lock = threading.Lock()
+
+
+def load_engine(name):
+    """Instantiates the engine registered as ``name`` or found at that dotted path."""
+    engine_class = ENGINES.get(name) or import_string(name)
+    return engine_class()
+
+
+def get_ocr_engine():
+    """Returns the process-wide engine selected by settings.OCR_ENGINE."""
+    global _engine
+    if _engine is None:
+        with _engine_lock:
+            if _engine is None:
+                _engine = load_engine(settings.OCR_ENGINE)
+    return _engine
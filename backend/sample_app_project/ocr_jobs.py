@@ -0,0 +1,107 @@
+"""Background OCR jobs: uploads are queued on a thread pool and polled by job id."""
+
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+
+QUEUED = "queued"
+RUNNING = "running"
+DONE = "done"
+FAILED = "failed"
+
+
+class QueueFull(Exception):
+    """Raised when the number of jobs waiting for a worker hits the limit."""
+
+
+class OCRJobQueue:
+    """Runs OCR pipeline calls on a fixed-size thread pool.
+
+    At most ``max_queue`` jobs may wait for a free worker; further submissions
+    raise QueueFull so the caller can shed load. Finished jobs are kept for
+    ``result_ttl`` seconds (and at most ``max_results`` of them) for polling.
+    """
+
+    def __init__(self, workers=4, max_queue=32, result_ttl=600, max_results=1000):
+        self.workers = workers
+        self.max_queue = max_queue
+        self.result_ttl = result_ttl
+        self.max_results = max_results
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="ocr-job")
+        self._jobs = OrderedDict()
+        self._queued = 0
+        self._lock = threading.Lock()
+
+    def submit(self, fn, *args, **kwargs):
+        """Queues ``fn(*args, **kwargs)`` and returns the new job id."""
+        with self._lock:
+            if self._queued >= self.max_queue:
+                raise QueueFull(f"{self._queued} OCR jobs already waiting")
+            self._prune()
+            job_id = uuid.uuid4().hex
+            self._jobs[job_id] = {"status": QUEUED, "submitted_at": time.time()}
+            self._queued += 1
+        self._executor.submit(self._run, job_id, fn, args, kwargs)
+        return job_id
+
+    def get(self, job_id):
+        """Returns a snapshot of the job's state, or None for unknown/expired ids."""
+        with self._lock:
+            job = self._jobs.get(job_id)
+            return dict(job) if job is not None else None
+
+    def queue_depth(self):
+        with self._lock:
+            return self._queued
+
+    def shutdown(self, wait=True):
+        self._executor.shutdown(wait=wait)
+
+    def _run(self, job_id, fn, args, kwargs):
+        with self._lock:
+            self._queued -= 1
+            self._jobs[job_id]["status"] = RUNNING
+        try:
+            result = fn(*args, **kwargs)
+        except Exception as e:
+            update = {"status": FAILED, "error": str(e)}
+        else:
+            update = {"status": DONE, "result": result}
+        update["finished_at"] = time.time()
+        with self._lock:
+            self._jobs[job_id].update(update)
+
+    def _prune(self):
+        # Jobs are stored in submission order, so expired ones sit at the front
+        cutoff = time.time() - self.result_ttl
+        while self._jobs:
+            job_id, job = next(iter(self._jobs.items()))
+            expired = job.get("finished_at", float("inf")) < cutoff
+            if not expired and len(self._jobs) < self.max_results:
+                break
+            if "finished_at" not in job:
+                # Never drop unfinished jobs; try again on the next submission
+                break
+            del self._jobs[job_id]
+
+
+_job_queue = None
+_job_queue_lock = threading.Lock()
+
+
+def get_job_queue():
+    """Returns the process-wide job queue configured from settings."""
+    global _job_queue
+    if _job_queue is None:
+        with _job_queue_lock:
+            if _job_queue is None:
+                _job_queue = OCRJobQueue(
+                    workers=settings.OCR_JOB_WORKERS,
+                    max_queue=settings.OCR_JOB_QUEUE_DEPTH,
+                    result_ttl=settings.OCR_JOB_RESULT_TTL,
+                )
+    return _job_queue
@@ -0,0 +1,70 @@
+"""Bounded thread pool for the blocking calls of async views.
+
+The Vision and Firebase Admin clients are synchronous. Async views hand
+those calls to this pool rather than to sync_to_async's default
+thread-sensitive mode, which runs every call from every request on one
+thread. The pool has ASYNC_OFFLOAD_WORKERS threads, which bounds the number
+of remote calls in flight; further calls wait in its queue. Database
+connections opened by a pool thread are released after each call, as
+Django does at the end of a request.
+"""
+
+import asyncio
+import contextvars
+import functools
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.db import close_old_connections
+
+
+class OffloadPool:
+    def __init__(self, workers=32):
+        self.workers = workers
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="offload")
+        self._lock = threading.Lock()
+        self.submitted = 0
+        self.running = 0
+
+    def _call(self, func):
+        with self._lock:
+            self.running += 1
+        try:
+            return func()
+        finally:
+            close_old_connections()
+            with self._lock:
+                self.running -= 1
+
+    async def run(self, func, *args, **kwargs):
+        """Awaits ``func(*args, **kwargs)`` run on a pool thread."""
+        with self._lock:
+            self.submitted += 1
+        loop = asyncio.get_running_loop()
+        # Unlike sync_to_async, run_in_executor does not carry context variables over
+        context = contextvars.copy_context()
+        call = functools.partial(context.run, func, *args, **kwargs)
+        return await loop.run_in_executor(self._executor, self._call, call)
+
+    def stats(self):
+        with self._lock:
+            return {"workers": self.workers, "running": self.running, "submitted": self.submitted}
+
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def get_offload_pool():
+    """Returns the process-wide pool sized by ASYNC_OFFLOAD_WORKERS."""
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                _pool = OffloadPool(settings.ASYNC_OFFLOAD_WORKERS)
+    return _pool
+
+
+async def offload(func, *args, **kwargs):
+    return await get_offload_pool().run(func, *args, **kwargs)
@@ -0,0 +1,219 @@
+"""Cleans up photos of thermometer and scale displays before OCR.
+
+Everything after decoding is vectorized NumPy on a grayscale array:
+
+1. grayscale conversion (the brightest channel, so coloured LEDs stay bright);
+2. auto-crop to the bright display region: an LCD panel, or the lit
+   segments of an LED display, found by box-filtering a brightness mask;
+3. adaptive thresholding against a box-filtered local mean (an integral
+   image), which keeps faint LCD segments and ignores glare gradients that
+   defeat one global threshold;
+4. deskew by the angle whose projection profile of the segments is
+   sharpest, then a tight crop around the row of characters.
+
+The result is a small 1-bit PNG with dark characters on white, usually a
+fraction of the upload's size.
+"""
+
+import io
+
+import numpy as np
+from PIL import Image
+
+from .ocr_engines import otsu_threshold, runs
+
+
+def to_grayscale(pixels):
+    """Brightest channel of an RGB (or already single-channel) array.
+
+    That is HSV value rather than luma: a lit red or green LED segment is
+    saturated in one channel, and would come out as a mid grey in luma.
+    """
+    if pixels.ndim == 2:
+        return pixels
+    # Pairwise maxima of the channel planes beat a reduction over the short last axis
+    return np.maximum(np.maximum(pixels[..., 0], pixels[..., 1]), pixels[..., 2])
+
+
+def box_mean(gray, radius):
+    """Mean of the (2 * radius + 1)-pixel square around every pixel, edges clamped."""
+    padded = np.pad(gray.astype(np.float64), radius + 1, mode="edge")
+    integral = padded.cumsum(axis=0).cumsum(axis=1)
+    size = 2 * radius + 1
+    window = (integral[size:, size:] - integral[:-size, size:]
+              - integral[size:, :-size] + integral[:-size, :-size])
+    height, width = gray.shape
+    return window[:height, :width] / (size * size)
+
+
+def class_gap(values, threshold):
+    """Difference between the mean values above and at or below ``threshold``."""
+    above = values > threshold
+    if above.all() or not above.any():
+        return 0.0
+    return float(values[above].mean() - values[~above].mean())
+
+
+def display_region(gray, min_fraction=0.01):
+    """``(top, bottom, left, right)`` of the bright display region in ``gray``, or None.
+
+    Bright pixels (above the Otsu threshold of the lightly smoothed image)
+    are spread by a wider box filter so that an LCD panel and its dark
+    digits, or the separate lit segments of an LED display, form one blob.
+    The region is the largest run of rows, then of columns within them,
+    where that blob is dense.
+    """
+    height, width = gray.shape
+    smooth = box_mean(gray, max(1, min(height, width) // 60))
+    smooth = smooth.astype(np.uint8)
+    threshold = otsu_threshold(smooth)
+    upper = smooth[smooth > threshold]
+    if upper.size:
+        # A lit scene and a brighter display make the upper class bimodal
+        # itself; then only the top of a second split is the display
+        second = otsu_threshold(upper)
+        if 2 * class_gap(upper, second) > class_gap(smooth, threshold):
+            threshold = second
+    bright = smooth > threshold
+    spread = max(3, min(height, width) // 12)
+    blob = box_mean(bright, spread) > 0.2
+    row_share = blob.mean(axis=1)
+    row_bands = runs(row_share > 0.5 * row_share.max(), min_gap=max(2, height // 50))
+    if not row_bands:
+        return None
+    top, bottom = max(row_bands, key=lambda band: band[1] - band[0])
+    column_share = blob[top:bottom].mean(axis=0)
+    # Characters are spaced by well under the display's height
+    column_bands = runs(column_share > 0.25 * column_share.max(), min_gap=max(2, (bottom - top) // 2))
+    if not column_bands:
+        return None
+    left, right = max(column_bands, key=lambda band: band[1] - band[0])
+    if (bottom - top) * (right - left) < min_fraction * height * width:
+        return None
+    # The density thresholds can clip the outermost characters; give them room
+    return (max(0, top - spread), min(height, bottom + spread),
+            max(0, left - spread), min(width, right + spread))
+
+
+def enclosed(background):
+    """Pixels with some ``background`` to their left, right, top and bottom."""
+    inside = np.logical_or.accumulate(background, axis=1)
+    inside &= np.logical_or.accumulate(background[:, ::-1], axis=1)[:, ::-1]
+    inside &= np.logical_or.accumulate(background, axis=0)
+    inside &= np.logical_or.accumulate(background[::-1], axis=0)[::-1]
+    return inside
+
+
+def adaptive_threshold(gray, radius, offset=0.15):
+    """Foreground mask: pixels further than ``offset`` from their local mean.
+
+    ``offset`` is a fraction of the contrast between the two Otsu classes,
+    so blur halos around bright segments stay out of the mask.
+
+    Display characters are the minority class in the middle of the display,
+    so the polarity (dark LCD segments or bright LEDs) is whichever side of
+    the Otsu threshold holds fewer of the pixels there. Only pixels enclosed
+    by the display background count, which drops the bezel around a panel.
+    """
+    background = gray > otsu_threshold(gray)
+    if background.all() or not background.any():
+        # A blank image: nothing stands out
+        return np.zeros_like(background)
+    local = box_mean(gray, radius)
+    margin = max(8.0, offset * (gray[background].mean() - gray[~background].mean()))
+    height, width = gray.shape
+    if background[height // 4:-(height // 4) or None, width // 4:-(width // 4) or None].mean() > 0.5:
+        foreground = gray < local - margin
+    else:
+        background = ~background
+        foreground = gray > local + margin
+    return foreground & enclosed(background)
+
+
+def skew_angle(mask, max_angle=10.0, step=0.5, max_points=20000):
+    """Angle in degrees that best aligns the foreground rows of ``mask``."""
+    ys, xs = np.nonzero(mask)
+    if len(ys) < 10:
+        return 0.0
+    if len(ys) > max_points:
+        keep = np.linspace(0, len(ys) - 1, max_points).astype(np.intp)
+        ys, xs = ys[keep], xs[keep]
+    angles = np.arange(-max_angle, max_angle + step / 2, step)
+    # Row each point lands on when the image is sheared by every candidate angle at once
+    shifts = np.tan(np.radians(angles))[:, None] * (xs - xs.mean())[None, :]
+    rows = np.rint(ys[None, :] + shifts).astype(np.intp)
+    rows -= rows.min()
+    span = rows.max() + 1
+    profiles = np.bincount((rows + span * np.arange(len(angles))[:, None]).ravel(),
+                           minlength=span * len(angles)).reshape(len(angles), span)
+    # Sharp, tall peaks where segments line up: maximize the sum of squares
+    score = (profiles.astype(np.float64) ** 2).sum(axis=1)
+    return float(angles[np.argmax(score)])
+
+
+def text_box(mask, margin):
+    """Box around the tallest row of characters, padded by ``margin``, or None.
+
+    Runs of rows or columns touching the edge of the mask are left out: they
+    are the display's bezel, cut diagonally by the crop when it is tilted.
+    """
+    height, width = mask.shape
+    row_bands = runs(mask.sum(axis=1) > 0.02 * width, min_gap=max(2, height // 50))
+    inner = [band for band in row_bands if band[0] > 0.02 * height and band[1] < 0.98 * height]
+    if not (inner or row_bands):
+        return None
+    top, bottom = max(inner or row_bands, key=lambda band: band[1] - band[0])
+    column_bands = runs(mask[top:bottom].sum(axis=0) > 0.05 * (bottom - top), min_gap=max(2, (bottom - top) // 3))
+    inner = [band for band in column_bands if band[0] > 0.02 * width and band[1] < 0.98 * width] or column_bands
+    if not inner:
+        return None
+    left, right = inner[0][0], inner[-1][1]
+    return (max(0, top - margin), min(height, bottom + margin),
+            max(0, left - margin), min(width, right + margin))
+
+
+def preprocess_display(source, max_dimension=1024, roi=None):
+    """Returns a 1-bit PNG of the display in an upload (bytes or seekable file).
+
+    ``roi`` is a ``(left, top, right, bottom)`` fraction box applied before the
+    automatic crop.
+    """
+    if isinstance(source, (bytes, bytearray)):
+        source = io.BytesIO(source)
+    source.seek(0)
+    image = Image.open(source)
+    if image.format == "JPEG":
+        # Decode at the smallest 1/2, 1/4 or 1/8 scale keeping half of max_dimension, in
+        # RGB rather than "L" so LEDs keep their brightest channel
+        image.draft("RGB", (max_dimension // 2, max_dimension // 2))
+    if roi is not None:
+        width, height = image.size
+        left, top, right, bottom = roi
+        image = image.crop((round(left * width), round(top * height), round(right * width), round(bottom * height)))
+    if max(image.size) > max_dimension:
+        image.thumbnail((max_dimension, max_dimension), Image.BILINEAR)
+    if image.mode not in ("RGB", "L"):
+        image = image.convert("RGB")
+    gray = to_grayscale(np.asarray(image))
+
+    # The display is large; finding it on a subsampled view is much cheaper
+    step = max(1, max(gray.shape) // 320)
+    region = display_region(gray[::step, ::step])
+    if region is not None:
+        top, bottom, left, right = (edge * step for edge in region)
+        gray = gray[top:bottom, left:right]
+
+    mask = adaptive_threshold(gray, radius=max(4, min(gray.shape) // 8))
+    angle = skew_angle(mask)
+    if angle:
+        # Rotating the mask keeps it binary; PIL turns the opposite way to the shear
+        mask = np.asarray(Image.fromarray(mask).rotate(-angle, resample=Image.NEAREST, expand=True))
+    box = text_box(mask, margin=max(4, min(mask.shape) // 10))
+    if box is not None:
+        top, bottom, left, right = box
+        mask = mask[top:bottom, left:right]
+
+    output = io.BytesIO()
+    Image.fromarray(~mask).convert("1").save(output, format="PNG", optimize=True)
+    return output.getvalue()
+
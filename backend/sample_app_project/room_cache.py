@@ -0,0 +1,182 @@
+"""Read-through cache of each room's latest readings for get_captured_data polling.
+
+Entries are keyed by roomId, carry an ETag derived from their content and
+are dropped as soon as this process saves a reading to the room. Writes
+made by other worker processes are picked up when the entry's TTL runs out,
+so keep ROOM_CACHE_TTL short when running several workers.
+"""
+
+import asyncio
+import hashlib
+import json
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+
+
+def make_etag(payload):
+    digest = hashlib.sha1(json.dumps(payload, sort_keys=True).encode()).hexdigest()
+    return f'"{digest[:20]}"'
+
+
+class RoomCache:
+    """Caches ``loader(room_id)`` per room and wakes long-pollers on invalidation."""
+
+    def __init__(self, ttl=5, max_rooms=1024):
+        self.ttl = ttl
+        self.max_rooms = max_rooms
+        self._entries = OrderedDict()
+        # Bumped on every invalidation so a load that raced a write is not cached.
+        # Only rooms with a load or long-poll in progress (counted in _holders)
+        # need one; the rest start again from 0, so the dict stays small.
+        self._versions = {}
+        self._holders = {}
+        self._changed = threading.Condition()
+        # (loop, asyncio.Event) of each await_change() in progress
+        self._async_waiters = set()
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+
+    def _lookup(self, room_id):
+        """``(entry, version)``: a fresh ``(stored_at, payload, etag)`` entry, or None and the version to load."""
+        with self._changed:
+            entry = self._entries.get(room_id)
+            if entry is not None and time.monotonic() - entry[0] < self.ttl:
+                self._entries.move_to_end(room_id)
+                self.hits += 1
+                return entry, None
+            self.misses += 1
+            self._hold(room_id)
+            return None, self._versions.get(room_id, 0)
+
+    def _hold(self, room_id):
+        # Called with self._changed held
+        self._holders[room_id] = self._holders.get(room_id, 0) + 1
+
+    def _release(self, room_id):
+        with self._changed:
+            holders = self._holders.pop(room_id) - 1
+            if holders:
+                self._holders[room_id] = holders
+            else:
+                self._versions.pop(room_id, None)
+
+    def _fill(self, room_id, version, payload):
+        etag = make_etag(payload)
+        with self._changed:
+            if self._versions.get(room_id, 0) == version:
+                self._entries[room_id] = (time.monotonic(), payload, etag)
+                self._entries.move_to_end(room_id)
+                while len(self._entries) > self.max_rooms:
+                    self._entries.popitem(last=False)
+        return payload, etag
+
+    def get(self, room_id, loader):
+        """Returns ``(payload, etag)``, calling ``loader`` on a miss or expiry."""
+        entry, version = self._lookup(room_id)
+        if entry is not None:
+            return entry[1], entry[2]
+        try:
+            return self._fill(room_id, version, loader(room_id))
+        finally:
+            self._release(room_id)
+
+    async def aget(self, room_id, loader):
+        """get() for async views: ``loader`` is a coroutine function, awaited only on a miss."""
+        entry, version = self._lookup(room_id)
+        if entry is not None:
+            return entry[1], entry[2]
+        try:
+            return self._fill(room_id, version, await loader(room_id))
+        finally:
+            self._release(room_id)
+
+    def wait_for_change(self, room_id, etag, loader, timeout):
+        """Long-poll: returns as soon as the room's ETag differs from ``etag``, or at ``timeout``."""
+        deadline = time.monotonic() + timeout
+        with self._changed:
+            self._hold(room_id)
+        try:
+            while True:
+                with self._changed:
+                    version = self._versions.get(room_id, 0)
+                payload, current = self.get(room_id, loader)
+                remaining = deadline - time.monotonic()
+                if current != etag or remaining <= 0:
+                    return payload, current
+                with self._changed:
+                    if self._versions.get(room_id, 0) == version:
+                        # Wake at least once per TTL to see writes from other processes
+                        self._changed.wait(min(remaining, self.ttl or remaining))
+        finally:
+            self._release(room_id)
+
+    async def await_change(self, room_id, etag, loader, timeout):
+        """wait_for_change() for async views: waits on the event loop rather than a thread."""
+        loop = asyncio.get_running_loop()
+        deadline = time.monotonic() + timeout
+        with self._changed:
+            self._hold(room_id)
+        try:
+            while True:
+                with self._changed:
+                    version = self._versions.get(room_id, 0)
+                payload, current = await self.aget(room_id, loader)
+                remaining = deadline - time.monotonic()
+                if current != etag or remaining <= 0:
+                    return payload, current
+                changed = asyncio.Event()
+                waiter = (loop, changed)
+                with self._changed:
+                    if self._versions.get(room_id, 0) != version:
+                        continue
+                    self._async_waiters.add(waiter)
+                try:
+                    await asyncio.wait_for(changed.wait(), min(remaining, self.ttl or remaining))
+                except asyncio.TimeoutError:
+                    pass
+                finally:
+                    with self._changed:
+                        self._async_waiters.discard(waiter)
+        finally:
+            self._release(room_id)
+
+    def invalidate(self, room_id):
+        with self._changed:
+            self._entries.pop(room_id, None)
+            if room_id in self._holders:
+                self._versions[room_id] = self._versions.get(room_id, 0) + 1
+            self.invalidations += 1
+            self._changed.notify_all()
+            waiters = list(self._async_waiters)
+        for loop, changed in waiters:
+            if not loop.is_closed():
+                loop.call_soon_threadsafe(changed.set)
+
+    def stats(self):
+        with self._changed:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "invalidations": self.invalidations,
+                "rooms": len(self._entries),
+            }
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def get_room_cache():
+    """Returns the process-wide room cache configured by ROOM_CACHE_*."""
+    global _cache
+    if _cache is None:
+        with _cache_lock:
+            if _cache is None:
+                _cache = RoomCache(ttl=settings.ROOM_CACHE_TTL, max_rooms=settings.ROOM_CACHE_MAX_ROOMS)
+    return _cache
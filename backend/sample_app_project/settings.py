@@ -7,6 +7,7 @@ Generated by 'django-admin startproject' using Django 5.1.7.
 import os
 from pathlib import Path
 import dj_database_url  # For PostgreSQL support on Render
+from corsheaders.defaults import default_headers
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
 BASE_DIR = Path(__file__).resolve().parent.parent
@@ -21,6 +22,9 @@ DEBUG = os.environ.get('DEBUG', 'False') == 'True'
 ALLOWED_HOSTS = os.environ.get('ALLOWED_HOSTS', '.onrender.com').split(',')
 
 CORS_ALLOW_ALL_ORIGINS = True
+# Lets pollers send If-None-Match and read the ETag of get-data responses
+CORS_ALLOW_HEADERS = (*default_headers, "if-none-match")
+CORS_EXPOSE_HEADERS = ["ETag"]
 APPEND_SLASH = False
 
 # Application definition
@@ -38,7 +42,10 @@ INSTALLED_APPS = [
 
 MIDDLEWARE = [
     'django.middleware.security.SecurityMiddleware',
-    'whitenoise.middleware.WhiteNoiseMiddleware',  # Static file handling on Render
+    # Static file handling on Render; WhiteNoise made async-capable for the async views
+    'sample_app_project.middleware.AsyncWhiteNoiseMiddleware',
+    # Server-Timing header with the upload stage timings, when METRICS_SERVER_TIMING is on
+    'sample_app_project.middleware.ServerTimingMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'corsheaders.middleware.CorsMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -70,7 +77,9 @@ WSGI_APPLICATION = 'sample_app_project.wsgi.application'
 
 # Database: PostgreSQL on Render or fallback to SQLite for local dev
 DATABASES = {
-    'default': dj_database_url.config(default=os.environ.get("DATABASE_URL"))
+    'default': dj_database_url.config(
+        default=os.environ.get("DATABASE_URL") or f"sqlite:///{BASE_DIR / 'db.sqlite3'}"
+    )
 }
 
 # Password validation
@@ -92,5 +101,108 @@ STATIC_URL = 'static/'
 STATIC_ROOT = os.path.join(BASE_DIR, 'staticfiles')
 STATICFILES_STORAGE = 'whitenoise.storage.CompressedManifestStaticFilesStorage'
 
+# Firebase Realtime Database holding the captured readings
+FIREBASE_DATABASE_URL = os.environ.get('FIREBASE_DATABASE_URL', 'https://fir-rtc-521a2-default-rtdb.firebaseio.com/')
+
+# Where readings are stored: 'firebase' (latest reading per type), 'database'
+# (full history in DATABASES) or the dotted path of a MeasurementStorage subclass
+MEASUREMENT_STORAGE = os.environ.get('MEASUREMENT_STORAGE', 'firebase')
+
+# 'True' coalesces Firebase writes by path and sends them from a background
+# thread as multi-path updates of up to FIREBASE_WRITE_MAX_BATCH paths, at
+# most FIREBASE_WRITE_MAX_DELAY seconds after a reading is saved. Uploads then
+# return before the reading is written: readings still buffered when the
+# process is killed, or refused by the database five times, are lost. Saves
+# wait up to FIREBASE_WRITE_MAX_WAIT seconds while FIREBASE_WRITE_MAX_PENDING
+# paths are waiting, then fail with 503. Off by default: each upload writes
+# its reading before answering.
+FIREBASE_WRITE_BEHIND = os.environ.get('FIREBASE_WRITE_BEHIND', 'False') == 'True'
+FIREBASE_WRITE_MAX_BATCH = int(os.environ.get('FIREBASE_WRITE_MAX_BATCH', '500'))
+FIREBASE_WRITE_MAX_DELAY = float(os.environ.get('FIREBASE_WRITE_MAX_DELAY', '0.05'))
+FIREBASE_WRITE_MAX_PENDING = int(os.environ.get('FIREBASE_WRITE_MAX_PENDING', '10000'))
+FIREBASE_WRITE_MAX_WAIT = float(os.environ.get('FIREBASE_WRITE_MAX_WAIT', '5'))
+
+# Upload stage timings (decode, ocr, extract, store) are always recorded for
+# /metrics; METRICS_SERVER_TIMING also returns them per request in a
+# Server-Timing response header
+METRICS_SERVER_TIMING = os.environ.get('METRICS_SERVER_TIMING', 'False') == 'True'
+
+# Upload admission control, per process: at most UPLOAD_MAX_CONCURRENT
+# uploads run OCR at once, UPLOAD_MAX_QUEUE more wait up to UPLOAD_MAX_WAIT
+# seconds for a slot, and the rest get 429 with Retry-After
+UPLOAD_MAX_CONCURRENT = int(os.environ.get('UPLOAD_MAX_CONCURRENT', '16'))
+UPLOAD_MAX_QUEUE = int(os.environ.get('UPLOAD_MAX_QUEUE', '32'))
+UPLOAD_MAX_WAIT = float(os.environ.get('UPLOAD_MAX_WAIT', '5'))
+# Token buckets: uploads per second and burst size for each roomId and each
+# client address (a rate of 0 disables the limit)
+UPLOAD_ROOM_RATE = float(os.environ.get('UPLOAD_ROOM_RATE', '2'))
+UPLOAD_ROOM_BURST = int(os.environ.get('UPLOAD_ROOM_BURST', '10'))
+UPLOAD_CLIENT_RATE = float(os.environ.get('UPLOAD_CLIENT_RATE', '5'))
+UPLOAD_CLIENT_BURST = int(os.environ.get('UPLOAD_CLIENT_BURST', '20'))
+# Behind a proxy that sets X-Forwarded-For (Render does), identify clients by
+# its first address; otherwise by the connection's address. Leave it off only
+# when clients connect directly: behind a proxy every client has the proxy's
+# address and shares one client bucket. render.yaml turns it on.
+UPLOAD_TRUST_FORWARDED_FOR = os.environ.get('UPLOAD_TRUST_FORWARDED_FOR', 'False') == 'True'
+
+# Threads that run the blocking OCR and storage calls of the async views
+# (upload, get-data); it bounds their remote calls in flight per process
+ASYNC_OFFLOAD_WORKERS = int(os.environ.get('ASYNC_OFFLOAD_WORKERS', '32'))
+
+# The FastAPI video server that start-stream launches and supervises: an
+# ASGI app path, run with uvicorn from VIDEO_SERVER_DIR, that answers /health
+VIDEO_SERVER_DIR = os.environ.get('VIDEO_SERVER_DIR', str(BASE_DIR.parent / 'video-conferencing-app'))
+VIDEO_SERVER_APP = os.environ.get('VIDEO_SERVER_APP', 'video_server:app')
+VIDEO_SERVER_HOST = os.environ.get('VIDEO_SERVER_HOST', '127.0.0.1')
+VIDEO_SERVER_PORT = int(os.environ.get('VIDEO_SERVER_PORT', '8001'))
+# Seconds to wait for /health on a start before giving up
+VIDEO_SERVER_START_TIMEOUT = float(os.environ.get('VIDEO_SERVER_START_TIMEOUT', '15'))
+
+# New readings are POSTed here (the video server's /internal/measurements)
+# and pushed to the room's /ws peers; empty disables it
+MEASUREMENT_NOTIFY_URL = os.environ.get('MEASUREMENT_NOTIFY_URL', '')
+MEASUREMENT_NOTIFY_TOKEN = os.environ.get('MEASUREMENT_NOTIFY_TOKEN', '')
+
+# get-data room cache: writes in this process invalidate a room at once,
+# writes from other workers show up within ROOM_CACHE_TTL seconds (0 disables it)
+ROOM_CACHE_TTL = float(os.environ.get('ROOM_CACHE_TTL', '5'))
+ROOM_CACHE_MAX_ROOMS = int(os.environ.get('ROOM_CACHE_MAX_ROOMS', '1024'))
+# Longest a ?wait= long-poll may be held, in seconds. Under ASGI a held poll
+# waits on the event loop; under WSGI it ties up a whole worker thread, so
+# ROOM_CACHE_MAX_WAIT_WSGI applies instead (0 answers such polls at once).
+ROOM_CACHE_MAX_WAIT = float(os.environ.get('ROOM_CACHE_MAX_WAIT', '25'))
+ROOM_CACHE_MAX_WAIT_WSGI = float(os.environ.get('ROOM_CACHE_MAX_WAIT_WSGI', '0'))
+
+# OCR engine: 'vision' (Google Cloud Vision), 'seven_segment' (local reader
+# for thermometer/scale displays) or the dotted path of an OCREngine subclass
+OCR_ENGINE = os.environ.get('OCR_ENGINE', 'vision')
+
+# Uploads larger than this (pixels, longest side) are downscaled before OCR;
+# smaller JPEG/PNG uploads are sent to OCR byte-for-byte
+OCR_MAX_IMAGE_DIMENSION = int(os.environ.get('OCR_MAX_IMAGE_DIMENSION', '2048'))
+OCR_JPEG_QUALITY = int(os.environ.get('OCR_JPEG_QUALITY', '90'))
+
+# Crop uploads to the display, threshold and deskew them before OCR (sends a
+# small 1-bit PNG instead of the photo); the display is located at up to
+# OCR_PREPROCESS_MAX_DIMENSION pixels on the longest side. On by default only
+# for the seven_segment engine, the one it has been measured with: the crop
+# keeps the tallest text row and can cut off the units Vision would read
+OCR_PREPROCESS = os.environ.get('OCR_PREPROCESS', str(OCR_ENGINE == 'seven_segment')) == 'True'
+OCR_PREPROCESS_MAX_DIMENSION = int(os.environ.get('OCR_PREPROCESS_MAX_DIMENSION', '1024'))
+
+# Background OCR jobs (upload_image with ?async=1)
+OCR_JOB_WORKERS = int(os.environ.get('OCR_JOB_WORKERS', '4'))
+OCR_JOB_QUEUE_DEPTH = int(os.environ.get('OCR_JOB_QUEUE_DEPTH', '32'))
+OCR_JOB_RESULT_TTL = int(os.environ.get('OCR_JOB_RESULT_TTL', '600'))  # seconds
+
+# OCR result cache keyed by image hash: 'memory' (per process), 'file'
+# (shared by workers through OCR_CACHE_DIR) or 'none'
+OCR_CACHE_BACKEND = os.environ.get('OCR_CACHE_BACKEND', 'memory')
+OCR_CACHE_DIR = os.environ.get('OCR_CACHE_DIR', '/tmp/telehealth-ocr-cache')
+OCR_CACHE_MAX_ENTRIES = int(os.environ.get('OCR_CACHE_MAX_ENTRIES', '1024'))
+OCR_CACHE_TTL = int(os.environ.get('OCR_CACHE_TTL', '3600'))  # seconds
+# Max dHash Hamming distance for near-duplicate hits; 0 disables it
+OCR_CACHE_PHASH_DISTANCE = int(os.environ.get('OCR_CACHE_PHASH_DISTANCE', '0'))
+
 # Default primary key field type
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
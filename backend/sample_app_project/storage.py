@@ -0,0 +1,237 @@
+"""Where OCR readings are saved and read back, chosen with the MEASUREMENT_STORAGE setting.
+
+``firebase`` keeps the latest reading per type under ``/data/{roomId}/{type}``
+in the Realtime Database, as the app always has. ``database`` appends every
+reading to the Reading table in Django's configured database, so a room's
+full history is kept and can be paged through.
+
+With FIREBASE_WRITE_BEHIND on, Firebase writes go through a
+WriteBehindBuffer and return before the round-trip; reads in this process
+see the unwritten readings. Room ids and types are checked before they are
+buffered, since one key the database rejects fails a whole multi-path update.
+"""
+
+import atexit
+import base64
+import re
+import threading
+from datetime import datetime
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db.models import OuterRef, Q, Subquery
+from django.utils.module_loading import import_string
+
+from .clients import db_reference
+from .offload import offload
+from .write_behind import WriteBehindBuffer
+
+
+class MeasurementStorage:
+    """Saves (capture_type, raw_text, formatted_value) readings per room."""
+
+    supports_history = False
+
+    def save(self, room_id, capture_type, raw_text, formatted_value):
+        self.save_many(room_id, [(capture_type, raw_text, formatted_value)])
+
+    def save_many(self, room_id, readings):
+        """Saves several readings in one write."""
+        raise NotImplementedError
+
+    def latest(self, room_id):
+        """Returns ``{capture_type: reading}`` with the newest reading of each type."""
+        raise NotImplementedError
+
+    async def alatest(self, room_id):
+        """latest() for async views, run on the offload pool."""
+        return await offload(self.latest, room_id)
+
+    def history(self, room_id, capture_type=None, limit=50, cursor=None):
+        """Returns ``(readings, next_cursor)``, newest first; next_cursor is None on the last page."""
+        raise NotImplementedError(f"{type(self).__name__} keeps no reading history")
+
+
+# Characters the Realtime Database refuses in a key; '/' would nest one reading in another
+_INVALID_KEY = re.compile(r"[.#$\[\]/\x00-\x1f\x7f]")
+
+
+class InvalidKey(ValueError):
+    """A room id or capture type that cannot be used as a Firebase key."""
+
+
+def check_key(name, key):
+    if not key or _INVALID_KEY.search(key) or len(key.encode()) > 768:
+        raise InvalidKey(f"{name} must be 1-768 bytes without . # $ [ ] / or control characters")
+
+
+class FirebaseStorage(MeasurementStorage):
+    """Latest reading per type in the Firebase Realtime Database."""
+
+    def __init__(self, write_buffer=None):
+        self.write_buffer = write_buffer or get_write_buffer()
+
+    def save(self, room_id, capture_type, raw_text, formatted_value):
+        if self.write_buffer is not None:
+            self.save_many(room_id, [(capture_type, raw_text, formatted_value)])
+            return
+        db_reference(f'/data/{room_id}/{capture_type}').set({
+            "formatted_value": formatted_value,
+            "raw_text": raw_text
+        })
+
+    def save_many(self, room_id, readings):
+        check_key("roomId", room_id)
+        for capture_type, _, _ in readings:
+            check_key("type", capture_type)
+        if self.write_buffer is not None:
+            self.write_buffer.put_many({
+                f"data/{room_id}/{capture_type}": {
+                    "formatted_value": formatted_value,
+                    "raw_text": raw_text
+                }
+                for capture_type, raw_text, formatted_value in readings
+            })
+            return
+        # One multi-path update instead of a set per reading
+        db_reference(f'/data/{room_id}').update({
+            capture_type: {
+                "formatted_value": formatted_value,
+                "raw_text": raw_text
+            }
+            for capture_type, raw_text, formatted_value in readings
+        })
+
+    def latest(self, room_id):
+        # The whole room node in one read rather than one read per type
+        data = db_reference(f'/data/{room_id}').get() or {}
+        latest = {capture_type: reading for capture_type, reading in data.items() if isinstance(reading, dict)}
+        if self.write_buffer is not None:
+            prefix = f"data/{room_id}/"
+            pending = self.write_buffer.pending(prefix)
+            latest.update({path[len(prefix):]: reading for path, reading in pending.items()})
+        return latest
+
+
+def update_root(updates):
+    """One multi-path update of ``{path: value}`` from the database root."""
+    db_reference('/').update(updates)
+
+
+_write_buffer = None
+_write_buffer_lock = threading.Lock()
+
+
+def get_write_buffer():
+    """Returns the process-wide Firebase write buffer, or None when FIREBASE_WRITE_BEHIND is off."""
+    global _write_buffer
+    if not settings.FIREBASE_WRITE_BEHIND:
+        return None
+    if _write_buffer is None:
+        with _write_buffer_lock:
+            if _write_buffer is None:
+                _write_buffer = WriteBehindBuffer(
+                    update_root,
+                    max_batch=settings.FIREBASE_WRITE_MAX_BATCH,
+                    max_delay=settings.FIREBASE_WRITE_MAX_DELAY,
+                    max_pending=settings.FIREBASE_WRITE_MAX_PENDING,
+                    max_wait=settings.FIREBASE_WRITE_MAX_WAIT,
+                )
+                # Pending readings are written before the interpreter exits
+                atexit.register(_write_buffer.close)
+    return _write_buffer
+
+
+def encode_cursor(reading):
+    value = f"{reading.created_at.isoformat()}|{reading.pk}"
+    return base64.urlsafe_b64encode(value.encode()).decode()
+
+
+def decode_cursor(cursor):
+    try:
+        created_at, pk = base64.urlsafe_b64decode(cursor.encode()).decode().split("|")
+        return datetime.fromisoformat(created_at), int(pk)
+    except ValueError:
+        raise ValueError("invalid cursor")
+
+
+class DatabaseStorage(MeasurementStorage):
+    """Append-only readings in the Reading table of Django's default database."""
+
+    supports_history = True
+
+    @staticmethod
+    def _model():
+        # Imported on use: this module is loaded before the app registry is ready
+        from sample_app.models import Reading
+        return Reading
+
+    @staticmethod
+    def serialize(reading):
+        return {
+            "capture_type": reading.capture_type,
+            "formatted_value": reading.formatted_value,
+            "raw_text": reading.raw_text,
+            "recorded_at": reading.created_at.isoformat(),
+        }
+
+    def save_many(self, room_id, readings):
+        Reading = self._model()
+        Reading.objects.bulk_create([
+            Reading(room_id=room_id, capture_type=capture_type, raw_text=raw_text,
+                    formatted_value=formatted_value)
+            for capture_type, raw_text, formatted_value in readings
+        ])
+
+    def latest(self, room_id):
+        Reading = self._model()
+        newest = Reading.objects.filter(
+            room_id=room_id, capture_type=OuterRef("capture_type")
+        ).order_by("-created_at", "-pk").values("pk")[:1]
+        # One query: each row is checked against the newest row of its type,
+        # which the (room_id, capture_type, created_at) index answers directly
+        rows = Reading.objects.filter(room_id=room_id, pk=Subquery(newest))
+        return {reading.capture_type: self.serialize(reading) for reading in rows}
+
+    async def alatest(self, room_id):
+        # The ORM stays on Django's thread-sensitive executor, with the request's connection
+        return await sync_to_async(self.latest)(room_id)
+
+    def history(self, room_id, capture_type=None, limit=50, cursor=None):
+        Reading = self._model()
+        rows = Reading.objects.filter(room_id=room_id)
+        if capture_type:
+            rows = rows.filter(capture_type=capture_type)
+        if cursor:
+            # Keyset pagination: continue strictly after the last row served,
+            # so deep pages cost the same as the first one
+            created_at, pk = decode_cursor(cursor)
+            rows = rows.filter(Q(created_at__lt=created_at) | Q(created_at=created_at, pk__lt=pk))
+        page = list(rows.order_by("-created_at", "-pk")[:limit + 1])
+        next_cursor = encode_cursor(page[limit - 1]) if len(page) > limit else None
+        return [self.serialize(reading) for reading in page[:limit]], next_cursor
+
+
+BACKENDS = {
+    "firebase": FirebaseStorage,
+    "database": DatabaseStorage,
+}
+
+_storage = None
+_storage_lock = threading.Lock()
+
+
+def load_storage(name):
+    """Instantiates the storage registered as ``name`` or found at that dotted path."""
+    storage_class = BACKENDS.get(name) or import_string(name)
+    return storage_class()
+
+
+def get_storage():
+    """Returns the process-wide storage selected by settings.MEASUREMENT_STORAGE."""
+    global _storage
+    if _storage is None:
+        with _storage_lock:
+            if _storage is None:
+                _storage = load_storage(settings.MEASUREMENT_STORAGE)
+    return _storage
@@ -19,11 +19,23 @@ URL configuration for sample_app_project project.
 """
 
 from django.urls import path
-from .views import upload_image, get_captured_data, start_live_stream
+from .views import (
+    upload_image, get_captured_data, start_live_stream, ocr_job_status, upload_batch,
+    ocr_cache_stats, get_history, room_cache_stats, write_buffer_stats, admission_stats,
+    metrics,
+)
 
 urlpatterns = [
     path("api/upload/", upload_image, name="upload_image"),
+    path("api/upload-batch/", upload_batch, name="upload_batch"),
+    path("api/jobs/<str:job_id>/", ocr_job_status, name="ocr_job_status"),
+    path("api/admission/stats/", admission_stats, name="admission_stats"),
+    path("api/ocr-cache/stats/", ocr_cache_stats, name="ocr_cache_stats"),
     path("api/get-data/", get_captured_data, name="get_captured_data"),  
+    path("api/history/", get_history, name="get_history"),
+    path("api/room-cache/stats/", room_cache_stats, name="room_cache_stats"),
+    path("api/write-buffer/stats/", write_buffer_stats, name="write_buffer_stats"),
     path("api/start-stream/", start_live_stream, name="start_live_stream"),
+    path("metrics", metrics, name="metrics"),
 ]
 
@@ -0,0 +1,241 @@
+"""Starts the FastAPI video server once and keeps it running.
+
+start_live_stream used to spawn a new server process on every request and
+sleep two seconds in the hope that it was up. The supervisor owns a single
+child instead: the first call starts it and polls its /health endpoint
+until it answers, and later calls return at once while it is healthy. A
+watcher thread restarts the child with exponential backoff if it exits,
+giving up after ``max_failed_starts`` failed starts in a row, and the child
+is stopped when Django exits. A live child that stops answering is only
+replaced after ``max_failed_probes`` missed probes in a row: a busy server
+that misses one probe keeps its connected peers.
+
+If something else already answers on the health URL, for example another
+worker's child or a server started by hand, it is reused rather than
+started again.
+
+Each worker process has its own supervisor. Starts are serialized across
+processes with an exclusive lock on ``lock_file`` (POSIX only), and the
+health URL is probed again once the lock is held. Workers sharing a port
+therefore start one child between them rather than racing for it; the
+others report it as "external". Only the worker that started the child
+restarts it.
+"""
+
+import atexit
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import urllib.request
+from contextlib import contextmanager
+
+from django.conf import settings
+
+try:
+    import fcntl
+except ImportError:  # Windows: starts are only serialized within a process
+    fcntl = None
+
+
+class VideoServerUnavailable(Exception):
+    pass
+
+
+class VideoServerSupervisor:
+    def __init__(self, command, health_url, cwd=None, env=None, start_timeout=15.0, poll_interval=0.05,
+                 healthy_for=2.0, restart_delay=0.5, max_restart_delay=30.0, probe_timeout=2.0,
+                 max_failed_probes=3, max_failed_starts=5, lock_file=None):
+        self.command = command
+        self.health_url = health_url
+        self.cwd = cwd
+        self.env = env
+        self.start_timeout = start_timeout
+        self.poll_interval = poll_interval
+        # A successful probe is trusted this long before probing again
+        self.healthy_for = healthy_for
+        self.restart_delay = restart_delay
+        self.max_restart_delay = max_restart_delay
+        self.probe_timeout = probe_timeout
+        self.max_failed_probes = max_failed_probes
+        self.max_failed_starts = max_failed_starts
+        # Shared by every process that may start this server
+        self.lock_file = lock_file
+        self.process = None
+        self.starts = 0
+        self.restarts = 0
+        self.last_startup = None
+        self._healthy_at = 0.0
+        self._failed_starts = 0
+        self._failed_probes = 0
+        self._stopping = False
+        self._lock = threading.Lock()
+
+    def probe(self, timeout=0.5):
+        """True if the health URL answers ``{"status": "healthy"}``."""
+        try:
+            with urllib.request.urlopen(self.health_url, timeout=timeout) as response:
+                return json.loads(response.read()).get("status") == "healthy"
+        except (OSError, ValueError, AttributeError):
+            return False
+
+    @contextmanager
+    def _start_lock(self):
+        """Holds the cross-process start lock, when there is one."""
+        if self.lock_file is None or fcntl is None:
+            yield
+            return
+        with open(self.lock_file, "a") as lock:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock, fcntl.LOCK_UN)
+
+    def _started_elsewhere(self):
+        """With the start lock held: True if another process's server is up by now."""
+        if self.lock_file is None or not self.probe():
+            return False
+        self._healthy_at = time.monotonic()
+        return True
+
+    def _running(self):
+        return self.process is not None and self.process.poll() is None
+
+    def ensure_running(self):
+        """Starts the server unless it is already healthy; returns a status dict.
+
+        Raises VideoServerUnavailable if it does not become healthy within
+        ``start_timeout`` seconds or exits while starting.
+        """
+        with self._lock:
+            now = time.monotonic()
+            alive = self._running()
+            if alive and now - self._healthy_at < self.healthy_for:
+                return self.status("running")
+            # Our own child gets longer to answer: it may just be busy
+            if self.probe(timeout=self.probe_timeout if alive else 0.5):
+                self._healthy_at = time.monotonic()
+                self._failed_probes = 0
+                return self.status("running" if alive else "external")
+            if alive:
+                self._failed_probes += 1
+                if self._failed_probes < self.max_failed_probes:
+                    return self.status("unresponsive")
+                # Alive but missing probe after probe: hung, so start over
+                print(f"Video server missed {self._failed_probes} health checks; restarting it")
+                self._terminate()
+            with self._start_lock():
+                # Another worker may have started it while this one waited for the lock
+                if self._started_elsewhere():
+                    return self.status("external")
+                self._start()
+            return self.status("started")
+
+    def _start(self):
+        started = time.monotonic()
+        self._stopping = False
+        self._failed_probes = 0
+        self.process = subprocess.Popen(self.command, cwd=self.cwd, env=self.env)
+        self.starts += 1
+        process = self.process
+        threading.Thread(target=self._watch, args=(process,), name="video-server-watch", daemon=True).start()
+
+        deadline = started + self.start_timeout
+        while time.monotonic() < deadline:
+            if process.poll() is not None:
+                self._failed_starts += 1
+                raise VideoServerUnavailable(f"video server exited with code {process.returncode} while starting")
+            if self.probe(timeout=self.poll_interval * 4):
+                self._healthy_at = time.monotonic()
+                self.last_startup = self._healthy_at - started
+                self._failed_starts = 0
+                return
+            time.sleep(self.poll_interval)
+        self._failed_starts += 1
+        self._terminate()
+        raise VideoServerUnavailable(f"video server was not healthy after {self.start_timeout:g} s")
+
+    def _watch(self, process):
+        """Restarts the server if ``process`` exits while it is still the current child."""
+        process.wait()
+        with self._lock:
+            if self._stopping or self.process is not process:
+                return
+            if self._failed_starts >= self.max_failed_starts:
+                print(f"Video server failed to start {self._failed_starts} times in a row; not restarting it")
+                self.process = None
+                return
+            delay = min(self.max_restart_delay, self.restart_delay * 2 ** self._failed_starts)
+        print(f"Video server exited with code {process.returncode}; restarting in {delay:g} s")
+        time.sleep(delay)
+        with self._lock:
+            # A request may have started a new child meanwhile
+            if self._stopping or self.process is not process:
+                return
+            try:
+                with self._start_lock():
+                    if self._started_elsewhere():
+                        print("Video server was restarted by another worker")
+                        self.process = None
+                        return
+                    self.restarts += 1
+                    # The new child gets its own watcher
+                    self._start()
+            except VideoServerUnavailable as e:
+                print(f"Video server restart failed: {e}")
+
+    def _terminate(self):
+        process, self.process = self.process, None
+        self._healthy_at = 0.0
+        if process is not None and process.poll() is None:
+            process.terminate()
+            try:
+                process.wait(timeout=5)
+            except subprocess.TimeoutExpired:
+                process.kill()
+                process.wait()
+
+    def stop(self):
+        with self._lock:
+            self._stopping = True
+            self._terminate()
+
+    def status(self, state):
+        return {
+            "status": state,
+            "health_url": self.health_url,
+            "pid": self.process.pid if self._running() else None,
+            "starts": self.starts,
+            "restarts": self.restarts,
+            "startup_ms": round(self.last_startup * 1000) if self.last_startup is not None else None,
+        }
+
+
+_supervisor = None
+_supervisor_lock = threading.Lock()
+
+
+def get_video_supervisor():
+    """Returns the process-wide supervisor of the server configured by VIDEO_SERVER_*."""
+    global _supervisor
+    if _supervisor is None:
+        with _supervisor_lock:
+            if _supervisor is None:
+                host, port = settings.VIDEO_SERVER_HOST, settings.VIDEO_SERVER_PORT
+                command = [sys.executable, "-m", "uvicorn", settings.VIDEO_SERVER_APP,
+                           "--host", host, "--port", str(port), "--log-level", "warning"]
+                _supervisor = VideoServerSupervisor(
+                    command,
+                    f"http://{'127.0.0.1' if host == '0.0.0.0' else host}:{port}/health",
+                    cwd=settings.VIDEO_SERVER_DIR,
+                    env=dict(os.environ, PYTHONPATH=settings.VIDEO_SERVER_DIR),
+                    start_timeout=settings.VIDEO_SERVER_START_TIMEOUT,
+                    # One per port, so every worker on this host finds the same file
+                    lock_file=os.path.join(tempfile.gettempdir(), f"video-server-{port}.lock"),
+                )
+                atexit.register(_supervisor.stop)
+    return _supervisor
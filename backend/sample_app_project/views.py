@@ -1,44 +1,33 @@
-import os
-import json
-import io
-import re
-import subprocess
-import firebase_admin
-from firebase_admin import credentials, db
-from google.cloud import vision
-from PIL import Image
-from django.http import JsonResponse
+import time
+from django.conf import settings
+from django.core.handlers.asgi import ASGIRequest
+from django.http import HttpResponse, HttpResponseNotModified, JsonResponse
+from django.urls import reverse
 from django.views.decorators.csrf import csrf_exempt
 from django.views.decorators.http import require_http_methods
-
-# Set up Firebase credentials from environment variable
-firebase_creds_json = os.environ.get("FIREBASE_CREDENTIALS_JSON")
-if not firebase_creds_json:
-    raise Exception("Missing FIREBASE_CREDENTIALS_JSON environment variable")
-
-firebase_creds = json.loads(firebase_creds_json)
-cred = credentials.Certificate(firebase_creds)
-
-# Initialize Firebase Admin SDK
-firebase_admin.initialize_app(cred, {
-    'databaseURL': 'https://fir-rtc-521a2-default-rtdb.firebaseio.com/'
-})
-
-# Set up Google Cloud Vision credentials from environment variable
-vision_creds_json = os.environ.get("GOOGLE_APPLICATION_CREDENTIALS_JSON")
-if not vision_creds_json:
-    raise Exception("Missing GOOGLE_APPLICATION_CREDENTIALS_JSON environment variable")
-
-vision_key_path = "/tmp/vision-key.json"
-with open(vision_key_path, "w") as f:
-    f.write(vision_creds_json)
-
-os.environ["GOOGLE_APPLICATION_CREDENTIALS"] = vision_key_path
-client = vision.ImageAnnotatorClient()
+from .admission import Overloaded, client_address, get_upload_admission
+from .extraction import extract_measurement, format_measurement
+from .image_ingest import parse_roi, prepare_image
+from .metrics import exposition, span
+from .ocr_cache import get_ocr_cache
+from .ocr_engines import get_ocr_engine
+from .notify import notify_readings
+from .offload import offload
+from .ocr_jobs import QueueFull, get_job_queue
+from .preprocess import preprocess_display
+from .room_cache import get_room_cache
+from .storage import InvalidKey, get_storage, get_write_buffer
+from .video_supervisor import VideoServerUnavailable, get_video_supervisor
+from .write_behind import BufferFull
 
 @csrf_exempt
 @require_http_methods(["POST"])
-def upload_image(request):
+async def upload_image(request):
+    """Runs OCR on one capture and saves the reading.
+
+    An async view: the OCR and storage calls run on the bounded offload
+    pool, so under ASGI uploads wait on them concurrently.
+    """
     if request.method == 'POST':
         image_file = request.FILES.get('image')
         capture_type = request.POST.get('type')  # 'temperature' or 'weight'
@@ -50,101 +39,360 @@ def upload_image(request):
             return JsonResponse({'error': 'No roomId provided'}, status=400)
 
         try:
-            # Convert image to byte format
-            image = Image.open(image_file)
-            img_byte_arr = io.BytesIO()
-            image.save(img_byte_arr, format='JPEG')
-            content = img_byte_arr.getvalue()
-
-            # Send image to Google OCR
-            vision_image = vision.Image(content=content)
-            response = client.text_detection(image=vision_image)
-            texts = response.text_annotations
-
-            raw_text = texts[0].description if texts else "No text found"
-            extracted_value = extract_numbers(raw_text, capture_type)
-
-            # Save to Firebase using roomId as custom key
-            save_to_firebase(capture_type, raw_text, extracted_value, room_id)
-
-            return JsonResponse({
-                "room_id": room_id,
-                "capture_type": capture_type,
-                "raw_text": raw_text,
-                "formatted_value": extracted_value
-            })
+            roi = parse_roi(request.POST.get('roi'))
+        except ValueError as e:
+            return JsonResponse({'error': str(e)}, status=400)
+
+        admission = get_upload_admission()
+        try:
+            admission.check_rates(room_id, client_address(request))
+        except Overloaded as e:
+            return too_many_requests(e)
+
+        try:
+            # ?async=1 (or an "async" form field) queues the OCR and returns a job id
+            if is_truthy(request.GET.get('async') or request.POST.get('async')):
+                # The upload is gone once this request ends, so hand the job its bytes
+                content = image_file.read()
+                try:
+                    job_id = get_job_queue().submit(process_image, content, capture_type, room_id, roi=roi)
+                except QueueFull as e:
+                    response = JsonResponse({"error": str(e)}, status=503)
+                    response["Retry-After"] = "1"
+                    return response
+                return JsonResponse({
+                    "job_id": job_id,
+                    "status": "queued",
+                    "status_url": reverse("ocr_job_status", args=[job_id]),
+                }, status=202)
+
+            async with admission.slot():
+                return JsonResponse(await offload(process_image, image_file, capture_type, room_id, roi=roi))
+        except Overloaded as e:
+            return too_many_requests(e)
+        except InvalidKey as e:
+            return JsonResponse({"error": str(e)}, status=400)
+        except BufferFull as e:
+            return storage_unavailable(e)
         except Exception as e:
             return JsonResponse({"error": str(e)}, status=500)
     return JsonResponse({"error": "Invalid request"}, status=400)
 
+@csrf_exempt
+@require_http_methods(["POST"])
+def upload_batch(request):
+    """Runs OCR on several captures for one room in a single request.
+
+    Send the files as repeated ``image`` fields with either one ``type``
+    for all of them or one ``type`` per image, in the same order.
+    """
+    image_files = request.FILES.getlist('image')
+    capture_types = request.POST.getlist('type')
+    room_id = request.POST.get('roomId')
+
+    if not image_files:
+        return JsonResponse({'error': 'No image uploaded'}, status=400)
+    if not room_id:
+        return JsonResponse({'error': 'No roomId provided'}, status=400)
+    if len(capture_types) == 1:
+        capture_types = capture_types * len(image_files)
+    if len(capture_types) != len(image_files):
+        return JsonResponse({'error': 'Send one type, or one type per image'}, status=400)
+
+    admission = get_upload_admission()
+    try:
+        admission.check_rates(room_id, client_address(request))
+        # One slot for the batch: it is one Vision call
+        with admission.hold():
+            return JsonResponse(process_batch(image_files, capture_types, room_id))
+    except Overloaded as e:
+        return too_many_requests(e)
+    except InvalidKey as e:
+        return JsonResponse({"error": str(e)}, status=400)
+    except BufferFull as e:
+        return storage_unavailable(e)
+    except Exception as e:
+        return JsonResponse({"error": str(e)}, status=500)
+
+def too_many_requests(overloaded):
+    response = JsonResponse({"error": str(overloaded)}, status=429)
+    response["Retry-After"] = str(overloaded.retry_after)
+    return response
+
+def storage_unavailable(error):
+    """503 for a reading the write buffer had no room for; it was not saved."""
+    response = JsonResponse({"error": str(error)}, status=503)
+    response["Retry-After"] = "1"
+    return response
+
+@require_http_methods(["GET"])
+def admission_stats(request):
+    """Queue depth, in-flight uploads and shed counts of upload admission control."""
+    return JsonResponse(get_upload_admission().stats())
+
+@require_http_methods(["GET"])
+def metrics(request):
+    """Prometheus metrics: upload stage latencies and the stats endpoints' counters."""
+    body, content_type = exposition()
+    return HttpResponse(body, content_type=content_type)
+
+@require_http_methods(["GET"])
+def ocr_cache_stats(request):
+    """Hit/miss counters of the OCR result cache."""
+    cache = get_ocr_cache()
+    if cache is None:
+        return JsonResponse({"enabled": False})
+    return JsonResponse({"enabled": True, **cache.stats()})
+
+@require_http_methods(["GET"])
+def ocr_job_status(request, job_id):
+    """Reports the progress of an upload queued with ?async=1."""
+    job = get_job_queue().get(job_id)
+    if job is None:
+        return JsonResponse({"error": "Unknown or expired job"}, status=404)
+    payload = {"job_id": job_id, "status": job["status"]}
+    if "result" in job:
+        payload["result"] = job["result"]
+    if "error" in job:
+        payload["error"] = job["error"]
+    return JsonResponse(payload)
+
+def is_truthy(value):
+    return str(value).lower() in ("1", "true", "yes")
+
+def process_image(content, capture_type, room_id, ocr=None, store=None, roi=None):
+    """Runs the OCR pipeline on an upload (bytes or file) and saves the reading.
+
+    ``ocr`` and ``store`` default to the configured OCR engine and storage;
+    tests pass local fakes with the same signatures as detect_text and save_reading.
+    """
+    ocr = ocr or detect_text
+    store = store or save_reading
+
+    with span("decode"):
+        content = prepare_upload(content, roi)
+    cache = get_ocr_cache()
+    with span("ocr"):
+        raw_text = cache.get_or_detect(content, ocr) if cache is not None else ocr(content)
+    with span("extract"):
+        measurement = extract_measurement(raw_text, capture_type)
+        extracted_value = format_measurement(measurement)
+
+    # Save using roomId as the room key
+    with span("store"):
+        store(capture_type, raw_text, extracted_value, room_id)
+
+    return {
+        "room_id": room_id,
+        "capture_type": capture_type,
+        "raw_text": raw_text,
+        "formatted_value": extracted_value,
+        "measurement": measurement.as_dict() if measurement else None
+    }
+
+def process_batch(contents, capture_types, room_id, ocr_batch=None, store_many=None):
+    """Runs OCR on several uploads with one batched call and one database write.
+
+    Per-image OCR errors are reported in that image's result and the image
+    is not stored; the other readings are still saved.
+    """
+    ocr_batch = ocr_batch or detect_text_batch
+    store_many = store_many or save_readings
+
+    with span("decode"):
+        contents = [prepare_upload(content) for content in contents]
+    with span("ocr"):
+        detections = detect_uncached(contents, ocr_batch)
+
+    results, readings = [], []
+    for capture_type, (raw_text, error) in zip(capture_types, detections):
+        if error:
+            results.append({"capture_type": capture_type, "error": error})
+            continue
+        with span("extract"):
+            measurement = extract_measurement(raw_text, capture_type)
+            extracted_value = format_measurement(measurement)
+        readings.append((capture_type, raw_text, extracted_value))
+        results.append({
+            "capture_type": capture_type,
+            "raw_text": raw_text,
+            "formatted_value": extracted_value,
+            "measurement": measurement.as_dict() if measurement else None
+        })
+    if readings:
+        with span("store"):
+            store_many(readings, room_id)
+    return {"room_id": room_id, "results": results}
+
+def detect_uncached(contents, ocr_batch):
+    """Answers what it can from the OCR cache and batches only the misses."""
+    cache = get_ocr_cache()
+    if cache is None:
+        return ocr_batch(contents)
+
+    detections = [None] * len(contents)
+    missing = []
+    for index, content in enumerate(contents):
+        cached = cache.lookup(content)
+        if cached is not None:
+            detections[index] = (cached, None)
+        else:
+            missing.append(index)
+    if missing:
+        started = time.perf_counter()
+        fresh = ocr_batch([contents[index] for index in missing])
+        cost = (time.perf_counter() - started) / len(missing)
+        for index, (raw_text, error) in zip(missing, fresh):
+            detections[index] = (raw_text, error)
+            if not error:
+                cache.store(contents[index], raw_text, cost)
+    return detections
+
+def prepare_upload(content, roi=None):
+    """Crops and binarizes the display when OCR_PREPROCESS is on.
+
+    Otherwise small JPEG/PNG uploads pass through and the rest are
+    downscaled and cropped.
+    """
+    if settings.OCR_PREPROCESS:
+        return preprocess_display(content, max_dimension=settings.OCR_PREPROCESS_MAX_DIMENSION, roi=roi)
+    return prepare_image(
+        content,
+        max_dimension=settings.OCR_MAX_IMAGE_DIMENSION,
+        roi=roi,
+        quality=settings.OCR_JPEG_QUALITY,
+    )
+
+def detect_text(content):
+    """Returns the text the configured OCR engine finds in the image."""
+    return get_ocr_engine().detect_text(content)
+
+def detect_text_batch(contents):
+    """Runs the configured OCR engine on several images.
+
+    Returns one ``(raw_text, error)`` pair per image, in order.
+    """
+    return get_ocr_engine().detect_text_batch(contents)
+
 def extract_numbers(text, capture_type):
-    """Extracts numerical values and appends 'Kg' or '°C' based on type."""
-    number_pattern = re.compile(r"\d+\.\d+|\d+")
-    numbers = number_pattern.findall(text)
-    if numbers:
-        value = float(numbers[0])  # Take the first detected number
-        if capture_type == 'weight':
-            return f"{value} Kg"
-        elif capture_type == 'temperature':
-            return f"{value}°C"
-    return "No valid number found"
-
-def save_to_firebase(capture_type, raw_text, formatted_value, custom_key):
-    """Saves extracted OCR data to Firebase Realtime Database using custom_key as parent node."""
-    ref = db.reference(f'/data/{custom_key}/{capture_type}')
-    ref.set({
-        "formatted_value": formatted_value,
-        "raw_text": raw_text
-    })
+    """The reading in ``text`` formatted with its unit, e.g. "36.8°C" or "70.0 Kg"."""
+    return format_measurement(extract_measurement(text, capture_type))
+
+def save_reading(capture_type, raw_text, formatted_value, room_id):
+    """Saves one reading to the configured measurement storage."""
+    get_storage().save(room_id, capture_type, raw_text, formatted_value)
+    get_room_cache().invalidate(room_id)
+    notify_readings(room_id, [(capture_type, raw_text, formatted_value)])
+
+def save_readings(readings, room_id):
+    """Saves several (capture_type, raw_text, formatted_value) readings in one write."""
+    get_storage().save_many(room_id, readings)
+    get_room_cache().invalidate(room_id)
+    notify_readings(room_id, readings)
+
+def load_latest_readings(room_id):
+    """The get-data payload for a room, or None when it has no readings."""
+    latest = get_storage().latest(room_id)
+    return format_latest(latest)
+
+async def aload_latest_readings(room_id):
+    return format_latest(await get_storage().alatest(room_id))
+
+def format_latest(latest):
+    if not latest:
+        return None
+    formatted_data = {"temperature": [], "weight": []}
+    for capture_type, reading in latest.items():
+        formatted_data[capture_type] = [reading]
+    return formatted_data
 
 @require_http_methods(["GET"])
-def get_captured_data(request):
-    """Retrieve captured data for a specific roomId from Firebase."""
+async def get_captured_data(request):
+    """Retrieve the latest readings for a specific roomId.
+
+    Answers from the room cache and sends an ETag; a poll whose If-None-Match
+    still matches gets an empty 304. With ``?wait=<seconds>`` and an
+    If-None-Match header the request is held until a new reading arrives or
+    the wait runs out. Under ASGI held requests wait on the event loop and
+    the wait is capped at ROOM_CACHE_MAX_WAIT; under WSGI each one would
+    hold a worker, so it is capped at ROOM_CACHE_MAX_WAIT_WSGI.
+    """
     try:
         room_id = request.GET.get("roomId")  # Capture roomId from query parameter
 
         if not room_id:
             return JsonResponse({"error": "Missing roomId parameter"}, status=400)
+        try:
+            max_wait = (settings.ROOM_CACHE_MAX_WAIT if isinstance(request, ASGIRequest)
+                        else settings.ROOM_CACHE_MAX_WAIT_WSGI)
+            wait = min(float(request.GET.get("wait", 0)), max_wait)
+        except ValueError:
+            return JsonResponse({"error": "wait must be a number of seconds"}, status=400)
 
-        temperature_ref = db.reference(f'/data/{room_id}/temperature')
-        weight_ref = db.reference(f'/data/{room_id}/weight')
+        cache = get_room_cache()
+        client_etags = [tag.strip().removeprefix("W/") for tag in request.headers.get("If-None-Match", "").split(",")]
+        if wait > 0 and client_etags[0]:
+            data, etag = await cache.await_change(room_id, client_etags[0], aload_latest_readings, wait)
+        else:
+            data, etag = await cache.aget(room_id, aload_latest_readings)
 
-        temperature_data = temperature_ref.get()
-        weight_data = weight_ref.get()
+        if etag in client_etags:
+            response = HttpResponseNotModified()
+        elif data is None:
+            response = JsonResponse({"error": "No data found for given roomId"}, status=404)
+        else:
+            response = JsonResponse({"data": data})
+        response["ETag"] = etag
+        # Browsers may keep the response but must revalidate it on every poll
+        response["Cache-Control"] = "no-cache"
+        return response
+    except Exception as e:
+        return JsonResponse({"error": str(e)}, status=500)
 
-        if not temperature_data and not weight_data:
-            return JsonResponse({"error": "No data found for given roomId"}, status=404)
+@require_http_methods(["GET"])
+def room_cache_stats(request):
+    """Hit/miss counters of the get-data room cache."""
+    return JsonResponse(get_room_cache().stats())
 
-        formatted_data = {
-            "temperature": [temperature_data] if temperature_data else [],
-            "weight": [weight_data] if weight_data else [],
-        }
+@require_http_methods(["GET"])
+def write_buffer_stats(request):
+    """Batch size and flush latency of the Firebase write-behind buffer."""
+    buffer = get_write_buffer()
+    if buffer is None:
+        return JsonResponse({"enabled": False})
+    return JsonResponse({"enabled": True, **buffer.stats()})
 
-        return JsonResponse({"data": formatted_data})
-    except Exception as e:
-        return JsonResponse({"error": str(e)}, status=500)
+@require_http_methods(["GET"])
+def get_history(request):
+    """Pages through a room's readings, newest first.
+
+    Query parameters: roomId (required), type, limit (default 50, max 200)
+    and cursor, the next_cursor of the previous page.
+    """
+    room_id = request.GET.get("roomId")
+    if not room_id:
+        return JsonResponse({"error": "Missing roomId parameter"}, status=400)
+    try:
+        limit = min(max(int(request.GET.get("limit", 50)), 1), 200)
+    except ValueError:
+        return JsonResponse({"error": "limit must be an integer"}, status=400)
+
+    storage = get_storage()
+    if not storage.supports_history:
+        return JsonResponse({"error": "The configured storage keeps no reading history"}, status=501)
+    try:
+        readings, next_cursor = storage.history(
+            room_id, capture_type=request.GET.get("type"), limit=limit, cursor=request.GET.get("cursor")
+        )
+    except ValueError as e:
+        return JsonResponse({"error": str(e)}, status=400)
+    return JsonResponse({"room_id": room_id, "data": readings, "next_cursor": next_cursor})
 
 @csrf_exempt
 @require_http_methods(["GET"])
 def start_live_stream(request):
+    """Starts the video server unless it is already up, and reports its state."""
     try:
-        # Set the PYTHONPATH to the parent directory of the server folder
-        env = os.environ.copy()
-        env["PYTHONPATH"] = "c:/Users/User/Downloads/Telehealt-OCR/video-conferencing-app"
-
-        # Run the FastAPI server
-        subprocess.Popen(
-            ["python", "c:/Users/User/Downloads/Telehealt-OCR/video-conferencing-app/server/main.py"],
-            env=env
-        )
-
-        # Optionally, you can add a delay here to ensure the server starts before accessing the endpoint
-        import time
-        time.sleep(2)  # Wait for 2 seconds
-
-        # Now call the /start-server endpoint
-        import requests
-        response = requests.get("http://127.0.0.1:8001/start-server")
-        return JsonResponse(response.json())
-    except Exception as e:
-        return JsonResponse({"error": str(e)}, status=500)
+        return JsonResponse(get_video_supervisor().ensure_running())
+    except VideoServerUnavailable as e:
+        return JsonResponse({"error": str(e)}, status=503)
@@ -0,0 +1,252 @@
+"""Write-behind buffer for Firebase Realtime Database writes.
+
+Saving a reading used to cost a synchronous round-trip on the request
+thread. Writes are instead put in a buffer keyed by path, where a newer
+value replaces an unwritten older one. A single background thread sends
+them as multi-path updates: once ``max_batch`` paths are waiting, or
+``max_delay`` seconds after the oldest one arrived. close() (registered
+with atexit) writes whatever is left before the process exits.
+
+A failed update is put back without overwriting anything newer. Since one
+path the database rejects fails the whole update, the next batch is half
+the size and is sent right away, until the failing path is alone; a path
+that then fails ``max_attempts`` times is dropped and counted in
+``dropped``, so it cannot hold up every other room. Single paths are
+retried with backoff, and the batch size grows back after each success.
+
+While ``max_pending`` paths are waiting, put_many() blocks for up to
+``max_wait`` seconds and then raises BufferFull.
+
+The trade-off: a reading is acknowledged before it is written, so readings
+still buffered when the process is killed, or dropped as above, are lost.
+
+Paths in one buffer must not nest: a multi-path update rejects a path
+together with one of its ancestors.
+"""
+
+import threading
+import time
+from collections import deque
+
+
+def percentile(samples, pct):
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * pct / 100))] if ordered else 0.0
+
+
+class BufferFull(Exception):
+    """Raised when ``max_pending`` paths are still waiting after ``max_wait`` seconds."""
+
+
+class WriteBehindBuffer:
+    """Coalesces ``put`` calls by path and hands them to ``write`` in batches from one thread."""
+
+    def __init__(self, write, max_batch=500, max_delay=0.05, max_pending=10000, max_wait=5.0, retry_delay=0.5,
+                 max_retry_delay=5.0, max_attempts=5, samples=1024):
+        # write({path: value}) performs one multi-path update and raises on failure
+        self.write = write
+        self.max_batch = max_batch
+        self.max_delay = max_delay
+        self.max_pending = max_pending
+        self.max_wait = max_wait
+        self.retry_delay = retry_delay
+        self.max_retry_delay = max_retry_delay
+        self.max_attempts = max_attempts
+        self._pending = {}
+        self._in_flight = {}
+        self._oldest = None
+        self._retry_at = 0.0
+        self._failed_in_row = 0
+        # Halved after a failed multi-path update, to isolate a rejected path
+        self._batch_limit = max_batch
+        # Failed attempts of paths that were sent on their own
+        self._attempts = {}
+        self._closed = False
+        self._thread = None
+        self._changed = threading.Condition()
+        # Held for a whole batch so batches reach the database in order
+        self._flushing = threading.Lock()
+        self.puts = 0
+        self.coalesced = 0
+        self.flushes = 0
+        self.paths_written = 0
+        self.failures = 0
+        self.dropped = 0
+        self.shed = 0
+        self._batch_sizes = deque(maxlen=samples)
+        self._latencies = deque(maxlen=samples)
+
+    def put(self, path, value):
+        self.put_many({path: value})
+
+    def put_many(self, updates):
+        """Queues ``{path: value}`` writes; blocks only while ``max_pending`` paths are waiting."""
+        with self._changed:
+            # Back-pressure, bounded so request threads are not held indefinitely
+            if not self._changed.wait_for(lambda: len(self._pending) < self.max_pending or self._closed,
+                                          self.max_wait):
+                self.shed += 1
+                raise BufferFull(f"{len(self._pending)} writes are waiting for the database")
+            if self._closed:
+                raise RuntimeError("write buffer is closed")
+            for path, value in updates.items():
+                self.puts += 1
+                self.coalesced += path in self._pending
+                self._pending[path] = value
+            if self._oldest is None:
+                self._oldest = time.monotonic()
+            self._changed.notify_all()
+        self._ensure_started()
+
+    def pending(self, prefix=""):
+        """Unwritten values under ``prefix``, so readers see their own writes before a flush."""
+        with self._changed:
+            merged = {**self._in_flight, **self._pending}
+        return {path: value for path, value in merged.items() if path.startswith(prefix)}
+
+    def _ensure_started(self):
+        if self._thread is None:
+            with self._changed:
+                if self._thread is None and not self._closed:
+                    self._thread = threading.Thread(target=self._run, name="write-behind", daemon=True)
+                    self._thread.start()
+
+    def _due(self):
+        if not self._pending or time.monotonic() < self._retry_at:
+            return False
+        return len(self._pending) >= self._batch_limit or time.monotonic() - self._oldest >= self.max_delay
+
+    def _run(self):
+        while True:
+            with self._changed:
+                while not self._closed and not self._due():
+                    if not self._pending:
+                        self._changed.wait()
+                    else:
+                        wake_at = max(self._oldest + self.max_delay, self._retry_at)
+                        self._changed.wait(max(0.001, wake_at - time.monotonic()))
+                if self._closed:
+                    # close() writes the rest on its own thread
+                    return
+            self._flush_batch()
+
+    def _flush_batch(self):
+        """Writes up to ``max_batch`` pending paths; False if the update failed."""
+        with self._flushing:
+            with self._changed:
+                if not self._pending:
+                    return True
+                paths = list(self._pending)[:self._batch_limit]
+                batch = {path: self._pending.pop(path) for path in paths}
+                self._in_flight = batch
+                self._oldest = time.monotonic() if self._pending else None
+                # Room for writers blocked on max_pending
+                self._changed.notify_all()
+
+            started = time.perf_counter()
+            try:
+                self.write(batch)
+            except Exception as e:
+                print(f"Write-behind flush of {len(batch)} paths failed: {e}")
+                with self._changed:
+                    self.failures += 1
+                    self._in_flight = {}
+                    if len(batch) > 1:
+                        # Retried at once as two halves, narrowing down a rejected path
+                        self._batch_limit = len(batch) // 2
+                        self._retry_at = 0.0
+                    else:
+                        path, = batch
+                        attempts = self._attempts.pop(path, 0) + 1
+                        if attempts >= self.max_attempts:
+                            print(f"Write-behind dropped {path} after {attempts} failed attempts")
+                            self.dropped += 1
+                            batch = {}
+                        else:
+                            self._attempts[path] = attempts
+                        self._failed_in_row += 1
+                        delay = min(self.max_retry_delay, self.retry_delay * 2 ** (self._failed_in_row - 1))
+                        self._retry_at = time.monotonic() + delay
+                    # Newer values written meanwhile win over the failed batch
+                    self._pending = {**batch, **self._pending}
+                    if self._pending:
+                        self._oldest = self._oldest or time.monotonic()
+                    self._changed.notify_all()
+                return False
+
+            elapsed = time.perf_counter() - started
+            with self._changed:
+                self._in_flight = {}
+                self._retry_at = 0.0
+                self._failed_in_row = 0
+                self._batch_limit = min(self.max_batch, self._batch_limit * 2)
+                for path in batch:
+                    self._attempts.pop(path, None)
+                self.flushes += 1
+                self.paths_written += len(batch)
+                self._batch_sizes.append(len(batch))
+                self._latencies.append(elapsed)
+            return True
+
+    def flush(self):
+        """Writes everything pending now, on the calling thread; False if an update failed."""
+        failed = False
+        while True:
+            with self._changed:
+                if not self._pending:
+                    return not failed
+            if not self._flush_batch():
+                failed = True
+                with self._changed:
+                    # A failed multi-path update is split and retried at once
+                    if self._retry_at:
+                        return False
+
+    def close(self, attempts=None):
+        """Stops the background thread and writes what is left.
+
+        Gives up after ``attempts`` (default ``max_attempts``) flushes in a row
+        that neither write nor drop a path.
+        """
+        with self._changed:
+            self._closed = True
+            self._changed.notify_all()
+            thread = self._thread
+        if thread is not None:
+            thread.join()
+        attempts = attempts or self.max_attempts
+        stalled = 0
+        while stalled < attempts:
+            settled = self.paths_written + self.dropped
+            if self.flush():
+                return True
+            stalled = 0 if self.paths_written + self.dropped > settled else stalled + 1
+        with self._changed:
+            lost = len(self._pending)
+        print(f"Write-behind buffer closed with {lost} unwritten paths")
+        return False
+
+    def stats(self):
+        with self._changed:
+            sizes, latencies = list(self._batch_sizes), list(self._latencies)
+            return {
+                "pending": len(self._pending),
+                "in_flight": len(self._in_flight),
+                "puts": self.puts,
+                "coalesced": self.coalesced,
+                "flushes": self.flushes,
+                "paths_written": self.paths_written,
+                "failures": self.failures,
+                "dropped": self.dropped,
+                "shed": self.shed,
+                "batch_size": {
+                    "mean": sum(sizes) / len(sizes) if sizes else 0.0,
+                    "p50": percentile(sizes, 50),
+                    "max": max(sizes, default=0),
+                },
+                "flush_ms": {
+                    "p50": percentile(latencies, 50) * 1000,
+                    "p99": percentile(latencies, 99) * 1000,
+                    "max": max(latencies, default=0.0) * 1000,
+                },
+            }
@@ -1,28 +1,27 @@
+import threading
+
 from flask import Flask, Response
-import cv2
+
+from frame_broadcaster import from_environment
 
 app = Flask(__name__)
 
-# Initialize camera
-camera = cv2.VideoCapture(0)  # 0 is the default webcam
-if not camera.isOpened():
-    print("Error: Camera could not be opened.")
+# One capture and encode for all viewers, configured by STREAM_* variables
+broadcaster = from_environment()
 
 def generate_frames():
-    while True:
-        success, frame = camera.read()
-        if not success:
-            print("Error: Could not read frame from camera.")
-            break
-        else:
-            ret, buffer = cv2.imencode('.jpg', frame)
-            frame = buffer.tobytes()
-            yield (b'--frame\r\n'
-                   b'Content-Type: image/jpeg\r\n\r\n' + frame + b'\r\n')
+    for frame in broadcaster.subscribe():
+        yield (b'--frame\r\n'
+               b'Content-Type: image/jpeg\r\n\r\n' + frame + b'\r\n')
 
 @app.route('/video_feed')
 def video_feed():
     return Response(generate_frames(), mimetype='multipart/x-mixed-replace; boundary=frame')
 
+@app.route('/stream_stats')
+def stream_stats():
+    # Each open /video_feed holds one of these threads
+    return {**broadcaster.stats(), "threads": threading.active_count()}
+
 if __name__ == '__main__':
     app.run(host='0.0.0.0', port=5000, debug=True)
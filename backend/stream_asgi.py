@@ -0,0 +1,227 @@
+"""ASGI version of the MJPEG /video_feed: every viewer on one event loop, each paced to its own connection.
+
+The Flask route holds a worker thread per viewer for the life of the stream.
+Here a viewer is a coroutine fed by the shared FrameBroadcaster. A viewer's
+frame rate and JPEG quality follow how fast its socket drains: the server
+only lets a send finish once the transport has room, so slow sends mean a
+slow client. Such a viewer gets frames less often, and if even that misses
+``target_fps`` it steps down to a lower quality tier; a fast one steps back
+up. Each frame is encoded at most once per tier however many viewers
+share it.
+
+Send times only reflect the client once the kernel send buffer is full, and
+with autotuning that buffer can hold seconds of video. Run the module
+directly to listen on a socket whose SO_SNDBUF is capped at
+STREAM_SEND_BUFFER bytes (accepted connections inherit it):
+
+    STREAM_SOURCE=synthetic python stream_asgi.py --port 5001
+"""
+
+import argparse
+import asyncio
+import os
+import socket
+import threading
+from collections import Counter
+
+from fastapi import FastAPI
+from fastapi.responses import Response, StreamingResponse
+from prometheus_client import CONTENT_TYPE_LATEST, CollectorRegistry, generate_latest
+from prometheus_client.core import CounterMetricFamily, GaugeMetricFamily
+
+from frame_broadcaster import from_environment
+
+FRAME_HEADER = b'--frame\r\nContent-Type: image/jpeg\r\n\r\n'
+QUALITY_TIERS = (80, 60, 40, 25)
+
+
+class ViewerPacer:
+    """Frame interval and quality tier for one viewer, from a moving average of its send times."""
+
+    def __init__(self, max_fps=15, target_fps=None, tiers=QUALITY_TIERS, smoothing=0.3, upgrade_after=30):
+        self.min_interval = 1.0 / max_fps
+        self.target_interval = 1.0 / (target_fps or max_fps / 2)
+        self.tiers = tiers
+        self.tier = 0
+        self.smoothing = smoothing
+        self.upgrade_after = upgrade_after
+        self.send_time = None
+        self._fast_frames = 0
+        self.frames_sent = 0
+
+    @property
+    def quality(self):
+        return self.tiers[self.tier]
+
+    @property
+    def interval(self):
+        # Send no faster than the socket drains, with some headroom
+        return max(self.min_interval, 1.25 * (self.send_time or 0.0))
+
+    def record(self, seconds):
+        self.frames_sent += 1
+        if self.send_time is None:
+            self.send_time = seconds
+        else:
+            self.send_time += self.smoothing * (seconds - self.send_time)
+
+        if self.interval > self.target_interval and self.tier < len(self.tiers) - 1:
+            # Smaller frames drain faster; start the new tier from a fresh estimate
+            self.tier += 1
+            self.send_time = None
+            self._fast_frames = 0
+        elif self.tier > 0 and 2 * self.send_time < self.min_interval:
+            self._fast_frames += 1
+            if self._fast_frames >= self.upgrade_after:
+                self.tier -= 1
+                self.send_time = None
+                self._fast_frames = 0
+        else:
+            self._fast_frames = 0
+
+
+class AsyncFrameHub:
+    """Fans the broadcaster's frames out to coroutines on one event loop."""
+
+    def __init__(self, broadcaster, tiers=QUALITY_TIERS):
+        self.broadcaster = broadcaster
+        self.tiers = tiers
+        self.pacers = set()
+        self._loop = None
+        self._new_frame = None
+        # quality -> (sequence, future of the JPEG at that quality)
+        self._encoded = {}
+        broadcaster.listeners.append(self._on_frame)
+
+    def _on_frame(self, sequence):
+        # Called on the capture thread
+        loop = self._loop
+        if loop is not None and not loop.is_closed():
+            loop.call_soon_threadsafe(self._wake)
+
+    def _wake(self):
+        event, self._new_frame = self._new_frame, asyncio.Event()
+        event.set()
+
+    async def wait_for_frame(self, after, timeout=5.0):
+        """The newest frame with a sequence above ``after``, or None if none comes in time."""
+        while True:
+            latest = self.broadcaster.latest()
+            if latest is not None and latest[0] > after:
+                return latest
+            if not self.broadcaster.running:
+                return None
+            try:
+                await asyncio.wait_for(self._new_frame.wait(), timeout)
+            except asyncio.TimeoutError:
+                return None
+
+    async def jpeg(self, frame, quality):
+        sequence, jpeg, raw = frame
+        if quality >= self.broadcaster.quality:
+            return jpeg
+        cached = self._encoded.get(quality)
+        if cached is None or cached[0] != sequence:
+            future = self._loop.run_in_executor(None, self.broadcaster.encode, raw, quality)
+            cached = self._encoded[quality] = (sequence, future)
+        # Shielded: a viewer that disconnects must not cancel an encode others wait on
+        return await asyncio.shield(cached[1])
+
+    async def stream(self):
+        """Yields multipart MJPEG parts for one viewer until the capture stops or the client leaves."""
+        if self._loop is None:
+            self._loop = asyncio.get_running_loop()
+            self._new_frame = asyncio.Event()
+        pacer = ViewerPacer(max_fps=self.broadcaster.fps or 30, tiers=self.tiers)
+        self.pacers.add(pacer)
+        self.broadcaster.attach()
+        last_sequence, last_sent = 0, 0.0
+        try:
+            while True:
+                frame = await self.wait_for_frame(last_sequence)
+                if frame is None:
+                    return
+                delay = last_sent + pacer.interval - self._loop.time()
+                if delay > 0:
+                    await asyncio.sleep(delay)
+                    frame = self.broadcaster.latest() or frame
+                self.broadcaster.record_skipped(last_sequence, frame[0])
+                last_sequence = frame[0]
+                jpeg = await self.jpeg(frame, pacer.quality)
+                started = self._loop.time()
+                # Resumes once the server has handed the part to the transport
+                yield FRAME_HEADER + jpeg + b'\r\n'
+                last_sent = self._loop.time()
+                pacer.record(last_sent - started)
+        finally:
+            self.pacers.discard(pacer)
+            self.broadcaster.detach()
+
+    def stats(self):
+        return {
+            **self.broadcaster.stats(),
+            "viewers": len(self.pacers),
+            "quality_tiers": dict(Counter(pacer.quality for pacer in self.pacers)),
+            "threads": threading.active_count(),
+        }
+
+
+class HubCollector:
+    """The hub's stats as Prometheus metrics, read at scrape time."""
+
+    def __init__(self, hub):
+        self.hub = hub
+
+    def collect(self):
+        stats = self.hub.stats()
+        yield GaugeMetricFamily("stream_viewers", "Connected MJPEG viewers", stats["viewers"])
+        tiers = GaugeMetricFamily("stream_viewers_by_quality", "Viewers at each JPEG quality tier", labels=["quality"])
+        for quality in self.hub.tiers:
+            tiers.add_metric([str(quality)], stats["quality_tiers"].get(quality, 0))
+        yield tiers
+        yield GaugeMetricFamily("stream_capture_running", "1 while the camera is being read", int(stats["running"]))
+        yield CounterMetricFamily("stream_frames_encoded", "Frames captured and JPEG-encoded",
+                                  stats["frames_encoded"])
+        yield CounterMetricFamily("stream_frames_dropped", "Frames skipped by viewers that fell behind",
+                                  stats["frames_dropped"])
+
+
+app = FastAPI()
+# One capture and encode for all viewers, configured by STREAM_* variables
+hub = AsyncFrameHub(from_environment())
+registry = CollectorRegistry()
+registry.register(HubCollector(hub))
+
+
+@app.get("/video_feed")
+async def video_feed():
+    return StreamingResponse(hub.stream(), media_type='multipart/x-mixed-replace; boundary=frame')
+
+
+@app.get("/stream_stats")
+async def stream_stats():
+    return hub.stats()
+
+
+@app.get("/metrics")
+async def metrics():
+    return Response(generate_latest(registry), media_type=CONTENT_TYPE_LATEST)
+
+
+def listening_socket(host, port, send_buffer):
+    sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_SNDBUF, send_buffer)
+    sock.bind((host, port))
+    return sock
+
+
+if __name__ == "__main__":
+    import uvicorn
+
+    parser = argparse.ArgumentParser(description="Serve the ASGI MJPEG stream.")
+    parser.add_argument("--host", default="0.0.0.0")
+    parser.add_argument("--port", type=int, default=int(os.environ.get("PORT", "5001")))
+    args = parser.parse_args()
+    sock = listening_socket(args.host, args.port, int(os.environ.get("STREAM_SEND_BUFFER", "32768")))
+    uvicorn.Server(uvicorn.Config(app, log_level="warning", backlog=4096)).run(sockets=[sock])
@@ -0,0 +1,86 @@
+import threading
+import time
+import unittest
+from unittest import mock
+
+import cv2
+import numpy as np
+
+import server
+from frame_broadcaster import FrameBroadcaster, SyntheticSource
+
+
+def consume(broadcaster, duration, delay=0.0, frames=None):
+    received = [] if frames is None else frames
+    deadline = time.monotonic() + duration
+    stream = broadcaster.subscribe()
+    for jpeg in stream:
+        received.append(jpeg)
+        if time.monotonic() >= deadline:
+            break
+        time.sleep(delay)
+    stream.close()
+    return received
+
+
+class FrameBroadcasterTests(unittest.TestCase):
+    def make_broadcaster(self, source, **kwargs):
+        broadcaster = FrameBroadcaster(lambda: source, **kwargs)
+        # Let the capture thread go idle and exit before the interpreter does
+        self.addCleanup(lambda: broadcaster._thread and broadcaster._thread.join(timeout=2))
+        return broadcaster
+
+    def test_viewers_share_one_capture_and_encode(self):
+        source = SyntheticSource()
+        broadcaster = self.make_broadcaster(source, fps=50, idle_timeout=0.05)
+        results = [[], [], []]
+        viewers = [threading.Thread(target=consume, args=(broadcaster, 0.4), kwargs={"frames": frames})
+                   for frames in results]
+        for viewer in viewers:
+            viewer.start()
+        for viewer in viewers:
+            viewer.join()
+
+        self.assertTrue(all(len(frames) > 5 for frames in results))
+        # Every frame was read and encoded once, not once per viewer
+        self.assertLessEqual(broadcaster.frames_encoded, source.reads)
+        self.assertLess(source.reads, 0.4 * 50 * 2)
+
+    def test_slow_viewer_skips_to_newest_frame(self):
+        source = SyntheticSource()
+        broadcaster = self.make_broadcaster(source, fps=100, ring_size=2, idle_timeout=0.05)
+        frames = consume(broadcaster, 0.5, delay=0.1)
+        self.assertLessEqual(len(frames), 7)
+        self.assertGreater(broadcaster.frames_dropped, 10)
+        self.assertLessEqual(len(broadcaster.frames), 2)
+
+    def test_resolution_and_quality_are_applied(self):
+        source = SyntheticSource(size=(640, 480))
+        broadcaster = self.make_broadcaster(source, fps=30, width=160, height=120, quality=30, idle_timeout=0)
+        jpeg = consume(broadcaster, 0)[0]
+        frame = cv2.imdecode(np.frombuffer(jpeg, np.uint8), cv2.IMREAD_COLOR)
+        self.assertEqual(frame.shape[:2], (120, 160))
+
+    def test_capture_stops_and_releases_when_idle(self):
+        source = SyntheticSource()
+        broadcaster = self.make_broadcaster(source, fps=50, idle_timeout=0.05)
+        consume(broadcaster, 0.05)
+        broadcaster._thread.join(timeout=2)
+        self.assertFalse(broadcaster.running)
+        self.assertTrue(source.released)
+
+        # The next viewer reopens the source
+        self.assertTrue(consume(broadcaster, 0))
+
+    def test_video_feed_streams_multipart_jpeg(self):
+        source = SyntheticSource()
+        broadcaster = self.make_broadcaster(source, fps=30, idle_timeout=0.05)
+        with mock.patch.object(server, "broadcaster", broadcaster):
+            response = server.app.test_client().get("/video_feed")
+            chunk = next(response.response)
+            response.close()
+        self.assertTrue(chunk.startswith(b"--frame\r\nContent-Type: image/jpeg\r\n\r\n\xff\xd8"))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,78 @@
+import asyncio
+import unittest
+
+from frame_broadcaster import FrameBroadcaster, SyntheticSource
+from prometheus_client import CollectorRegistry
+
+from stream_asgi import FRAME_HEADER, AsyncFrameHub, HubCollector, ViewerPacer
+
+
+class ViewerPacerTests(unittest.TestCase):
+    def test_fast_viewer_keeps_full_rate_and_quality(self):
+        pacer = ViewerPacer(max_fps=15)
+        for _ in range(50):
+            pacer.record(0.001)
+        self.assertEqual(pacer.quality, 80)
+        self.assertAlmostEqual(pacer.interval, 1 / 15)
+
+    def test_slow_viewer_steps_down_then_recovers(self):
+        pacer = ViewerPacer(max_fps=15, upgrade_after=5)
+        for _ in range(20):
+            pacer.record(0.5)
+        self.assertEqual(pacer.quality, 25)
+
+        for _ in range(20):
+            pacer.record(0.001)
+        self.assertGreater(pacer.quality, 25)
+
+
+class AsyncFrameHubTests(unittest.TestCase):
+    def test_viewers_share_one_capture(self):
+        broadcaster = FrameBroadcaster(SyntheticSource, fps=30, idle_timeout=0.05)
+        hub = AsyncFrameHub(broadcaster)
+
+        async def watch(count):
+            stream = hub.stream()
+            parts = []
+            async for part in stream:
+                parts.append(part)
+                if len(parts) == count:
+                    break
+            await stream.aclose()
+            return parts
+
+        async def main():
+            return await asyncio.gather(*(watch(3) for _ in range(4)))
+
+        results = asyncio.run(main())
+        broadcaster._thread.join(timeout=2)
+        self.assertTrue(all(part.startswith(FRAME_HEADER) for parts in results for part in parts))
+        self.assertLessEqual(broadcaster.frames_encoded, 6)
+        self.assertEqual(broadcaster.subscribers, 0)
+        self.assertEqual(hub.stats()["viewers"], 0)
+
+    def test_lower_tier_is_encoded_once_per_frame(self):
+        broadcaster = FrameBroadcaster(SyntheticSource, quality=80)
+        hub = AsyncFrameHub(broadcaster)
+        encodes = []
+        encode = broadcaster.encode
+        broadcaster.encode = lambda frame, quality=None: encodes.append(quality) or encode(frame, quality)
+        frame = SyntheticSource().read()[1]
+        latest = (1, encode(frame), frame)
+
+        async def main():
+            hub._loop = asyncio.get_running_loop()
+            return await asyncio.gather(*(hub.jpeg(latest, 25) for _ in range(5)), hub.jpeg(latest, 80))
+
+        *low, full = asyncio.run(main())
+        self.assertEqual(encodes, [25])
+        self.assertIs(full, latest[1])
+        self.assertLess(len(low[0]), len(full))
+
+    def test_stats_are_exported_as_metrics(self):
+        hub = AsyncFrameHub(FrameBroadcaster(SyntheticSource))
+        registry = CollectorRegistry()
+        registry.register(HubCollector(hub))
+        self.assertEqual(registry.get_sample_value("stream_viewers"), 0)
+        self.assertEqual(registry.get_sample_value("stream_viewers_by_quality", {"quality": "80"}), 0)
+        self.assertEqual(registry.get_sample_value("stream_frames_encoded_total"), 0)
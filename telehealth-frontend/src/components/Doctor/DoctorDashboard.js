@@ -9,6 +9,9 @@ import {
 } from "../Handlers/patientsHandlers";
 import "./DoctorDashboard.css";
 
+// Video server /ws endpoint; it pushes new readings for the watched room
+const VIDEO_SERVER_WS_URL = "ws://127.0.0.1:8001/ws";
+
 const DoctorDashboard = () => {
   const [currentCity, setCurrentCity] = useState("CPT");
   const [showStream, setShowStream] = useState(false);
@@ -16,6 +19,7 @@ const DoctorDashboard = () => {
   const [capturedData, setCapturedData] = useState(null);
   const [loading, setLoading] = useState(false);
   const [searchQuery, setSearchQuery] = useState("");
+  const [watchedRoomId, setWatchedRoomId] = useState(null);
   const [doctorName, setDoctorName] = useState("");
   const [patientQueue, setPatientQueue] = useState([]);
   const [availableCities] = useState([
@@ -78,6 +82,30 @@ const DoctorDashboard = () => {
     return () => unsubscribe();
   }, [currentCity]);
 
+  // Readings saved after the last fetch arrive as measurement events
+  useEffect(() => {
+    if (!watchedRoomId) return;
+    const socket = new WebSocket(
+      `${VIDEO_SERVER_WS_URL}?roomId=${encodeURIComponent(watchedRoomId)}`
+    );
+    socket.onmessage = (event) => {
+      let message;
+      try {
+        message = JSON.parse(event.data);
+      } catch {
+        return;
+      }
+      if (message.type !== "measurement") return;
+      setCapturedData((previous) => ({
+        ...(previous || {}),
+        [message.captureType]: [
+          { formatted_value: message.formattedValue, raw_text: message.rawText },
+        ],
+      }));
+    };
+    return () => socket.close();
+  }, [watchedRoomId]);
+
   const toggleLiveStream = () => {
     setShowStream(!showStream);
   };
@@ -89,6 +117,7 @@ const DoctorDashboard = () => {
     }
 
     setLoading(true);
+    setWatchedRoomId(searchQuery.trim());
     try {
       const response = await fetch(
         `https://ocr-backend-application.onrender.com/api/get-data/?roomId=${encodeURIComponent(
@@ -0,0 +1,104 @@
+"""Broadcast delivery latency with a few artificially slow peers.
+
+Compares the old one-peer-at-a-time ``await send_text`` loop with the
+queued ConnectionManager. Latency is measured at the fast peers only,
+which should not be held up by the slow ones.
+
+    python -m benchmarks.broadcast_latency --peers 50 --slow 3
+"""
+import argparse
+import asyncio
+import contextlib
+import io
+import time
+
+from server.connection_manager import SLOW_CONSUMER_POLICIES, ConnectionManager
+
+
+class TimedWebSocket:
+    def __init__(self, name, delay):
+        self.client = name
+        self.delay = delay
+        self.latencies = []
+
+    async def accept(self):
+        pass
+
+    async def close(self, code=1000):
+        pass
+
+    async def send_text(self, message):
+        if self.delay:
+            await asyncio.sleep(self.delay)
+        self.latencies.append(time.perf_counter() - float(message))
+
+
+class SerialManager:
+    """The previous implementation: await each peer in turn."""
+
+    def __init__(self):
+        self.active_connections = []
+
+    async def connect(self, websocket, room_id=None):
+        self.active_connections.append(websocket)
+
+    async def broadcast(self, message, sender, room_id=None):
+        for connection in self.active_connections:
+            if connection != sender:
+                await connection.send_text(message)
+
+
+def percentile(samples, pct):
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * pct / 100))]
+
+
+async def run(manager, peers, slow, slow_delay, messages, interval):
+    sender = TimedWebSocket("sender", 0)
+    clients = [TimedWebSocket(f"peer-{i}", slow_delay if i < slow else 0) for i in range(peers)]
+    await manager.connect(sender, "room")
+    for client in clients:
+        await manager.connect(client, "room")
+
+    started = time.perf_counter()
+    for _ in range(messages):
+        await manager.broadcast(repr(time.perf_counter()), sender)
+        await asyncio.sleep(interval)
+    await asyncio.sleep(slow_delay * 2)
+    elapsed = time.perf_counter() - started
+
+    fast = [latency for client in clients[slow:] for latency in client.latencies]
+    for client in [sender] + clients:
+        if hasattr(manager, "disconnect"):
+            manager.disconnect(client)
+    return fast, elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--peers", type=int, default=50)
+    parser.add_argument("--slow", type=int, default=3)
+    parser.add_argument("--slow-delay", type=float, default=0.05, help="seconds per send for slow peers")
+    parser.add_argument("--messages", type=int, default=200)
+    parser.add_argument("--interval", type=float, default=0.002)
+    parser.add_argument("--queue", type=int, default=64)
+    args = parser.parse_args()
+
+    variants = [("serial", SerialManager)] + [
+        (policy, lambda policy=policy: ConnectionManager(max_queue=args.queue, policy=policy))
+        for policy in SLOW_CONSUMER_POLICIES
+    ]
+    print(f"{args.peers} peers, {args.slow} slow ({args.slow_delay * 1000:.0f} ms/send), {args.messages} messages")
+    print(f"{'manager':<12}{'p50 ms':>10}{'p99 ms':>10}{'delivered':>11}{'wall s':>9}")
+    for name, factory in variants:
+        # The manager logs every join/leave; keep the report readable
+        with contextlib.redirect_stdout(io.StringIO()):
+            latencies, elapsed = asyncio.run(
+                run(factory(), args.peers, args.slow, args.slow_delay, args.messages, args.interval)
+            )
+        print(f"{name:<12}{percentile(latencies, 50) * 1000:>10.2f}{percentile(latencies, 99) * 1000:>10.2f}"
+              f"{len(latencies):>11}{elapsed:>9.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,88 @@
+"""How soon a doctor's /ws connection sees a reading saved by the OCR backend.
+
+Starts video_server under uvicorn, connects a room peer over websockets and
+POSTs measurement events to /internal/measurements over a keep-alive client,
+as the Django notifier does. Polling get-data every --poll-interval seconds
+instead shows a new reading half an interval later on average.
+
+    python -m benchmarks.measurement_push --events 200
+"""
+import argparse
+import asyncio
+import json
+import os
+import socket
+import subprocess
+import sys
+import time
+
+import httpx
+import websockets
+
+APP_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+TOKEN = "benchmark"
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def wait_until_ready(port, timeout=15):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            httpx.get(f"http://127.0.0.1:{port}/firebase-config", timeout=1)
+            return
+        except httpx.TransportError:
+            time.sleep(0.1)
+    raise RuntimeError("video server did not start")
+
+
+async def measure(port, events):
+    latencies = []
+    async with websockets.connect(f"ws://127.0.0.1:{port}/ws?roomId=room-1") as doctor, \
+            httpx.AsyncClient(headers={"X-Notify-Token": TOKEN}) as hook:
+        for index in range(events):
+            event = {"type": "measurement", "roomId": "room-1", "captureType": "temperature",
+                     "rawText": "36.8", "formattedValue": "36.8°C", "seq": index}
+            started = time.perf_counter()
+            await hook.post(f"http://127.0.0.1:{port}/internal/measurements", json={"events": [event]})
+            while json.loads(await doctor.recv()).get("seq") != index:
+                pass
+            latencies.append(time.perf_counter() - started)
+    return sorted(latencies)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--events", type=int, default=200)
+    parser.add_argument("--poll-interval", type=float, default=2.0, help="dashboard polling period, seconds")
+    args = parser.parse_args()
+
+    port = free_port()
+    server = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "video_server:app", "--host", "127.0.0.1", "--port", str(port),
+         "--log-level", "warning"],
+        cwd=APP_DIR, env=dict(os.environ, MEASUREMENT_NOTIFY_TOKEN=TOKEN),
+        stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+    )
+    try:
+        wait_until_ready(port)
+        latencies = asyncio.run(measure(port, args.events))
+    finally:
+        server.terminate()
+        server.wait(timeout=10)
+
+    def pct(p):
+        return latencies[min(len(latencies) - 1, int(len(latencies) * p / 100))] * 1000
+
+    print(f"{args.events} readings pushed over /ws")
+    print(f"push:    p50 {pct(50):.2f} ms  p99 {pct(99):.2f} ms")
+    print(f"polling: mean {args.poll_interval * 500:.0f} ms, worst {args.poll_interval * 1000:.0f} ms "
+          f"at a {args.poll_interval:g} s interval")
+
+
+if __name__ == "__main__":
+    main()
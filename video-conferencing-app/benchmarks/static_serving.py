@@ -0,0 +1,89 @@
+"""Static file throughput: the old isfile + FileResponse route versus StaticIndex.
+
+Both apps serve the same tree (the CRA build by default) to concurrent
+in-process clients over httpx's ASGI transport, asking for a page load's
+worth of files with ``Accept-Encoding: gzip, br`` like a browser would.
+
+    python -m benchmarks.static_serving --requests 2000 --concurrency 20
+"""
+import argparse
+import asyncio
+import os
+import time
+
+import httpx
+from fastapi import FastAPI, Request
+from fastapi.responses import FileResponse, JSONResponse
+
+from server.static_files import StaticIndex
+
+DEFAULT_ROOT = os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))),
+                            "telehealth-frontend", "build")
+PATHS = ["/", "/static/js/main.b21d8118.js", "/static/css/main.b89a4860.css",
+         "/static/js/453.40b64c11.chunk.js", "/manifest.json", "/favicon.ico", "/doctor/room/abc"]
+
+
+def old_app(static_dir):
+    app = FastAPI()
+
+    @app.get("/{path:path}")
+    async def serve_frontend(path: str):
+        static_file = os.path.join(static_dir, path)
+        if os.path.isfile(static_file):
+            return FileResponse(static_file)
+        index_path = os.path.join(static_dir, "index.html")
+        if os.path.exists(index_path):
+            return FileResponse(index_path)
+        return JSONResponse(content={"error": "File not found"}, status_code=404)
+
+    return app
+
+
+def new_app(static_dir):
+    app = FastAPI()
+    index = StaticIndex(static_dir)
+    index.build()
+
+    @app.get("/{path:path}")
+    async def serve_frontend(path: str, request: Request):
+        asset = index.get(path) or index.get("index.html")
+        if asset is None:
+            return JSONResponse(content={"error": "File not found"}, status_code=404)
+        return index.respond(asset, request.headers)
+
+    return app
+
+
+async def load(app, requests, concurrency):
+    transferred = 0
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://testserver",
+                                 headers={"Accept-Encoding": "gzip, br"}) as client:
+        async def worker(offset):
+            nonlocal transferred
+            for index in range(offset, requests, concurrency):
+                async with client.stream("GET", PATHS[index % len(PATHS)]) as response:
+                    async for chunk in response.aiter_raw():
+                        transferred += len(chunk)
+
+        started = time.perf_counter()
+        await asyncio.gather(*(worker(offset) for offset in range(concurrency)))
+        return time.perf_counter() - started, transferred
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--root", default=DEFAULT_ROOT)
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--concurrency", type=int, default=20)
+    args = parser.parse_args()
+
+    print(f"{args.requests} requests, {args.concurrency} concurrent, root {args.root}")
+    print(f"{'route':<8}{'req/s':>10}{'MB sent':>10}")
+    for name, build in (("old", old_app), ("indexed", new_app)):
+        elapsed, transferred = asyncio.run(load(build(args.root), args.requests, args.concurrency))
+        print(f"{name:<8}{args.requests / elapsed:>10.0f}{transferred / 1e6:>10.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,258 @@
+import asyncio
+import fcntl
+import json
+import os
+import uuid
+from typing import Callable, Dict, Optional, Set
+
+# Called with (room_id, message) for every message published by another process
+MessageHandler = Callable[[str, str], None]
+
+# SDP offers easily exceed asyncio's default 64 KiB line limit
+LINE_LIMIT = 1024 * 1024
+
+
+class Backplane:
+    """Relays room messages between signaling processes.
+
+    A process subscribes to the rooms it has local members in and receives
+    every message another process publishes to those rooms. ``publish``,
+    ``subscribe`` and ``unsubscribe`` never block the caller.
+    """
+
+    def __init__(self):
+        self.node_id = uuid.uuid4().hex
+        self.rooms: Set[str] = set()
+        self.handler: Optional[MessageHandler] = None
+
+    async def start(self, handler: MessageHandler):
+        self.handler = handler
+
+    async def close(self):
+        self.handler = None
+
+    def subscribe(self, room_id: str):
+        self.rooms.add(room_id)
+
+    def unsubscribe(self, room_id: str):
+        self.rooms.discard(room_id)
+
+    def publish(self, room_id: str, message: str):
+        raise NotImplementedError
+
+
+class InMemoryHub:
+    """Routes messages between backplanes that live in the same process."""
+
+    def __init__(self):
+        self.subscribers: Dict[str, Set["InMemoryBackplane"]] = {}
+
+    def subscribe(self, backplane: "InMemoryBackplane", room_id: str):
+        self.subscribers.setdefault(room_id, set()).add(backplane)
+
+    def unsubscribe(self, backplane: "InMemoryBackplane", room_id: str):
+        members = self.subscribers.get(room_id)
+        if members is not None:
+            members.discard(backplane)
+            if not members:
+                del self.subscribers[room_id]
+
+    def publish(self, origin: "InMemoryBackplane", room_id: str, message: str):
+        for backplane in list(self.subscribers.get(room_id, ())):
+            if backplane is not origin and backplane.handler is not None:
+                backplane.handler(room_id, message)
+
+
+default_hub = InMemoryHub()
+
+
+class InMemoryBackplane(Backplane):
+    """Backplane for several managers in one process, e.g. tests or mounted sub-apps."""
+
+    def __init__(self, hub: Optional[InMemoryHub] = None):
+        super().__init__()
+        self.hub = hub or default_hub
+
+    async def close(self):
+        for room_id in list(self.rooms):
+            self.unsubscribe(room_id)
+        await super().close()
+
+    def subscribe(self, room_id: str):
+        super().subscribe(room_id)
+        self.hub.subscribe(self, room_id)
+
+    def unsubscribe(self, room_id: str):
+        super().unsubscribe(room_id)
+        self.hub.unsubscribe(self, room_id)
+
+    def publish(self, room_id: str, message: str):
+        self.hub.publish(self, room_id, message)
+
+
+class UnixSocketRelay:
+    """Forwards published lines to the other connections subscribed to the room."""
+
+    def __init__(self):
+        self.subscribers: Dict[str, Set[asyncio.StreamWriter]] = {}
+
+    async def handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        rooms: Set[str] = set()
+        try:
+            async for line in reader:
+                try:
+                    frame = json.loads(line)
+                    op, room_id = frame["op"], frame["room"]
+                except (ValueError, KeyError, TypeError):
+                    continue
+                if op == "pub":
+                    for peer in list(self.subscribers.get(room_id, ())):
+                        if peer is not writer and not peer.is_closing():
+                            peer.write(line)
+                elif op == "sub":
+                    rooms.add(room_id)
+                    self.subscribers.setdefault(room_id, set()).add(writer)
+                elif op == "unsub":
+                    rooms.discard(room_id)
+                    self._remove(writer, room_id)
+        except (ConnectionError, asyncio.IncompleteReadError, ValueError):
+            pass
+        finally:
+            for room_id in rooms:
+                self._remove(writer, room_id)
+            writer.close()
+
+    def _remove(self, writer: asyncio.StreamWriter, room_id: str):
+        members = self.subscribers.get(room_id)
+        if members is not None:
+            members.discard(writer)
+            if not members:
+                del self.subscribers[room_id]
+
+
+class UnixSocketBackplane(Backplane):
+    """Backplane shared by worker processes on one host through a Unix socket.
+
+    Every worker connects to a relay listening on ``path``. The relay runs
+    inside whichever worker holds the ``path + ".lock"`` file lock; when
+    that worker exits the lock is released, and the remaining workers
+    reconnect and elect a new relay.
+    """
+
+    def __init__(self, path: str, max_buffer: int = 4 * 1024 * 1024, retry_interval: float = 0.1):
+        super().__init__()
+        self.path = path
+        self.max_buffer = max_buffer
+        self.retry_interval = retry_interval
+        self.writer: Optional[asyncio.StreamWriter] = None
+        self.connected = asyncio.Event()
+        self._lock_fd: Optional[int] = None
+        self._server: Optional[asyncio.AbstractServer] = None
+        self._task: Optional[asyncio.Task] = None
+
+    async def start(self, handler: MessageHandler):
+        await super().start(handler)
+        self._task = asyncio.create_task(self._run())
+
+    async def close(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        if self.writer is not None:
+            self.writer.close()
+            self.writer = None
+        if self._server is not None:
+            self._server.close()
+            await self._server.wait_closed()
+            self._server = None
+            if os.path.exists(self.path):
+                os.unlink(self.path)
+        if self._lock_fd is not None:
+            os.close(self._lock_fd)
+            self._lock_fd = None
+        await super().close()
+
+    def subscribe(self, room_id: str):
+        super().subscribe(room_id)
+        self._send({"op": "sub", "room": room_id})
+
+    def unsubscribe(self, room_id: str):
+        super().unsubscribe(room_id)
+        self._send({"op": "unsub", "room": room_id})
+
+    def publish(self, room_id: str, message: str):
+        self._send({"op": "pub", "room": room_id, "msg": message, "origin": self.node_id})
+
+    def _send(self, frame: dict):
+        writer = self.writer
+        if writer is None or writer.is_closing():
+            return
+        if writer.transport.get_write_buffer_size() > self.max_buffer:
+            print("Signaling backplane is backed up; dropping message")
+            return
+        writer.write(json.dumps(frame).encode() + b"\n")
+
+    async def _run(self):
+        while True:
+            await self._elect_relay()
+            try:
+                reader, writer = await asyncio.open_unix_connection(self.path, limit=LINE_LIMIT)
+            except (FileNotFoundError, ConnectionRefusedError):
+                await asyncio.sleep(self.retry_interval)
+                continue
+            self.writer = writer
+            for room_id in self.rooms:
+                self._send({"op": "sub", "room": room_id})
+            self.connected.set()
+            try:
+                async for line in reader:
+                    self._dispatch(line)
+            except (ConnectionError, ValueError):
+                pass
+            finally:
+                self.connected.clear()
+                self.writer = None
+                writer.close()
+            print("Signaling backplane relay lost; reconnecting")
+
+    async def _elect_relay(self):
+        """Starts the relay in this process if no other process holds the lock."""
+        if self._server is not None:
+            return
+        fd = os.open(self.path + ".lock", os.O_CREAT | os.O_RDWR, 0o600)
+        try:
+            fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            os.close(fd)
+            return
+        # Holding the lock means any socket file left behind is stale
+        if os.path.exists(self.path):
+            os.unlink(self.path)
+        self._lock_fd = fd
+        self._server = await asyncio.start_unix_server(
+            UnixSocketRelay().handle, path=self.path, limit=LINE_LIMIT
+        )
+        print(f"Signaling backplane relay listening on {self.path}")
+
+    def _dispatch(self, line: bytes):
+        try:
+            frame = json.loads(line)
+        except ValueError:
+            return
+        if frame.get("origin") != self.node_id and self.handler is not None:
+            self.handler(frame["room"], frame["msg"])
+
+
+def create_backplane(kind: Optional[str], path: str) -> Optional[Backplane]:
+    """Builds the backplane named by SIGNALING_BACKPLANE ("", "memory" or "unix")."""
+    if not kind:
+        return None
+    if kind == "memory":
+        return InMemoryBackplane()
+    if kind == "unix":
+        return UnixSocketBackplane(path)
+    raise ValueError(f"Unknown signaling backplane: {kind}")
@@ -1,25 +1,234 @@
+import asyncio
+import json
+import time
+from collections import deque
+from typing import Callable, Deque, Dict, Optional, Set
+
 from fastapi import WebSocket
-from typing import List
+
+from server.backplane import Backplane
+from server.metrics import (
+    FANOUT_PEERS, FANOUT_SECONDS, MESSAGES_DROPPED, SLOW_CONSUMER_DROPS, WS_CONNECT_SECONDS, record, span,
+)
+
+# What to do when a peer's outbound queue is full
+DROP_OLDEST = "drop_oldest"
+COALESCE = "coalesce"
+DISCONNECT = "disconnect"
+SLOW_CONSUMER_POLICIES = (DROP_OLDEST, COALESCE, DISCONNECT)
+
+
+def coalesce_key(message: str) -> str:
+    """Messages sharing a key supersede each other (JSON ``type`` or the raw text).
+
+    Measurement events also key on ``captureType`` so a new weight never
+    replaces a pending temperature.
+    """
+    if message.startswith("{"):
+        try:
+            payload = json.loads(message)
+        except json.JSONDecodeError:
+            return message
+        if isinstance(payload, dict) and "type" in payload:
+            if "captureType" in payload:
+                return f"{payload['type']}:{payload['captureType']}"
+            return str(payload["type"])
+    return message
+
+
+class QueuedMessage:
+    """A message queued for the peers of a room, shared by all of their queues.
+
+    Its coalesce key is only worked out when a full queue under COALESCE
+    needs it, and then once for every recipient.
+    """
+
+    __slots__ = ("text", "_key")
+
+    def __init__(self, text: str):
+        self.text = text
+        self._key: Optional[str] = None
+
+    @property
+    def key(self) -> str:
+        if self._key is None:
+            self._key = coalesce_key(self.text)
+        return self._key
+
+
+class ClientConnection:
+    """A peer socket with a bounded outbound queue drained by its own writer task."""
+
+    def __init__(self, websocket: WebSocket, max_queue: int, policy: str,
+                 on_error: Callable[["ClientConnection"], None]):
+        self.websocket = websocket
+        self.room_id: Optional[str] = None
+        self.max_queue = max_queue
+        self.policy = policy
+        self.queue: Deque[QueuedMessage] = deque()
+        self.dropped = 0
+        self._on_error = on_error
+        self._ready = asyncio.Event()
+        self._task: Optional[asyncio.Task] = None
+
+    def start(self):
+        self._task = asyncio.create_task(self._write_loop())
+
+    def close(self):
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+        self.queue.clear()
+
+    def enqueue(self, message: QueuedMessage) -> bool:
+        """Queues a message without waiting; returns False if the peer must be dropped."""
+        if len(self.queue) >= self.max_queue:
+            if self.policy == DISCONNECT:
+                return False
+            self.dropped += 1
+            MESSAGES_DROPPED.inc()
+            if self.policy == COALESCE:
+                key = message.key
+                for index, queued in enumerate(self.queue):
+                    if queued.key == key:
+                        del self.queue[index]
+                        break
+                else:
+                    self.queue.popleft()
+            else:
+                self.queue.popleft()
+        self.queue.append(message)
+        self._ready.set()
+        return True
+
+    async def _write_loop(self):
+        try:
+            while True:
+                if not self.queue:
+                    self._ready.clear()
+                    await self._ready.wait()
+                    continue
+                await self.websocket.send_text(self.queue.popleft().text)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            print(f"Error sending message to {self.websocket.client}: {e}")
+            self._on_error(self)
+
 
 class ConnectionManager:
-    def __init__(self):
-        self.active_connections: List[WebSocket] = []
-
-    async def connect(self, websocket: WebSocket):
-        await websocket.accept()
-        self.active_connections.append(websocket)
-        print(f"New connection: {websocket.client}")
-
-    def disconnect(self, websocket: WebSocket):
-        if websocket in self.active_connections:
-            self.active_connections.remove(websocket)
-            print(f"Disconnected: {websocket.client}")
-
-    async def broadcast(self, message: str, sender: WebSocket):
-        for connection in self.active_connections:
-            if connection != sender:
-                try:
-                    await connection.send_text(message)
-                except Exception as e:
-                    print(f"Error sending message to {connection.client}: {e}")
-                    self.disconnect(connection)
\ No newline at end of file
+    """Tracks signaling peers grouped into rooms keyed by roomId.
+
+    Each room owns its own member set, so joining, leaving and routing a
+    message only ever touches the sender's room. Broadcasting only queues
+    the message on every peer; per-peer writer tasks deliver concurrently,
+    so a slow client cannot hold up the rest of its room.
+
+    With a backplane, messages are also relayed to peers of the same room
+    connected to other worker processes.
+    """
+
+    def __init__(self, max_queue: int = 64, policy: str = DROP_OLDEST,
+                 backplane: Optional[Backplane] = None):
+        if policy not in SLOW_CONSUMER_POLICIES:
+            raise ValueError(f"Unknown slow consumer policy: {policy}")
+        if max_queue < 1:
+            raise ValueError("max_queue must be at least 1")
+        self.max_queue = max_queue
+        self.policy = policy
+        self.rooms: Dict[str, Set[ClientConnection]] = {}
+        self.connections: Dict[WebSocket, ClientConnection] = {}
+        self.backplane = backplane
+
+    async def start(self):
+        if self.backplane is not None:
+            await self.backplane.start(self.deliver)
+
+    async def close(self):
+        if self.backplane is not None:
+            await self.backplane.close()
+
+    async def connect(self, websocket: WebSocket, room_id: Optional[str] = None):
+        with span(WS_CONNECT_SECONDS, "ws_connect"):
+            await websocket.accept()
+            client = ClientConnection(websocket, self.max_queue, self.policy, self._drop)
+            self.connections[websocket] = client
+            client.start()
+            if room_id:
+                self.join(websocket, room_id)
+
+    def join(self, websocket: WebSocket, room_id: str):
+        client = self.connections.get(websocket)
+        if client is None or client.room_id == room_id:
+            return
+        if client.room_id is not None:
+            self.leave(websocket)
+        members = self.rooms.setdefault(room_id, set())
+        if not members and self.backplane is not None:
+            self.backplane.subscribe(room_id)
+        members.add(client)
+        client.room_id = room_id
+        print(f"Joined room {room_id}. Peers in room: {len(self.rooms[room_id])}")
+
+    def leave(self, websocket: WebSocket) -> Optional[str]:
+        client = self.connections.get(websocket)
+        if client is None or client.room_id is None:
+            return None
+        room_id, client.room_id = client.room_id, None
+        members = self.rooms.get(room_id)
+        if members is not None:
+            members.discard(client)
+            if not members:
+                del self.rooms[room_id]
+                if self.backplane is not None:
+                    self.backplane.unsubscribe(room_id)
+        return room_id
+
+    def disconnect(self, websocket: WebSocket) -> Optional[str]:
+        room_id = self.leave(websocket)
+        client = self.connections.pop(websocket, None)
+        if client is not None:
+            client.close()
+        if room_id is not None:
+            print(f"Disconnected from room {room_id}. Active rooms: {len(self.rooms)}")
+        return room_id
+
+    async def broadcast(self, message: str, sender: Optional[WebSocket], room_id: Optional[str] = None):
+        if room_id is None:
+            client = self.connections.get(sender)
+            room_id = client.room_id if client is not None else None
+        if room_id is None:
+            return
+        self.deliver(room_id, message, sender)
+        if self.backplane is not None:
+            self.backplane.publish(room_id, message)
+
+    def deliver(self, room_id: str, message: str, sender: Optional[WebSocket] = None):
+        """Queues a message for the local members of a room."""
+        started = time.perf_counter()
+        queued = QueuedMessage(message)
+        # Iterate over a snapshot: peers refusing the message are dropped below
+        members = list(self.rooms.get(room_id, ()))
+        for client in members:
+            if client.websocket is not sender and not client.enqueue(queued):
+                print(f"Dropping slow consumer {client.websocket.client}")
+                SLOW_CONSUMER_DROPS.inc()
+                self._drop(client, close=True)
+        record(FANOUT_SECONDS, "fanout", time.perf_counter() - started)
+        FANOUT_PEERS.observe(len(members))
+
+    def queue_depth(self) -> int:
+        return sum(len(client.queue) for client in self.connections.values())
+
+    def _drop(self, client: ClientConnection, close: bool = False):
+        self.disconnect(client.websocket)
+        if close:
+            asyncio.create_task(self._close_quietly(client.websocket))
+
+    @staticmethod
+    async def _close_quietly(websocket: WebSocket):
+        try:
+            # 1013: try again later
+            await websocket.close(code=1013)
+        except Exception:
+            pass
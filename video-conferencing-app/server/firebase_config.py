@@ -0,0 +1,99 @@
+"""The Firebase web config served at /firebase-config, loaded once and kept as bytes.
+
+The config comes from the FIREBASE_CONFIG env var or, failing that, a JSON
+file. It is validated and serialized when loaded, and every request gets the
+same bytes with a strong ETag, so browsers can cache it and revalidate with
+a 304. With ``watch`` on, a file-based config is reloaded when the file's
+mtime changes; the file is stat()ed at most once per ``watch_interval``.
+"""
+import hashlib
+import json
+import os
+import time
+from pathlib import Path
+from typing import Optional
+
+REQUIRED_KEYS = ("apiKey", "projectId")
+
+
+class FirebaseConfigError(Exception):
+    pass
+
+
+def parse_config(text: str) -> dict:
+    # Handle both stringified JSON and proper JSON from .env
+    try:
+        config = json.loads(text.replace("'", "\""))
+    except json.JSONDecodeError:
+        # If it's already proper JSON
+        config = json.loads(text)
+    if not isinstance(config, dict):
+        raise FirebaseConfigError("Firebase config must be a JSON object")
+    missing = [key for key in REQUIRED_KEYS if not config.get(key)]
+    if missing:
+        raise FirebaseConfigError(f"Firebase config is missing {', '.join(missing)}")
+    return config
+
+
+class FirebaseConfig:
+    def __init__(self, env_value: Optional[str], path: str = "firebase-config.json",
+                 watch: bool = False, watch_interval: float = 2.0):
+        self.env_value = env_value
+        self.path = Path(path)
+        self.watch = watch
+        self.watch_interval = watch_interval
+        self.body: Optional[bytes] = None
+        self.etag: Optional[str] = None
+        self.error: Optional[str] = None
+        self._mtime: Optional[float] = None
+        self._checked_at = 0.0
+
+    def load(self):
+        """(Re)loads the config; on failure ``error`` is set and the previous body is kept."""
+        try:
+            if self.env_value:
+                config = parse_config(self.env_value)
+                self._mtime = None
+            elif self.path.exists():
+                self._mtime = self.path.stat().st_mtime
+                config = parse_config(self.path.read_text())
+            else:
+                raise FirebaseConfigError(
+                    "Neither FIREBASE_CONFIG env var nor firebase-config.json file found"
+                )
+        except (OSError, ValueError, FirebaseConfigError) as e:
+            self.error = str(e)
+            print(f"Firebase config error: {self.error}")
+            return
+        self.body = json.dumps(config, separators=(",", ":")).encode()
+        self.etag = f'"{hashlib.sha256(self.body).hexdigest()[:32]}"'
+        self.error = None
+        print("Loaded Firebase config successfully")
+
+    def current(self):
+        """Returns ``(body, etag)``, or ``(None, None)`` if no valid config was ever loaded."""
+        if self.body is None and self.error is None:
+            self.load()
+        elif self.watch and not self.env_value:
+            self._reload_if_changed()
+        return self.body, self.etag
+
+    def _reload_if_changed(self):
+        now = time.monotonic()
+        if now - self._checked_at < self.watch_interval:
+            return
+        self._checked_at = now
+        try:
+            mtime = self.path.stat().st_mtime
+        except OSError:
+            return
+        if mtime != self._mtime:
+            self.load()
+
+
+def from_environment() -> FirebaseConfig:
+    return FirebaseConfig(
+        os.getenv("FIREBASE_CONFIG"),
+        path=os.getenv("FIREBASE_CONFIG_PATH", "firebase-config.json"),
+        watch=os.getenv("FIREBASE_CONFIG_WATCH", "").lower() in ("1", "true", "yes"),
+    )
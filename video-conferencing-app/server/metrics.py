@@ -0,0 +1,110 @@
+"""Prometheus metrics for signaling and TURN, served at /metrics.
+
+The hot paths record into histograms as they run: WebSocket connect (accept
+and room registration), broadcast fan-out (queueing one message for every
+local peer of a room) and TURN credential fetches. Connection counts and
+send queue depth are read from the ConnectionManager when /metrics is
+scraped.
+
+With METRICS_SERVER_TIMING on, ServerTimingMiddleware returns the spans
+recorded while handling an HTTP request in a Server-Timing header.
+"""
+import contextvars
+import time
+from contextlib import contextmanager
+from typing import Callable, Iterator, List, Optional, Tuple
+
+from prometheus_client import CONTENT_TYPE_LATEST, REGISTRY, Counter, Histogram, generate_latest
+from prometheus_client.core import CounterMetricFamily, GaugeMetricFamily
+
+FAST_BUCKETS = (0.00001, 0.000025, 0.00005, 0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.05)
+
+WS_CONNECT_SECONDS = Histogram("ws_connect_seconds", "Time to accept a WebSocket and register the peer",
+                               buckets=FAST_BUCKETS)
+FANOUT_SECONDS = Histogram("broadcast_fanout_seconds", "Time to queue one message for a room's local peers",
+                           buckets=FAST_BUCKETS)
+FANOUT_PEERS = Histogram("broadcast_fanout_peers", "Local peers a message was queued for",
+                         buckets=(0, 1, 2, 4, 8, 16, 32, 64))
+TURN_FETCH_SECONDS = Histogram("turn_fetch_seconds", "Upstream TURN credential fetches", ["outcome"],
+                               buckets=(0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10))
+# Resolved once, so both outcomes are exported from the start
+TURN_FETCH_OK = TURN_FETCH_SECONDS.labels("ok")
+TURN_FETCH_ERROR = TURN_FETCH_SECONDS.labels("error")
+SLOW_CONSUMER_DROPS = Counter("ws_slow_consumer_drops", "Peers disconnected for not keeping up")
+MESSAGES_DROPPED = Counter("ws_messages_dropped", "Messages dropped by the slow consumer policy")
+
+# The (name, seconds) spans of the current HTTP request while Server-Timing is on
+_request_spans: contextvars.ContextVar[Optional[List[Tuple[str, float]]]] = contextvars.ContextVar(
+    "request_spans", default=None)
+
+
+def record(histogram, name: str, seconds: float):
+    histogram.observe(seconds)
+    spans = _request_spans.get()
+    if spans is not None:
+        spans.append((name, seconds))
+
+
+@contextmanager
+def span(histogram, name: str) -> Iterator[None]:
+    """Times the enclosed block into ``histogram``; ``name`` labels it in Server-Timing."""
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        record(histogram, name, time.perf_counter() - started)
+
+
+class ManagerCollector:
+    """Connection, room and queue gauges of a ConnectionManager, read at scrape time."""
+
+    def __init__(self, manager, turn_provider=None):
+        self.manager = manager
+        self.turn_provider = turn_provider
+
+    def collect(self):
+        manager = self.manager
+        yield GaugeMetricFamily("ws_connections", "Connected signaling peers", len(manager.connections))
+        yield GaugeMetricFamily("ws_rooms", "Rooms with local peers", len(manager.rooms))
+        yield GaugeMetricFamily("ws_send_queue_depth", "Messages queued for delivery to peers",
+                                manager.queue_depth())
+        if self.turn_provider is not None:
+            yield CounterMetricFamily("turn_fetch_failures", "Failed TURN credential fetches",
+                                      self.turn_provider.failures)
+
+
+def register(manager, turn_provider=None):
+    REGISTRY.register(ManagerCollector(manager, turn_provider))
+
+
+def exposition() -> Tuple[bytes, str]:
+    return generate_latest(REGISTRY), CONTENT_TYPE_LATEST
+
+
+class ServerTimingMiddleware:
+    """ASGI middleware adding the request's spans, and its total, as a Server-Timing header."""
+
+    def __init__(self, app: Callable):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        spans: List[Tuple[str, float]] = []
+        token = _request_spans.set(spans)
+        started = time.perf_counter()
+
+        async def send_with_timing(message):
+            if message["type"] == "http.response.start":
+                entries = [f"{name};dur={seconds * 1000:.2f}" for name, seconds in spans]
+                entries.append(f"total;dur={(time.perf_counter() - started) * 1000:.2f}")
+                headers = list(message.get("headers", []))
+                headers.append((b"server-timing", ", ".join(entries).encode()))
+                message = {**message, "headers": headers}
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_timing)
+        finally:
+            _request_spans.reset(token)
@@ -0,0 +1,173 @@
+"""Static asset serving from an index of the static tree built at startup.
+
+Requests are answered from in-memory metadata: no filesystem checks per
+request. Files up to ``memory_file_limit`` bytes are kept in memory along
+with gzip (and, if the optional ``brotli`` module is installed, brotli)
+encodings; larger files are streamed from disk and use ``.br``/``.gz``
+siblings when they exist. Content-hashed build assets such as CRA's
+``main.b21d8118.js`` are served as immutable, everything else must be
+revalidated with its ETag.
+
+Precompress a build ahead of deployment with:
+
+    python -m server.static_files static/
+"""
+import argparse
+import gzip
+import hashlib
+import mimetypes
+import os
+import re
+from dataclasses import dataclass, field
+from typing import Dict, Optional
+
+from starlette.responses import FileResponse, Response
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+# CRA/webpack put a content hash of 8+ hex digits before the extension
+HASHED_NAME = re.compile(r"\.[0-9a-f]{8,}(\.chunk)?\.[a-z0-9]+$")
+COMPRESSIBLE_TYPES = ("text/", "application/javascript", "application/json", "image/svg+xml",
+                      "application/xml", "application/manifest+json")
+IMMUTABLE = "public, max-age=31536000, immutable"
+REVALIDATE = "no-cache"
+# Preference order when the client accepts several encodings
+ENCODINGS = (("br", ".br"), ("gzip", ".gz"))
+
+
+@dataclass
+class Asset:
+    path: str
+    size: int
+    media_type: str
+    etag: str
+    cache_control: str
+    stat: os.stat_result
+    body: Optional[bytes] = None
+    # encoding -> in-memory body, or path of a precompressed sibling on disk
+    encoded: Dict[str, bytes] = field(default_factory=dict)
+    encoded_paths: Dict[str, str] = field(default_factory=dict)
+
+
+def is_compressible(media_type: str) -> bool:
+    return media_type.startswith(COMPRESSIBLE_TYPES)
+
+
+def accepted_encodings(header: str):
+    accepted = set()
+    for part in header.split(","):
+        name, _, params = part.strip().partition(";")
+        if params.strip().replace(" ", "") in ("q=0", "q=0.0"):
+            continue
+        accepted.add(name.strip().lower())
+    return accepted
+
+
+class StaticIndex:
+    def __init__(self, root: str, memory_file_limit: int = 256 * 1024, memory_budget: int = 32 * 1024 * 1024):
+        self.root = os.path.abspath(root)
+        self.memory_file_limit = memory_file_limit
+        self.memory_budget = memory_budget
+        self.assets: Dict[str, Asset] = {}
+
+    def build(self):
+        """Walks the static tree once and records everything needed to serve it."""
+        assets, used = {}, 0
+        for directory, _, files in os.walk(self.root):
+            names = set(files)
+            for name in sorted(files):
+                if name.endswith((".gz", ".br")) and name[:-3] in names:
+                    continue
+                path = os.path.join(directory, name)
+                key = os.path.relpath(path, self.root).replace(os.sep, "/")
+                stat = os.stat(path)
+                media_type = mimetypes.guess_type(name)[0] or "application/octet-stream"
+                asset = Asset(
+                    path=path,
+                    size=stat.st_size,
+                    media_type=media_type,
+                    etag=f'"{int(stat.st_mtime_ns):x}-{stat.st_size:x}"',
+                    cache_control=IMMUTABLE if HASHED_NAME.search(name) else REVALIDATE,
+                    stat=stat,
+                )
+                for encoding, suffix in ENCODINGS:
+                    if name + suffix in names:
+                        asset.encoded_paths[encoding] = path + suffix
+                if stat.st_size <= self.memory_file_limit and used + stat.st_size <= self.memory_budget:
+                    with open(path, "rb") as f:
+                        asset.body = f.read()
+                    asset.etag = f'"{hashlib.sha256(asset.body).hexdigest()[:32]}"'
+                    used += stat.st_size
+                    if is_compressible(media_type):
+                        used += self._encode(asset)
+                assets[key] = asset
+        self.assets = assets
+        print(f"Indexed {len(assets)} static files under {self.root} ({used // 1024} KiB in memory)")
+
+    @staticmethod
+    def _encode(asset: Asset) -> int:
+        candidates = {"gzip": gzip.compress(asset.body, compresslevel=9, mtime=0)}
+        if brotli is not None:
+            candidates["br"] = brotli.compress(asset.body)
+        for encoding, body in candidates.items():
+            # Only worth it when the encoding actually saves bytes
+            if len(body) < len(asset.body):
+                asset.encoded[encoding] = body
+        return sum(len(body) for body in asset.encoded.values())
+
+    def get(self, path: str) -> Optional[Asset]:
+        return self.assets.get(path.lstrip("/"))
+
+    def respond(self, asset: Asset, request_headers) -> Response:
+        """Picks the best encoding the client accepts; 304 when its ETag still matches."""
+        accepted = accepted_encodings(request_headers.get("accept-encoding", ""))
+        encoding = next(
+            (name for name, _ in ENCODINGS if name in accepted and (name in asset.encoded or name in asset.encoded_paths)),
+            None,
+        )
+        etag = asset.etag if encoding is None else f'{asset.etag[:-1]}-{encoding}"'
+        headers = {"ETag": etag, "Cache-Control": asset.cache_control}
+        if asset.encoded or asset.encoded_paths:
+            headers["Vary"] = "Accept-Encoding"
+        if_none_match = request_headers.get("if-none-match", "")
+        if etag in (tag.strip().removeprefix("W/") for tag in if_none_match.split(",")):
+            return Response(status_code=304, headers=headers)
+
+        if encoding is not None:
+            headers["Content-Encoding"] = encoding
+        if encoding in asset.encoded:
+            return Response(asset.encoded[encoding], media_type=asset.media_type, headers=headers)
+        if encoding is not None:
+            return FileResponse(asset.encoded_paths[encoding], media_type=asset.media_type, headers=headers)
+        if asset.body is not None:
+            return Response(asset.body, media_type=asset.media_type, headers=headers)
+        return FileResponse(asset.path, media_type=asset.media_type, headers=headers, stat_result=asset.stat)
+
+
+def precompress(root: str, min_size: int = 256):
+    """Writes .gz (and .br when available) next to every compressible file under ``root``."""
+    for directory, _, files in os.walk(root):
+        for name in files:
+            if name.endswith((".gz", ".br")):
+                continue
+            media_type = mimetypes.guess_type(name)[0] or ""
+            path = os.path.join(directory, name)
+            if not is_compressible(media_type) or os.path.getsize(path) < min_size:
+                continue
+            with open(path, "rb") as f:
+                body = f.read()
+            with open(path + ".gz", "wb") as f:
+                f.write(gzip.compress(body, compresslevel=9, mtime=0))
+            if brotli is not None:
+                with open(path + ".br", "wb") as f:
+                    f.write(brotli.compress(body))
+            print(f"Compressed {path}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Precompress a static tree for serving.")
+    parser.add_argument("root")
+    precompress(parser.parse_args().root)
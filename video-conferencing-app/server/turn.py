@@ -0,0 +1,120 @@
+"""TURN credentials from metered.live, cached and refreshed ahead of expiry.
+
+Every call to /api/turn-credentials used to open a new HTTP client and wait
+on a fresh upstream round-trip before the call could be set up. The provider
+keeps one pooled client and the last credentials until they expire. It
+refreshes them in the background once they are within ``refresh_ahead``
+seconds of expiry, and callers that arrive while a fetch is running share
+it instead of starting their own.
+"""
+import asyncio
+import re
+import time
+from typing import Any, Optional
+
+import httpx
+
+from server.metrics import TURN_FETCH_ERROR, TURN_FETCH_OK, record
+
+METERED_TURN_URL = "https://video-call-turn-server.metered.live/api/v1/turn/credentials"
+
+STUN_SERVERS = {
+    "iceServers": [
+        {"urls": "stun:stun.l.google.com:19302"},
+        {"urls": "stun:stun1.l.google.com:19302"},
+        {"urls": "stun:stun2.l.google.com:19302"}
+    ]
+}
+
+
+def response_ttl(response: httpx.Response, payload: Any, default: float) -> float:
+    """Lifetime of fetched credentials: Cache-Control max-age, a ``ttl`` field, else ``default``."""
+    match = re.search(r"max-age=(\d+)", response.headers.get("Cache-Control", ""))
+    if match:
+        return float(match.group(1))
+    if isinstance(payload, dict) and isinstance(payload.get("ttl"), (int, float)):
+        return float(payload["ttl"])
+    return default
+
+
+class TurnCredentialProvider:
+    """Caches metered.live TURN credentials for one process."""
+
+    def __init__(self, api_key: Optional[str], url: str = METERED_TURN_URL, ttl: float = 3600,
+                 refresh_ahead: float = 300, error_ttl: float = 10, timeout: float = 10.0):
+        self.api_key = api_key
+        self.url = url
+        self.ttl = ttl
+        self.refresh_ahead = refresh_ahead
+        # After a failed fetch, serve STUN for this long rather than make every caller wait on a dead upstream
+        self.error_ttl = error_ttl
+        self.timeout = timeout
+        self._client: Optional[httpx.AsyncClient] = None
+        self._credentials: Any = None
+        self._expires_at = 0.0
+        self._retry_at = 0.0
+        self._inflight: Optional[asyncio.Task] = None
+        self.fetches = 0
+        self.failures = 0
+
+    @property
+    def client(self) -> httpx.AsyncClient:
+        if self._client is None:
+            self._client = httpx.AsyncClient(timeout=self.timeout)
+        return self._client
+
+    async def get(self) -> Any:
+        """Returns the cached credentials, fetching them first if there are none; STUN on failure."""
+        if not self.api_key:
+            print("TURN server error (falling back to STUN): METERED_API_KEY not configured")
+            return STUN_SERVERS
+        now = time.monotonic()
+        if self._credentials is not None and now < self._expires_at:
+            if now >= self._expires_at - self.refresh_ahead and now >= self._retry_at:
+                self._refresh()
+            return self._credentials
+        if now < self._retry_at:
+            return STUN_SERVERS
+        try:
+            # Shielded: a caller that goes away must not cancel the fetch others wait on
+            return await asyncio.shield(self._refresh())
+        except Exception:
+            return STUN_SERVERS
+
+    def _refresh(self) -> asyncio.Task:
+        """Starts a fetch unless one is already running, and returns it."""
+        if self._inflight is None:
+            self._inflight = asyncio.create_task(self._fetch())
+            self._inflight.add_done_callback(self._fetch_done)
+        return self._inflight
+
+    def _fetch_done(self, task: asyncio.Task):
+        self._inflight = None
+        if not task.cancelled():
+            # Marks the error retrieved; background refreshes have no awaiting caller
+            task.exception()
+
+    async def _fetch(self) -> Any:
+        self.fetches += 1
+        started = time.perf_counter()
+        try:
+            response = await self.client.get(self.url, params={"apiKey": self.api_key})
+            response.raise_for_status()
+            credentials = response.json()
+        except Exception as e:
+            print(f"TURN server error (falling back to STUN): {str(e)}")
+            record(TURN_FETCH_ERROR, "turn_fetch", time.perf_counter() - started)
+            self.failures += 1
+            self._retry_at = time.monotonic() + self.error_ttl
+            raise
+        record(TURN_FETCH_OK, "turn_fetch", time.perf_counter() - started)
+        self._credentials = credentials
+        self._expires_at = time.monotonic() + response_ttl(response, credentials, self.ttl)
+        return credentials
+
+    async def close(self):
+        if self._inflight is not None:
+            self._inflight.cancel()
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
@@ -0,0 +1,166 @@
+import asyncio
+import os
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+import unittest
+import urllib.request
+
+from server.backplane import InMemoryBackplane, InMemoryHub, UnixSocketBackplane
+from server.connection_manager import ConnectionManager
+from tests.test_signaling import FakeWebSocket, settle
+
+try:
+    import websockets
+except ImportError:
+    websockets = None
+
+APP_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+class InMemoryBackplaneTests(unittest.TestCase):
+    def test_messages_cross_between_managers(self):
+        hub = InMemoryHub()
+        first = ConnectionManager(backplane=InMemoryBackplane(hub))
+        second = ConnectionManager(backplane=InMemoryBackplane(hub))
+        alice, bob, carol = FakeWebSocket("alice"), FakeWebSocket("bob"), FakeWebSocket("carol")
+
+        async def scenario():
+            await first.start()
+            await second.start()
+            await first.connect(alice, "room-a")
+            await second.connect(bob, "room-a")
+            await second.connect(carol, "room-b")
+            await first.broadcast("offer", alice)
+            await settle()
+            second.disconnect(bob)
+            await first.broadcast("late", alice)
+            await settle()
+            await first.close()
+            await second.close()
+
+        asyncio.run(scenario())
+        self.assertEqual(bob.sent, ["offer"])
+        self.assertEqual(carol.sent, [])
+        self.assertEqual(alice.sent, [])
+        self.assertEqual(hub.subscribers, {})
+
+
+class UnixSocketBackplaneTests(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmp.name, "signaling.sock")
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_relay_fails_over_when_its_owner_closes(self):
+        received = []
+
+        async def scenario():
+            relay_owner = UnixSocketBackplane(self.path)
+            follower = UnixSocketBackplane(self.path)
+            publisher = UnixSocketBackplane(self.path)
+            await relay_owner.start(lambda room, message: None)
+            await asyncio.wait_for(relay_owner.connected.wait(), 2)
+            await follower.start(lambda room, message: received.append((room, message)))
+            await publisher.start(lambda room, message: None)
+            await asyncio.wait_for(follower.connected.wait(), 2)
+            await asyncio.wait_for(publisher.connected.wait(), 2)
+
+            follower.subscribe("room-a")
+            await asyncio.sleep(0.05)
+            publisher.publish("room-a", "first")
+            publisher.publish("room-b", "ignored")
+            await asyncio.sleep(0.05)
+
+            await relay_owner.close()
+            await asyncio.sleep(0.5)
+            await asyncio.wait_for(follower.connected.wait(), 2)
+            await asyncio.wait_for(publisher.connected.wait(), 2)
+            await asyncio.sleep(0.05)
+            publisher.publish("room-a", "second")
+            await asyncio.sleep(0.05)
+            await follower.close()
+            await publisher.close()
+
+        asyncio.run(scenario())
+        self.assertEqual(received, [("room-a", "first"), ("room-a", "second")])
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+@unittest.skipIf(websockets is None, "websockets is not installed")
+class MultiWorkerIntegrationTests(unittest.TestCase):
+    """Runs several uvicorn processes sharing one Unix socket backplane."""
+
+    workers = 3
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        env = dict(os.environ,
+                   SIGNALING_BACKPLANE="unix",
+                   SIGNALING_BACKPLANE_PATH=os.path.join(self.tmp.name, "signaling.sock"))
+        self.ports = [free_port() for _ in range(self.workers)]
+        self.processes = [
+            subprocess.Popen(
+                [sys.executable, "-m", "uvicorn", "video_server:app",
+                 "--host", "127.0.0.1", "--port", str(port), "--log-level", "warning"],
+                cwd=APP_DIR, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+            )
+            for port in self.ports
+        ]
+        for port in self.ports:
+            self.wait_until_ready(port)
+
+    def tearDown(self):
+        for process in self.processes:
+            process.terminate()
+        for process in self.processes:
+            process.wait(timeout=10)
+        self.tmp.cleanup()
+
+    def wait_until_ready(self, port, timeout=15):
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline:
+            try:
+                urllib.request.urlopen(f"http://127.0.0.1:{port}/firebase-config", timeout=1)
+                return
+            except urllib.error.HTTPError:
+                return
+            except OSError:
+                time.sleep(0.1)
+        self.fail(f"worker on port {port} did not start")
+
+    def test_messages_cross_between_worker_processes(self):
+        async def scenario():
+            peers = [
+                await websockets.connect(f"ws://127.0.0.1:{port}/ws?roomId=room-a")
+                for port in self.ports
+            ]
+            outsider = await websockets.connect(f"ws://127.0.0.1:{self.ports[1]}/ws?roomId=room-b")
+            # Allow the subscriptions to reach the relay before publishing
+            await asyncio.sleep(0.5)
+            for index, sender in enumerate(peers):
+                await sender.send(f"offer-from-{index}")
+                for other, receiver in enumerate(peers):
+                    if other != index:
+                        self.assertEqual(
+                            await asyncio.wait_for(receiver.recv(), 5), f"offer-from-{index}"
+                        )
+            with self.assertRaises(asyncio.TimeoutError):
+                await asyncio.wait_for(outsider.recv(), 0.3)
+            for peer in peers + [outsider]:
+                await peer.close()
+
+        asyncio.run(scenario())
+
+
+if __name__ == "__main__":
+    unittest.main()
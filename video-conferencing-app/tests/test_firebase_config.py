@@ -0,0 +1,73 @@
+import json
+import os
+import tempfile
+import time
+import unittest
+from unittest import mock
+
+from fastapi.testclient import TestClient
+
+import video_server
+from server import firebase_config
+from server.firebase_config import FirebaseConfig
+
+CONFIG = {"apiKey": "key", "authDomain": "app.firebaseapp.com", "projectId": "app"}
+
+
+class FirebaseConfigTests(unittest.TestCase):
+    def test_env_config_is_loaded_once(self):
+        config = FirebaseConfig(json.dumps(CONFIG))
+        with mock.patch.object(firebase_config, "parse_config", wraps=firebase_config.parse_config) as parse:
+            body, etag = config.current()
+            self.assertEqual(config.current(), (body, etag))
+        self.assertEqual(parse.call_count, 1)
+        self.assertEqual(json.loads(body), CONFIG)
+
+    def test_single_quoted_env_config_is_accepted(self):
+        body, _ = FirebaseConfig(str(CONFIG)).current()
+        self.assertEqual(json.loads(body), CONFIG)
+
+    def test_invalid_config_is_reported(self):
+        config = FirebaseConfig(json.dumps({"apiKey": "key"}))
+        self.assertEqual(config.current(), (None, None))
+        self.assertIn("projectId", config.error)
+
+    def test_watched_file_is_reloaded_when_it_changes(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "firebase-config.json")
+            with open(path, "w") as f:
+                json.dump(CONFIG, f)
+            config = FirebaseConfig(None, path=path, watch=True, watch_interval=0)
+            _, first_etag = config.current()
+
+            with open(path, "w") as f:
+                json.dump({**CONFIG, "projectId": "other"}, f)
+            os.utime(path, (time.time() + 5, time.time() + 5))
+            body, etag = config.current()
+        self.assertNotEqual(etag, first_etag)
+        self.assertEqual(json.loads(body)["projectId"], "other")
+
+
+class FirebaseConfigEndpointTests(unittest.TestCase):
+    def setUp(self):
+        patcher = mock.patch.object(video_server, "firebase_config", FirebaseConfig(json.dumps(CONFIG)))
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.client = TestClient(video_server.app)
+
+    def test_response_is_cacheable_and_revalidates_with_304(self):
+        response = self.client.get("/firebase-config")
+        self.assertEqual(response.json(), CONFIG)
+        self.assertIn("max-age=", response.headers["Cache-Control"])
+
+        revalidated = self.client.get("/firebase-config", headers={"If-None-Match": response.headers["ETag"]})
+        self.assertEqual(revalidated.status_code, 304)
+        self.assertEqual(revalidated.content, b"")
+
+    def test_missing_config_is_a_500(self):
+        with mock.patch.object(video_server, "firebase_config", FirebaseConfig(None, path="/nonexistent.json")):
+            self.assertEqual(self.client.get("/firebase-config").status_code, 500)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,83 @@
+import asyncio
+import unittest
+
+from fastapi import FastAPI
+from fastapi.responses import JSONResponse
+from fastapi.testclient import TestClient
+from prometheus_client import REGISTRY, Histogram
+
+import video_server
+from server import metrics
+from server.connection_manager import ConnectionManager
+from tests.test_signaling import FakeWebSocket, settle
+
+
+def sample(name, labels=None):
+    return REGISTRY.get_sample_value(name, labels or {}) or 0
+
+
+class HotPathMetricsTests(unittest.TestCase):
+    def test_connect_and_fanout_are_timed(self):
+        manager = ConnectionManager()
+        connects = sample("ws_connect_seconds_count")
+        fanouts = sample("broadcast_fanout_seconds_count")
+        peers = sample("broadcast_fanout_peers_sum")
+
+        async def scenario():
+            sockets = [FakeWebSocket(f"peer-{index}") for index in range(3)]
+            for websocket in sockets:
+                await manager.connect(websocket, "room-a")
+            await manager.broadcast("offer", sockets[0])
+            await settle()
+
+        asyncio.run(scenario())
+        self.assertEqual(sample("ws_connect_seconds_count") - connects, 3)
+        self.assertEqual(sample("broadcast_fanout_seconds_count") - fanouts, 1)
+        self.assertEqual(sample("broadcast_fanout_peers_sum") - peers, 3)
+
+    def test_dropped_messages_stay_counted_after_the_peer_leaves(self):
+        manager = ConnectionManager(max_queue=1)
+        dropped = sample("ws_messages_dropped_total")
+
+        async def scenario():
+            sender, slow = FakeWebSocket("sender"), FakeWebSocket("slow", delay=1)
+            await manager.connect(sender, "room-a")
+            await manager.connect(slow, "room-a")
+            for message in ("one", "two", "three"):
+                await manager.broadcast(message, sender)
+            manager.disconnect(slow)
+            manager.disconnect(sender)
+
+        asyncio.run(scenario())
+        self.assertEqual(sample("ws_messages_dropped_total") - dropped, 2)
+
+    def test_metrics_endpoint_reports_connections(self):
+        with TestClient(video_server.app) as client:
+            with client.websocket_connect("/ws?roomId=metrics-room"):
+                body = client.get("/metrics").text
+        self.assertIn("ws_connections 1.0", body)
+        self.assertIn("ws_send_queue_depth", body)
+        self.assertIn("turn_fetch_seconds_bucket", body)
+
+
+class ServerTimingTests(unittest.TestCase):
+    def test_spans_recorded_during_a_request_are_returned(self):
+        histogram = Histogram("test_step_seconds", "Test step", registry=None)
+        app = FastAPI()
+        app.add_middleware(metrics.ServerTimingMiddleware)
+
+        @app.get("/step")
+        async def step():
+            with metrics.span(histogram, "step"):
+                await asyncio.sleep(0.01)
+            return JSONResponse({"ok": True})
+
+        response = TestClient(app).get("/step")
+        entries = dict(entry.split(";dur=") for entry in response.headers["Server-Timing"].split(", "))
+        self.assertEqual(list(entries), ["step", "total"])
+        self.assertGreaterEqual(float(entries["step"]), 10)
+        self.assertGreaterEqual(float(entries["total"]), float(entries["step"]))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,213 @@
+import asyncio
+import json
+import unittest
+from unittest import mock
+
+from fastapi.testclient import TestClient
+
+import video_server
+from server.connection_manager import COALESCE, DISCONNECT, DROP_OLDEST, ConnectionManager, coalesce_key
+
+
+class FakeWebSocket:
+    def __init__(self, name, delay=0.0):
+        self.name = name
+        self.client = name
+        self.delay = delay
+        self.sent = []
+        self.closed_with = None
+
+    async def accept(self):
+        pass
+
+    async def send_text(self, message):
+        if self.delay:
+            await asyncio.sleep(self.delay)
+        self.sent.append(message)
+
+    async def close(self, code=1000):
+        self.closed_with = code
+
+
+class BrokenWebSocket(FakeWebSocket):
+    async def send_text(self, message):
+        raise RuntimeError("connection reset")
+
+
+async def settle():
+    for _ in range(5):
+        await asyncio.sleep(0)
+
+
+class ConnectionManagerRoomTests(unittest.TestCase):
+    def test_broadcast_only_reaches_peers_in_the_same_room(self):
+        manager = ConnectionManager()
+        alice, bob, carol = FakeWebSocket("alice"), FakeWebSocket("bob"), FakeWebSocket("carol")
+
+        async def scenario():
+            await manager.connect(alice, "room-a")
+            await manager.connect(bob, "room-a")
+            await manager.connect(carol, "room-b")
+            await manager.broadcast("offer", alice)
+            await settle()
+
+        asyncio.run(scenario())
+        self.assertEqual(alice.sent, [])
+        self.assertEqual(bob.sent, ["offer"])
+        self.assertEqual(carol.sent, [])
+
+    def test_empty_rooms_are_removed_on_disconnect(self):
+        manager = ConnectionManager()
+        alice = FakeWebSocket("alice")
+
+        async def scenario():
+            await manager.connect(alice, "room-a")
+            self.assertEqual(manager.disconnect(alice), "room-a")
+            self.assertIsNone(manager.disconnect(alice))
+
+        asyncio.run(scenario())
+        self.assertEqual(manager.rooms, {})
+        self.assertEqual(manager.connections, {})
+
+    def test_join_moves_peer_between_rooms(self):
+        manager = ConnectionManager()
+        alice = FakeWebSocket("alice")
+
+        async def scenario():
+            await manager.connect(alice, "room-a")
+            manager.join(alice, "room-b")
+            manager.disconnect(alice)
+
+        asyncio.run(scenario())
+        self.assertNotIn("room-a", manager.rooms)
+
+    def test_failed_peer_is_dropped_without_affecting_others(self):
+        manager = ConnectionManager()
+        alice, broken, bob = FakeWebSocket("alice"), BrokenWebSocket("broken"), FakeWebSocket("bob")
+
+        async def scenario():
+            for peer in (alice, broken, bob):
+                await manager.connect(peer, "room-a")
+            await manager.broadcast("offer", alice)
+            await settle()
+
+        asyncio.run(scenario())
+        self.assertEqual(bob.sent, ["offer"])
+        self.assertNotIn(broken, manager.connections)
+        self.assertEqual(len(manager.rooms["room-a"]), 2)
+
+
+class SlowConsumerPolicyTests(unittest.TestCase):
+    def run_burst(self, policy, messages, receivers=1):
+        manager = ConnectionManager(max_queue=2, policy=policy)
+        sender = FakeWebSocket("sender")
+        slow, *others = [FakeWebSocket(f"slow-{index}", delay=0.01) for index in range(receivers)]
+
+        async def scenario():
+            await manager.connect(sender, "room")
+            for peer in (slow, *others):
+                await manager.connect(peer, "room")
+            for message in messages:
+                await manager.broadcast(message, sender)
+            await asyncio.sleep(0.1)
+
+        asyncio.run(scenario())
+        return manager, slow
+
+    def test_drop_oldest_keeps_the_newest_messages(self):
+        _, slow = self.run_burst(DROP_OLDEST, ["1", "2", "3", "4"])
+        self.assertEqual(slow.sent[-2:], ["3", "4"])
+        self.assertNotIn("2", slow.sent)
+
+    def test_coalesce_replaces_queued_message_of_the_same_type(self):
+        messages = [
+            '{"type": "candidate", "n": 1}',
+            '{"type": "offer", "n": 2}',
+            '{"type": "candidate", "n": 3}',
+            '{"type": "candidate", "n": 4}',
+        ]
+        _, slow = self.run_burst(COALESCE, messages)
+        self.assertIn('{"type": "offer", "n": 2}', slow.sent)
+        self.assertEqual(slow.sent[-1], '{"type": "candidate", "n": 4}')
+        self.assertNotIn('{"type": "candidate", "n": 3}', slow.sent)
+
+    def test_coalesce_parses_each_message_once(self):
+        messages = [json.dumps({"type": f"event-{n % 3}", "n": n}) for n in range(20)]
+        with mock.patch("server.connection_manager.json.loads", wraps=json.loads) as loads:
+            self.run_burst(COALESCE, messages, receivers=5)
+        self.assertLessEqual(loads.call_count, len(messages))
+
+    def test_coalesce_parses_nothing_while_queues_have_room(self):
+        messages = [json.dumps({"type": "candidate", "n": n}) for n in range(2)]
+        with mock.patch("server.connection_manager.json.loads", wraps=json.loads) as loads:
+            self.run_burst(COALESCE, messages, receivers=5)
+        self.assertEqual(loads.call_count, 0)
+
+    def test_measurements_coalesce_per_capture_type(self):
+        temperature = coalesce_key('{"type": "measurement", "captureType": "temperature"}')
+        weight = coalesce_key('{"type": "measurement", "captureType": "weight"}')
+        self.assertNotEqual(temperature, weight)
+
+    def test_disconnect_closes_the_slow_peer(self):
+        manager, slow = self.run_burst(DISCONNECT, ["1", "2", "3", "4"])
+        self.assertNotIn(slow, manager.connections)
+        self.assertEqual(slow.closed_with, 1013)
+
+    def test_unknown_policy_is_rejected(self):
+        with self.assertRaises(ValueError):
+            ConnectionManager(policy="block")
+
+
+class JoinMessageTests(unittest.TestCase):
+    def test_parse_join_request(self):
+        self.assertEqual(video_server.parse_join_request('{"type": "join", "roomId": "abc"}'), "abc")
+        self.assertIsNone(video_server.parse_join_request('{"type": "offer"}'))
+        self.assertIsNone(video_server.parse_join_request("hello"))
+
+
+class WebSocketEndpointTests(unittest.TestCase):
+    def setUp(self):
+        video_server.manager = ConnectionManager()
+        self.client = TestClient(video_server.app)
+
+    def test_messages_are_routed_by_room(self):
+        with self.client.websocket_connect("/ws?roomId=room-a") as alice, \
+                self.client.websocket_connect("/ws?roomId=room-b") as carol, \
+                self.client.websocket_connect("/ws?roomId=room-a") as bob:
+            carol.send_text("candidate-b")
+            alice.send_text("offer-a")
+            self.assertEqual(bob.receive_text(), "offer-a")
+            bob.send_text("answer-a")
+            self.assertEqual(alice.receive_text(), "answer-a")
+
+
+class MeasurementPushTests(unittest.TestCase):
+    def setUp(self):
+        video_server.manager = ConnectionManager()
+        self.client = TestClient(video_server.app)
+        patcher = mock.patch.object(video_server, "MEASUREMENT_NOTIFY_TOKEN", "secret")
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_measurements_reach_only_their_room(self):
+        event = {"type": "measurement", "roomId": "room-a", "captureType": "temperature",
+                 "formattedValue": "36.8°C", "rawText": "36.8"}
+        with self.client.websocket_connect("/ws?roomId=room-b") as outsider, \
+                self.client.websocket_connect("/ws?roomId=room-b") as other_outsider, \
+                self.client.websocket_connect("/ws?roomId=room-a") as doctor:
+            response = self.client.post("/internal/measurements", json={"events": [event]},
+                                        headers={"X-Notify-Token": "secret"})
+            self.assertEqual(response.json(), {"delivered": 1})
+            self.assertEqual(json.loads(doctor.receive_text()), event)
+            # Room b's first message is this ping, not the measurement
+            other_outsider.send_text("ping")
+            self.assertEqual(outsider.receive_text(), "ping")
+
+    def test_token_is_required(self):
+        response = self.client.post("/internal/measurements", json={"events": []},
+                                    headers={"X-Notify-Token": "wrong"})
+        self.assertEqual(response.status_code, 403)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,79 @@
+import gzip
+import os
+import tempfile
+import unittest
+from unittest import mock
+
+from fastapi.testclient import TestClient
+
+import video_server
+from server.static_files import IMMUTABLE, REVALIDATE, StaticIndex
+
+SCRIPT = b"console.log('telehealth');\n" * 200
+
+
+class StaticIndexTests(unittest.TestCase):
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.root = tmp.name
+        os.makedirs(os.path.join(self.root, "static", "js"))
+        self.write("index.html", b"<html>app</html>")
+        self.write("script.js", SCRIPT)
+        self.write("static/js/main.b21d8118.js", SCRIPT)
+        self.write("large.css", b"body { color: red; }\n" * 2000)
+        self.write("large.css.gz", gzip.compress(b"body { color: red; }\n" * 2000))
+
+        self.index = StaticIndex(self.root, memory_file_limit=16 * 1024)
+        self.index.build()
+        patcher = mock.patch.object(video_server, "static_index", self.index)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.client = TestClient(video_server.app)
+
+    def write(self, name, body):
+        with open(os.path.join(self.root, name), "wb") as f:
+            f.write(body)
+
+    def test_health_is_not_served_the_spa_index(self):
+        response = self.client.get("/health")
+        self.assertEqual(response.json(), {"status": "healthy"})
+
+    def test_small_files_are_served_from_memory_compressed(self):
+        response = self.client.get("/script.js", headers={"Accept-Encoding": "gzip"})
+        self.assertEqual(response.headers["Content-Encoding"], "gzip")
+        self.assertEqual(response.headers["Vary"], "Accept-Encoding")
+        self.assertEqual(response.headers["Cache-Control"], REVALIDATE)
+        self.assertEqual(response.content, SCRIPT)
+        self.assertIsNotNone(self.index.get("script.js").body)
+
+    def test_identity_is_served_without_accept_encoding(self):
+        response = self.client.get("/script.js", headers={"Accept-Encoding": "identity"})
+        self.assertNotIn("Content-Encoding", response.headers)
+        self.assertEqual(response.content, SCRIPT)
+
+    def test_hashed_build_assets_are_immutable(self):
+        response = self.client.get("/static/js/main.b21d8118.js")
+        self.assertEqual(response.headers["Cache-Control"], IMMUTABLE)
+        self.assertEqual(response.content, SCRIPT)
+
+    def test_large_files_use_precompressed_sibling_from_disk(self):
+        asset = self.index.get("large.css")
+        self.assertIsNone(asset.body)
+        self.assertIsNone(self.index.get("large.css.gz"))
+        response = self.client.get("/large.css", headers={"Accept-Encoding": "br, gzip"})
+        self.assertEqual(response.headers["Content-Encoding"], "gzip")
+        self.assertEqual(response.content, b"body { color: red; }\n" * 2000)
+
+    def test_conditional_requests_get_304(self):
+        etag = self.client.get("/script.js", headers={"Accept-Encoding": "gzip"}).headers["ETag"]
+        response = self.client.get("/script.js", headers={"Accept-Encoding": "gzip", "If-None-Match": etag})
+        self.assertEqual(response.status_code, 304)
+
+    def test_unknown_paths_fall_back_to_index(self):
+        self.assertEqual(self.client.get("/rooms/abc").content, b"<html>app</html>")
+        self.assertEqual(self.client.get("/static/missing.js").status_code, 404)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,134 @@
+import asyncio
+import json
+import threading
+import time
+import unittest
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from unittest import mock
+
+from fastapi.testclient import TestClient
+
+import video_server
+from server.turn import STUN_SERVERS, TurnCredentialProvider
+
+TURN_SERVERS = [{"urls": "turn:turn.example.test:443", "username": "u", "credential": "c"}]
+
+
+class StubTurnServer:
+    """Local stand-in for the metered.live credentials API."""
+
+    def __init__(self, delay=0.0, status=200, max_age=None):
+        self.delay = delay
+        self.status = status
+        self.max_age = max_age
+        self.hits = 0
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                stub.hits += 1
+                time.sleep(stub.delay)
+                body = json.dumps(TURN_SERVERS).encode()
+                self.send_response(stub.status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(body)))
+                if stub.max_age is not None:
+                    self.send_header("Cache-Control", f"max-age={stub.max_age}")
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args):
+                pass
+
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.url = f"http://127.0.0.1:{self.server.server_port}/api/v1/turn/credentials"
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+
+    def close(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+class TurnCredentialProviderTests(unittest.TestCase):
+    def make_stub(self, **kwargs):
+        stub = StubTurnServer(**kwargs)
+        self.addCleanup(stub.close)
+        return stub
+
+    def run_with(self, provider, scenario):
+        async def wrapped():
+            try:
+                return await scenario()
+            finally:
+                await provider.close()
+        return asyncio.run(wrapped())
+
+    def test_credentials_are_cached_for_their_ttl(self):
+        stub = self.make_stub()
+        provider = TurnCredentialProvider("key", url=stub.url, ttl=60, refresh_ahead=0)
+
+        async def scenario():
+            return [await provider.get() for _ in range(5)]
+
+        self.assertEqual(self.run_with(provider, scenario), [TURN_SERVERS] * 5)
+        self.assertEqual(stub.hits, 1)
+
+    def test_concurrent_callers_share_one_fetch(self):
+        stub = self.make_stub(delay=0.2)
+        provider = TurnCredentialProvider("key", url=stub.url)
+
+        async def scenario():
+            return await asyncio.gather(*(provider.get() for _ in range(20)))
+
+        self.assertEqual(self.run_with(provider, scenario), [TURN_SERVERS] * 20)
+        self.assertEqual(stub.hits, 1)
+
+    def test_refresh_ahead_serves_cached_credentials_meanwhile(self):
+        stub = self.make_stub(max_age=1)
+        provider = TurnCredentialProvider("key", url=stub.url, refresh_ahead=0.8)
+
+        async def scenario():
+            await provider.get()
+            await asyncio.sleep(0.3)
+            stub.delay = 0.3
+            started = time.monotonic()
+            cached = await provider.get()
+            waited = time.monotonic() - started
+            await asyncio.sleep(0.5)
+            return cached, waited
+
+        cached, waited = self.run_with(provider, scenario)
+        self.assertEqual(cached, TURN_SERVERS)
+        self.assertLess(waited, 0.1)
+        self.assertEqual(stub.hits, 2)
+
+    def test_failures_fall_back_to_stun_and_back_off(self):
+        stub = self.make_stub(status=503)
+        provider = TurnCredentialProvider("key", url=stub.url, error_ttl=60)
+
+        async def scenario():
+            return [await provider.get() for _ in range(3)]
+
+        self.assertEqual(self.run_with(provider, scenario), [STUN_SERVERS] * 3)
+        self.assertEqual(stub.hits, 1)
+
+    def test_missing_api_key_uses_stun(self):
+        provider = TurnCredentialProvider(None)
+        self.assertEqual(self.run_with(provider, provider.get), STUN_SERVERS)
+
+
+class TurnEndpointTests(unittest.TestCase):
+    def test_production_endpoint_serves_cached_credentials(self):
+        stub = StubTurnServer()
+        self.addCleanup(stub.close)
+        provider = TurnCredentialProvider("key", url=stub.url)
+        with mock.patch.object(video_server, "turn_provider", provider), \
+                mock.patch.dict("os.environ", {"ENVIRONMENT": "production"}), \
+                TestClient(video_server.app) as client:
+            responses = [client.get("/api/turn-credentials").json() for _ in range(3)]
+        self.assertEqual(responses, [TURN_SERVERS] * 3)
+        self.assertEqual(stub.hits, 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -1,14 +1,18 @@
 import os
+import hmac
 import json
-import httpx
 from fastapi import FastAPI, WebSocket, WebSocketDisconnect, Request
-from fastapi.staticfiles import StaticFiles
-from fastapi.responses import HTMLResponse, JSONResponse, FileResponse
+from fastapi.responses import HTMLResponse, JSONResponse, Response
 from fastapi.middleware.cors import CORSMiddleware
-from typing import List
+from typing import Optional
 import uvicorn
-from pathlib import Path
 from dotenv import load_dotenv
+from server.backplane import create_backplane
+from server.connection_manager import ConnectionManager, DROP_OLDEST
+from server.firebase_config import from_environment
+from server import metrics
+from server.static_files import StaticIndex
+from server.turn import METERED_TURN_URL, STUN_SERVERS, TurnCredentialProvider
 
 # Load environment variables
 load_dotenv()
@@ -37,124 +41,177 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-# Static Files Setup
-static_dir = os.path.abspath("static")
+# Server-Timing response header with the spans of each HTTP request (TURN fetches)
+if os.getenv("METRICS_SERVER_TIMING", "").lower() in ("1", "true", "yes"):
+    app.add_middleware(metrics.ServerTimingMiddleware)
+
+# Static Files Setup: the tree is indexed once; files added later need a restart.
+# STATIC_ROOT may also point at a CRA build (telehealth-frontend/build).
+static_dir = os.path.abspath(os.getenv("STATIC_ROOT", "static"))
 if not os.path.exists(static_dir):
     os.makedirs(static_dir)
-app.mount("/static", StaticFiles(directory=static_dir), name="static")
+static_index = StaticIndex(static_dir)
+static_index.build()
+
+# Firebase Config Endpoint: loaded and serialized once, cacheable by browsers.
+# FIREBASE_CONFIG_WATCH=1 reloads firebase-config.json when it changes; keep
+# FIREBASE_CONFIG_MAX_AGE short then, browsers only revalidate once it lapses.
+firebase_config = from_environment()
+FIREBASE_CONFIG_CACHE_CONTROL = f"public, max-age={os.getenv('FIREBASE_CONFIG_MAX_AGE', '86400')}"
+
+
+@app.on_event("startup")
+async def load_firebase_config():
+    firebase_config.load()
+
 
-# Enhanced Firebase Config Endpoint
 @app.get("/firebase-config")
-async def get_firebase_config():
-    try:
-        # Try environment variable first (from .env)
-        config_json = os.getenv("FIREBASE_CONFIG")
-        
-        if config_json:
-            # Handle both stringified JSON and proper JSON from .env
-            try:
-                config = json.loads(config_json.replace("'", "\""))
-            except json.JSONDecodeError:
-                # If it's already proper JSON
-                config = json.loads(config_json)
-        else:
-            # Fallback to local file for development
-            config_path = Path("firebase-config.json")
-            if config_path.exists():
-                with open(config_path) as f:
-                    config = json.load(f)
-            else:
-                raise ValueError(
-                    "Neither FIREBASE_CONFIG env var nor firebase-config.json file found"
-                )
-        
-        print("Loaded Firebase config successfully")
-        return JSONResponse(content=config)
-    except Exception as e:
-        print(f"Firebase config error: {str(e)}")
+async def get_firebase_config(request: Request):
+    body, etag = firebase_config.current()
+    if body is None:
         return JSONResponse(
             content={"error": "Failed to load Firebase configuration"},
             status_code=500
         )
+    headers = {"ETag": etag, "Cache-Control": FIREBASE_CONFIG_CACHE_CONTROL}
+    if_none_match = request.headers.get("If-None-Match", "")
+    if etag in (tag.strip().removeprefix("W/") for tag in if_none_match.split(",")):
+        return Response(status_code=304, headers=headers)
+    return Response(content=body, media_type="application/json", headers=headers)
+
+# TURN Credentials Endpoint: cached and refreshed ahead of expiry, STUN on failure
+turn_provider = TurnCredentialProvider(
+    os.getenv("METERED_API_KEY"),
+    url=os.getenv("METERED_TURN_URL", METERED_TURN_URL),
+    ttl=float(os.getenv("TURN_CREDENTIALS_TTL", "3600")),
+    refresh_ahead=float(os.getenv("TURN_REFRESH_AHEAD", "300")),
+)
+
 
-# Robust TURN Credentials Endpoint
 @app.get("/api/turn-credentials")
 async def get_turn_credentials():
-    try:
-        # Only use paid TURN servers in production
-        if os.getenv("ENVIRONMENT", "development") == "production":
-            METERED_API_KEY = os.getenv("METERED_API_KEY")
-            if not METERED_API_KEY:
-                raise ValueError("METERED_API_KEY not configured")
-
-            async with httpx.AsyncClient() as client:
-                response = await client.get(
-                    "https://video-call-turn-server.metered.live/api/v1/turn/credentials",
-                    params={"apiKey": METERED_API_KEY},
-                    timeout=10.0
-                )
-                response.raise_for_status()
-                return response.json()
-    except Exception as e:
-        print(f"TURN server error (falling back to STUN): {str(e)}")
+    # Only use paid TURN servers in production
+    if os.getenv("ENVIRONMENT", "development") == "production":
+        return JSONResponse(content=await turn_provider.get())
 
     # Default STUN servers for local development
-    return JSONResponse(content={
-        "iceServers": [
-            {"urls": "stun:stun.l.google.com:19302"},
-            {"urls": "stun:stun1.l.google.com:19302"},
-            {"urls": "stun:stun2.l.google.com:19302"}
-        ]
-    })
-
-# WebSocket Manager
-class ConnectionManager:
-    def __init__(self):
-        self.active_connections: List[WebSocket] = []
-
-    async def connect(self, websocket: WebSocket):
-        await websocket.accept()
-        self.active_connections.append(websocket)
-        print(f"New connection. Total: {len(self.active_connections)}")
-
-    def disconnect(self, websocket: WebSocket):
-        if websocket in self.active_connections:
-            self.active_connections.remove(websocket)
-            print(f"Disconnected. Total: {len(self.active_connections)}")
-
-    async def broadcast(self, message: str, sender: WebSocket):
-        for connection in self.active_connections:
-            if connection != sender:
-                try:
-                    await connection.send_text(message)
-                except:
-                    self.disconnect(connection)
-
-manager = ConnectionManager()
+    return JSONResponse(content=STUN_SERVERS)
+
+# WebSocket Manager: bounded per-peer send queues with a slow consumer policy
+# (drop_oldest, coalesce or disconnect). Set SIGNALING_BACKPLANE=unix when
+# running several workers so peers of a room can reach each other.
+manager = ConnectionManager(
+    max_queue=int(os.getenv("WS_SEND_QUEUE_SIZE", "64")),
+    policy=os.getenv("WS_SLOW_CONSUMER_POLICY", DROP_OLDEST),
+    backplane=create_backplane(
+        os.getenv("SIGNALING_BACKPLANE"),
+        os.getenv("SIGNALING_BACKPLANE_PATH", "/tmp/telehealth-signaling.sock"),
+    ),
+)
+
+
+# Prometheus metrics: connect, fan-out and TURN fetch latencies, peer and queue gauges
+metrics.register(manager, turn_provider)
+
+
+@app.get("/metrics")
+async def get_metrics():
+    body, content_type = metrics.exposition()
+    return Response(content=body, media_type=content_type)
+
+
+@app.on_event("startup")
+async def start_signaling():
+    await manager.start()
+
+
+@app.on_event("shutdown")
+async def stop_signaling():
+    await manager.close()
+    await turn_provider.close()
+
+
+def parse_join_request(data: str) -> Optional[str]:
+    """Returns the roomId of a ``{"type": "join", "roomId": ...}`` message."""
+    if not data.startswith("{"):
+        return None
+    try:
+        payload = json.loads(data)
+    except json.JSONDecodeError:
+        return None
+    if isinstance(payload, dict) and payload.get("type") == "join" and payload.get("roomId"):
+        return str(payload["roomId"])
+    return None
+
+
+@app.get("/health")
+async def health_check():
+    # Readiness probe for the backend's video server supervisor
+    return {"status": "healthy"}
+
 
 @app.websocket("/ws")
 async def websocket_endpoint(websocket: WebSocket):
-    await manager.connect(websocket)
+    # Peers pick their consultation room with ?roomId=... or a join message
+    await manager.connect(websocket, websocket.query_params.get("roomId"))
     try:
         while True:
             data = await websocket.receive_text()
+            room_id = parse_join_request(data)
+            if room_id:
+                manager.join(websocket, room_id)
+                continue
             await manager.broadcast(data, websocket)
     except WebSocketDisconnect:
-        manager.disconnect(websocket)
-        await manager.broadcast("A user disconnected", websocket)
+        room_id = manager.disconnect(websocket)
+        if room_id is not None:
+            await manager.broadcast("A user disconnected", websocket, room_id)
+
+# Measurement events from the OCR backend (MEASUREMENT_NOTIFY_URL there).
+# With MEASUREMENT_NOTIFY_TOKEN set the caller must send it in X-Notify-Token;
+# without it only loopback callers are accepted.
+MEASUREMENT_NOTIFY_TOKEN = os.getenv("MEASUREMENT_NOTIFY_TOKEN", "")
+
+
+def notify_allowed(request: Request) -> bool:
+    if MEASUREMENT_NOTIFY_TOKEN:
+        return hmac.compare_digest(request.headers.get("X-Notify-Token", ""), MEASUREMENT_NOTIFY_TOKEN)
+    return request.client is not None and request.client.host in ("127.0.0.1", "::1", "localhost")
+
+
+@app.post("/internal/measurements")
+async def push_measurements(request: Request):
+    """Relays ``{"events": [{"type": "measurement", "roomId": ...}, ...]}`` to each room's peers."""
+    if not notify_allowed(request):
+        return JSONResponse(content={"error": "Forbidden"}, status_code=403)
+    try:
+        events = (await request.json())["events"]
+    except (json.JSONDecodeError, KeyError, TypeError):
+        return JSONResponse(content={"error": "Expected a JSON body with an events list"}, status_code=400)
+
+    delivered = 0
+    for event in events:
+        if isinstance(event, dict) and event.get("type") == "measurement" and event.get("roomId"):
+            await manager.broadcast(json.dumps(event), None, str(event["roomId"]))
+            delivered += 1
+    return {"delivered": delivered}
+
+# Assets under /static/: the video app's own files, or a CRA build's static/ folder
+@app.get("/static/{path:path}")
+async def serve_static(path: str, request: Request):
+    asset = static_index.get(path) or static_index.get(f"static/{path}")
+    if asset is None:
+        return JSONResponse(content={"error": "File not found"}, status_code=404)
+    return static_index.respond(asset, request.headers)
 
 # Serve frontend files
 @app.get("/{path:path}")
-async def serve_frontend(path: str):
-    static_file = os.path.join(static_dir, path)
-    if os.path.isfile(static_file):
-        return FileResponse(static_file)
-    
+async def serve_frontend(path: str, request: Request):
     # Fallback to index.html for SPA routing
-    index_path = os.path.join(static_dir, "index.html")
-    if os.path.exists(index_path):
-        return FileResponse(index_path)
-    
+    asset = static_index.get(path) or static_index.get("index.html")
+    if asset is not None:
+        return static_index.respond(asset, request.headers)
+
     return JSONResponse(
         content={"error": "File not found"},
         status_code=404